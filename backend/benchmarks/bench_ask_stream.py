@@ -0,0 +1,55 @@
+"""Temps jusqu'au premier octet de /api/ask/stream comparé à /api/ask, hors ligne avec le modèle stub.
+
+Usage (depuis backend/): uv run benchmarks/bench_ask_stream.py [--first-token-ms 300] [--token-ms 30]
+Le modèle d'embedding (MiniLM) doit être disponible localement; aucun appel Gemini n'est fait.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token-ms", default="300")
+    parser.add_argument("--token-ms", default="30")
+    parser.add_argument("--question", default="Quels tours passent par le Col du Galibier ?")
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["LLM_STUB_FIRST_TOKEN_MS"] = args.first_token_ms
+    os.environ["LLM_STUB_TOKEN_MS"] = args.token_ms
+
+    from main import create_app
+    from services.registry import registry
+
+    client = create_app(warmup="blocking").test_client()
+    # Questions distinctes à chaque appel pour ne pas mesurer le cache de réponses
+    registry.chatbot_service().answer_cache.invalidate()
+
+    start = time.perf_counter()
+    client.post("/api/ask", json={"question": args.question + " (blocking)"})
+    blocking_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post("/api/ask/stream", json={"question": args.question}, buffered=False)
+    first_byte = first_token = None
+    for chunk in response.response:
+        now = time.perf_counter() - start
+        if first_byte is None:
+            first_byte = now
+        if first_token is None and b"event: token" in chunk:
+            first_token = now
+    stream_total = time.perf_counter() - start
+    response.close()
+
+    print(f"/api/ask         full answer after {blocking_total * 1000:8.1f} ms")
+    print(f"/api/ask/stream  first byte (retrieval results) {first_byte * 1000:8.1f} ms")
+    print(f"/api/ask/stream  first token                    {first_token * 1000:8.1f} ms")
+    print(f"/api/ask/stream  full answer                    {stream_total * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Test de charge: serveur Flask (un thread par requête) contre serveur asyncio (src/asgi.py), avec
+beaucoup d'appels lents simultanés vers l'amont. Le LLM est le modèle stub (latence --llm-ms) et DBpedia
+un faux point d'accès local qui répond après --dbpedia-ms; aucun appel réseau n'est fait.
+
+Chaque serveur tourne dans son propre processus. On mesure le débit, la latence (p50 / p95), les erreurs
+et le nombre maximal de threads du serveur pendant le test, sur /api/ask et /api/enrich.
+
+Usage (depuis backend/): uv run benchmarks/bench_async_serving.py [--requests 400] [--concurrency 200]
+    [--llm-ms 1000] [--dbpedia-ms 1000]
+Le modèle d'embedding (MiniLM) doit être disponible localement.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from services.llm.metrics import percentile
+
+SERVERS = {
+    "flask (threads)": "from werkzeug.serving import run_simple; from main import app; "
+                       "run_simple('127.0.0.1', {port}, app, threaded=True)",
+    "asgi (asyncio)": "import uvicorn; from asgi import app; "
+                      "uvicorn.run(app, host='127.0.0.1', port={port}, log_level='warning')",
+}
+
+ENRICH_QUERY = "SELECT ?s ?sameAs WHERE { ?s owl:sameAs ?sameAs } LIMIT 20"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def slow_dbpedia(delay):
+    # Faux point d'accès SPARQL: résultat vide au format JSON après delay secondes
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps({"head": {"vars": ["uri"]}, "results": {"bindings": []}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/sparql-results+json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_server(code, port, env):
+    process = subprocess.Popen([sys.executable, "-c", code.format(port=port)], cwd=SRC, env=env)
+    deadline = time.time() + 600
+    while time.time() < deadline:
+        try:
+            # Préchargement: le premier appel construit l'index du chatbot
+            if httpx.get(f"http://127.0.0.1:{port}/api/ask/cache", timeout=600).status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.5)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def peak_threads(pid, stop, peak):
+    while not stop.is_set():
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                threads = next(int(line.split()[1]) for line in f if line.startswith("Threads:"))
+            peak[0] = max(peak[0], threads)
+        except (OSError, StopIteration):
+            pass
+        time.sleep(0.05)
+
+
+async def load(base_url, path, payloads, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one(payload):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in payloads))
+        elapsed = time.perf_counter() - start
+    return len(payloads) / elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--llm-ms", default="1000")
+    parser.add_argument("--dbpedia-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    dbpedia = slow_dbpedia(args.dbpedia_ms / 1000)
+    env = dict(
+        os.environ,
+        LLM_PROVIDER="stub", LLM_STUB_FIRST_TOKEN_MS=args.llm_ms, LLM_STUB_TOKEN_MS="0",
+        # Le test mesure le serveur, pas l'ordonnanceur LLM: pas de refus pour surcharge
+        LLM_MAX_IN_FLIGHT=str(args.concurrency), LLM_QUEUE_TIMEOUT_S="120", LLM_DEADLINE_S="120",
+        # Questions toutes différentes et cache sémantique désactivé: chaque requête appelle le LLM
+        CHATBOT_CACHE_THRESHOLD="2",
+        DBPEDIA_ENDPOINT=f"http://127.0.0.1:{dbpedia.server_address[1]}/sparql",
+    )
+    workloads = {
+        "/api/ask": [{"question": f"Quels vélos électriques pour le tour n°{i} ?"} for i in range(args.requests)],
+        "/api/enrich": [{"query": ENRICH_QUERY}] * args.requests,
+    }
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, LLM {args.llm_ms} ms, DBpedia {args.dbpedia_ms:g} ms")
+    print(f"{'server':<17} {'endpoint':<12} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'threads':>8}")
+    for name, code in SERVERS.items():
+        port = free_port()
+        process = start_server(code, port, env)
+        try:
+            for path, payloads in workloads.items():
+                stop, peak = threading.Event(), [0]
+                monitor = threading.Thread(target=peak_threads, args=(process.pid, stop, peak), daemon=True)
+                monitor.start()
+                rate, latencies, errors = asyncio.run(load(f"http://127.0.0.1:{port}", path, payloads, args.concurrency))
+                stop.set()
+                monitor.join()
+                print(f"{name:<17} {path:<12} {rate:>7.1f} {percentile(latencies, 50) * 1000:>8.0f} "
+                      f"{percentile(latencies, 95) * 1000:>8.0f} {errors:>7} {peak[0]:>8}")
+        finally:
+            process.terminate()
+            process.wait()
+    dbpedia.shutdown()
+
+
+if __name__ == "__main__":
+    main()
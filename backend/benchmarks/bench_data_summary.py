@@ -0,0 +1,74 @@
+"""Compare l'ancien résumé des données du text-to-SPARQL (une requête par classe et par couple
+classe/propriété) avec la version en un seul parcours, et le coût par requête une fois en cache.
+
+Usage (depuis backend/): uv run benchmarks/bench_data_summary.py [--repeat 3]
+"""
+import argparse
+import time
+
+from competency import load_graph
+from services.text_to_sparql.data_summary import get_rdf_data_summary
+from services.text_to_sparql.text_to_sparql_service import TextToSparqlService
+
+
+def legacy_rdf_data_summary(graph):
+    # Copie de l'ancienne version
+    summary = "### DATA SAMPLES & STRUCTURE\n"
+    summary += "Here is a summary of the Classes and Properties found in the actual RDF data, with examples:\n\n"
+
+    for row_c in graph.query("SELECT DISTINCT ?type WHERE { ?s a ?type . }"):
+        class_uri = str(row_c.type)
+        summary += f"#### Class: <{class_uri}>\n"
+        properties = graph.query(f"SELECT DISTINCT ?p WHERE {{ ?s a <{class_uri}> . ?s ?p ?o . }}")
+        if not properties:
+            summary += "  (No properties found for instances of this class)\n"
+            continue
+
+        for row_p in properties:
+            prop_uri = str(row_p.p)
+            samples = graph.query(f"SELECT ?o WHERE {{ ?s a <{class_uri}> . ?s <{prop_uri}> ?o . }} LIMIT 3")
+            sample_vals = []
+            for s_row in samples:
+                val = str(s_row.o).replace("\n", " ").strip()
+                if len(val) > 50:
+                    val = val[:47] + "..."
+                sample_vals.append(val)
+
+            vals_str = ", ".join([f"'{v}'" for v in sample_vals])
+            prop_name = prop_uri.split("#")[-1] if "#" in prop_uri else prop_uri.split("/")[-1]
+            summary += f"  - **{prop_name}** (<{prop_uri}>): [{vals_str}]\n"
+        summary += "\n"
+    return summary
+
+
+def timed(function, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    graph = load_graph()
+    print(f"{len(graph)} triples")
+
+    legacy_ms, legacy = timed(lambda: legacy_rdf_data_summary(graph), args.repeat)
+    single_ms, single = timed(lambda: get_rdf_data_summary(graph), args.repeat)
+    service = TextToSparqlService(graph, "", "unused", cache_file=None)
+    service.data_summary()
+    cached_ms, cached = timed(service.data_summary, args.repeat * 100)
+
+    print(f"legacy (query per class/property)  {legacy_ms:>10.1f} ms per request")
+    print(f"single pass                        {single_ms:>10.1f} ms ({legacy_ms / single_ms:.0f}x faster)")
+    print(f"cached (per request once built)    {cached_ms:>10.4f} ms")
+    print(f"identical summary: {legacy == single == cached}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Compare l'ancienne extraction N+1 des documents du chatbot avec la version groupée.
+
+Usage (depuis backend/): uv run benchmarks/bench_document_extraction.py [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.sparql_service import SparqlService
+from services.chatbot_service import ChatBotService
+
+DATABASE_FOLDER = os.path.join(os.path.dirname(__file__), "..", "..", "database")
+
+PREFIXES = """
+PREFIX cs: <http://data.cyclingtour.fr/schema#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+"""
+
+
+def legacy_tour_and_path_documents(graph):
+    # Copie de l'ancienne boucle : une requête q_details par tour, une requête q_mnt par chemin
+    docs = []
+    query_tours = PREFIXES + """
+    SELECT ?tour ?label ?price ?duration ?guideName
+    WHERE {
+        ?tour a cs:TourPackage ;
+              rdfs:label ?label ;
+              cs:pricePerDayTour ?price ;
+              cs:duration ?duration .
+        OPTIONAL { ?tour cs:guideAssigned ?g . ?g foaf:name ?guideName }
+    }
+    """
+    q_details = PREFIXES + """
+    SELECT ?stageLabel ?difficulty ?elevation ?mountainLabel WHERE {
+        ?tour cs:includesStage ?stage .
+        ?stage rdfs:label ?stageLabel ;
+               cs:stagePath ?path .
+        ?path cs:difficulty ?difficulty ;
+              cs:elevationGain ?elevation .
+        OPTIONAL {
+            ?path cs:includesMountain ?mnt .
+            ?mnt rdfs:label ?mountainLabel
+        }
+    }
+    """
+    for row in graph.query(query_tours):
+        stages_txt = []
+        mountains = {}
+        total_difficulty = "Modéré"
+        for d in graph.query(q_details, initBindings={'tour': row['tour']}):
+            stages_txt.append(f"{d['stageLabel']} (Dénivelé: {d['elevation']}m)")
+            if d['mountainLabel']: mountains[str(d['mountainLabel'])] = None
+            if "VeryHard" in str(d['difficulty']):
+                total_difficulty = "Très Difficile / Haute Montagne"
+            elif "Hard" in str(d['difficulty']):
+                total_difficulty = "Difficile"
+        docs.append(
+            f"Offre Touristique: {row['label']}. "
+            f"Niveau global: {total_difficulty}. "
+            f"Prix: {row['price']}€/jour. Durée: {row['duration']}. "
+            f"Guide responsable: {row['guideName']}. "
+            f"Étapes du parcours: {', '.join(stages_txt)}. "
+            f"Cols et Montagnes traversés: {', '.join(mountains)}."
+        )
+
+    query_paths = PREFIXES + """
+    SELECT ?path ?label ?diff ?elev WHERE {
+        ?path a cs:Path ;
+              rdfs:label ?label ;
+              cs:difficulty ?diff ;
+              cs:elevationGain ?elev .
+    }
+    """
+    q_mnt = PREFIXES + """
+    SELECT ?mLabel ?mElev WHERE {
+        ?path cs:includesMountain ?m .
+        ?m rdfs:label ?mLabel ;
+           cs:elevation ?mElev .
+    }
+    """
+    for row in graph.query(query_paths):
+        mnts = graph.query(q_mnt, initBindings={'path': row['path']})
+        mnt_txt = [f"{m['mLabel']} ({m['mElev']}m)" for m in mnts]
+        difficulty_str = str(row['diff']).split('#')[-1]
+        docs.append(
+            f"Itinéraire / Chemin: {row['label']}. "
+            f"Difficulté technique: {difficulty_str}. Dénivelé positif: {row['elev']}m. "
+            f"Liste des cols inclus: {', '.join(mnt_txt) if mnt_txt else 'Aucun col majeur'}."
+        )
+    return docs
+
+
+def best_of(repeat, fn):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ttl_files = [
+        os.path.join(DATABASE_FOLDER, file)
+        for file in os.listdir(DATABASE_FOLDER)
+        if file.endswith(".ttl")
+    ]
+    graph = SparqlService(ttl_files).get_graph()
+
+    # Pas besoin du modèle ni du client Gemini pour extraire les documents
+    chatbot = ChatBotService.__new__(ChatBotService)
+    chatbot.graph = graph
+
+    legacy_time, legacy_docs = best_of(args.repeat, lambda: legacy_tour_and_path_documents(graph))
+    grouped_time, (docs, meta) = best_of(args.repeat, chatbot._collect_documents)
+
+    grouped_docs = [doc for doc, m in zip(docs, meta) if m['type'] in ('Tour', 'Path')]
+    print(f"Tour + Path documents: {len(grouped_docs)}")
+    print(f"Legacy N+1 extraction (tours + paths only): {legacy_time:.3f}s")
+    print(f"Grouped extraction (all document types):    {grouped_time:.3f}s")
+    print(f"Speed-up: {legacy_time / grouped_time:.1f}x")
+
+    if grouped_docs != legacy_docs:
+        print("MISMATCH: generated texts differ from the legacy extraction")
+        sys.exit(1)
+    print("Generated texts are identical.")
+
+
+if __name__ == "__main__":
+    main()
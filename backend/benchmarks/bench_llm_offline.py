@@ -0,0 +1,85 @@
+"""Latence de bout en bout de /api/ask et /api/text-to-sparql hors ligne, avec le modèle stub.
+
+Les réponses enregistrées (LLM_RECORD=fichier avec Gemini) sont rejouées avec --recordings; les autres
+prompts reçoivent une réponse déterministe. Chaque question est posée caches vidés, pour mesurer toute
+la chaîne: la part du LLM (simulée) est lue dans /api/llm/metrics, le reste est le coût de l'application.
+Code de sortie 1 si un appel échoue (utilisable en CI).
+
+Usage (depuis backend/): uv run benchmarks/bench_llm_offline.py [--recordings llm_recordings.jsonl]
+    [--first-token-ms 300] [--token-ms 30] [--limit 20] [--embedding-model hashing]
+Par défaut les embeddings viennent de l'encodeur haché (CHATBOT_MODEL=hashing): aucun modèle à télécharger,
+aucun appel réseau. --embedding-model all-MiniLM-L6-v2 mesure avec le vrai modèle, s'il est en cache local.
+L'index du chatbot est construit dans un dossier temporaire: celui de l'application reste intact.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from competency import COMPETENCY_FILE, load_questions
+from services.llm.metrics import percentile
+
+
+def run(client, path, payloads, reset_caches):
+    latencies, failures = [], 0
+    for payload in payloads:
+        reset_caches()
+        start = time.perf_counter()
+        response = client.post(path, json=payload)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            failures += 1
+            print(f"{path} failed ({response.status_code}): {response.get_json()}")
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=COMPETENCY_FILE)
+    parser.add_argument("--recordings", default="")
+    parser.add_argument("--first-token-ms", default="300")
+    parser.add_argument("--token-ms", default="30")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--embedding-model", default="hashing")
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["LLM_STUB_RECORDINGS"] = args.recordings
+    os.environ["LLM_STUB_FIRST_TOKEN_MS"] = args.first_token_ms
+    os.environ["LLM_STUB_TOKEN_MS"] = args.token_ms
+    os.environ["CHATBOT_MODEL"] = args.embedding_model
+    index_dir = tempfile.TemporaryDirectory()
+    os.environ["CHATBOT_INDEX_FILE"] = os.path.join(index_dir.name, "search_index.pkl")
+
+    from main import create_app
+    from services.registry import registry
+
+    client = create_app(warmup="blocking").test_client()
+    chatbot = registry.chatbot_service()
+    text_to_sparql = registry.text_to_sparql_service()
+    # Cache de traductions en mémoire seulement: le fichier de l'application reste intact
+    text_to_sparql.translation_cache.path = None
+
+    questions = [q["question"] for q in load_questions(args.questions)][:args.limit]
+    client.delete("/api/llm/metrics")
+    ask, ask_failures = run(client, "/api/ask", [{"question": q} for q in questions],
+                            chatbot.answer_cache.invalidate)
+    sparql, sparql_failures = run(client, "/api/text-to-sparql", [{"text": q} for q in questions],
+                                  text_to_sparql.translation_cache.invalidate)
+    metrics = client.get("/api/llm/metrics").get_json()
+
+    print(f"{len(questions)} questions, provider {metrics['provider']}, replay {metrics.get('replay')}")
+    print(f"{'endpoint':<20} {'p50 ms':>8} {'p95 ms':>8} {'LLM p50':>8} {'prompt tok':>11} {'LLM calls':>10} {'LLM err':>8} {'failed':>7}")
+    for name, latencies, failures, tag in (("/api/ask", ask, ask_failures, "chatbot"),
+                                           ("/api/text-to-sparql", sparql, sparql_failures, "text_to_sparql")):
+        calls = metrics["calls"].get(tag, {})
+        print(f"{name:<20} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+              f"{calls.get('latency_ms', {}).get('p50') or 0:>8.1f} {calls.get('avg_prompt_tokens', 0):>11} "
+              f"{calls.get('calls', 0):>10} {calls.get('errors', 0):>8} {failures:>7}")
+
+    if ask_failures or sparql_failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Mémoire et temps de démarrage de N processus serveurs: N processus indépendants (chacun lit les TTL,
+applique owlrl et charge MiniLM et les index) contre src/serve.py (chargement unique dans le maître puis N
+workers forkés qui partagent cette mémoire).
+
+La mémoire totale est la somme des Pss (les pages partagées sont réparties entre les processus qui les
+utilisent), mesurée après le démarrage puis après quelques requêtes sur chaque serveur.
+
+Usage (depuis backend/): uv run benchmarks/bench_prefork_memory.py [--workers 4] [--requests 50]
+Le modèle d'embedding (MiniLM) doit être disponible localement.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from services.startup import process_memory
+
+SERVICES = "sparql,embedding_model,chatbot,text_to_sparql"
+STANDALONE = ("import uvicorn; from services.registry import registry; from asgi import app; "
+              "registry.warmup('{services}'.split(','), background=False); "
+              "uvicorn.run(app, host='127.0.0.1', port={port}, log_level='warning')")
+PREFORK = "import sys; import serve; sys.argv = ['serve.py', '--workers', '{workers}', '--port', '{port}']; serve.main()"
+
+QUESTIONS = ["Quels vélos électriques proposez-vous ?", "Avis sur le tour des Alpes", "Réservations de vélos en juin"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/startup", timeout=5).status_code == 200:
+                return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def total_pss(pids):
+    return sum(process_memory(pid).get("pss_mb", 0.0) for pid in pids)
+
+
+def exercise(ports, requests):
+    for port in ports:
+        for i in range(requests):
+            httpx.post(f"http://127.0.0.1:{port}/api/ask", json={"question": QUESTIONS[i % len(QUESTIONS)]}, timeout=120)
+
+
+def standalone(workers, env, requests):
+    start = time.perf_counter()
+    ports = [free_port() for _ in range(workers)]
+    processes = [
+        subprocess.Popen([sys.executable, "-c", STANDALONE.format(services=SERVICES, port=port)], cwd=SRC, env=env)
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            wait_ready(port)
+        boot = time.perf_counter() - start
+        pids = [p.pid for p in processes]
+        idle = total_pss(pids)
+        exercise(ports, requests)
+        return boot, idle, total_pss(pids)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def prefork(workers, env, requests):
+    start = time.perf_counter()
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-c", PREFORK.format(workers=workers, port=port)], cwd=SRC,
+                               env=dict(env, PREFORK_SERVICES=SERVICES))
+    try:
+        wait_ready(port)
+        while len(children(process.pid)) < workers:
+            time.sleep(0.1)
+        boot = time.perf_counter() - start
+        pids = [process.pid] + children(process.pid)
+        idle = total_pss(pids)
+        # Le noyau répartit les connexions entre les workers: assez de requêtes pour les solliciter tous
+        exercise([port] * workers, requests)
+        return boot, idle, total_pss(pids)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=50, help="requêtes /api/ask par serveur")
+    args = parser.parse_args()
+
+    # LLM stub sans latence: on mesure la mémoire des processus, pas les appels
+    env = dict(os.environ, LLM_PROVIDER="stub", LLM_STUB_FIRST_TOKEN_MS="0", LLM_STUB_TOKEN_MS="0",
+               SERVICES_WARMUP="none")
+
+    print(f"{args.workers} serving processes, {args.requests} /api/ask requests each")
+    print(f"{'mode':<22} {'boot s':>7} {'pss idle MB':>12} {'pss after MB':>13}")
+    for name, run in (("independent processes", standalone), ("prefork (serve.py)", prefork)):
+        boot, idle, after = run(args.workers, env, args.requests)
+        print(f"{name:<22} {boot:>7.1f} {idle:>12.1f} {after:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
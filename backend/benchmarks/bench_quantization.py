@@ -0,0 +1,72 @@
+"""Mémoire et rappel@k de la recherche int8 + re-classement float, comparée à la recherche float exacte.
+
+Les requêtes sont les questions de compétence (et de cto_queries.txt), plus --doc-queries textes de
+documents tirés au hasard pour avoir un échantillon plus large.
+
+Usage (depuis backend/): uv run benchmarks/bench_quantization.py [--k 3] [--doc-queries 200]
+"""
+import argparse
+import os
+import random
+
+import numpy as np
+
+from competency import COMPETENCY_FILE, DATABASE_FOLDER, answer_values, is_relevant, load_graph, load_questions
+from services.chatbot_service import INDEX_FILE, ChatBotService
+from services.chatbot.vector_index import ExactIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--doc-queries", type=int, default=200)
+    parser.add_argument("--cache-file", default=INDEX_FILE)
+    args = parser.parse_args()
+
+    graph = load_graph()
+    chatbot = ChatBotService(graph, os.getenv("GEMINI_API_KEY", "unused"), cache_file=args.cache_file)
+    vectors = chatbot.embeddings
+
+    questions = load_questions(COMPETENCY_FILE) + load_questions(os.path.join(DATABASE_FOLDER, "cto_queries.txt"))
+    for q in questions:
+        q["values"] = answer_values(graph, q["sparql"])
+    texts = [q["question"] for q in questions]
+    texts += random.Random(0).sample(chatbot.documents, min(args.doc_queries, len(chatbot.documents)))
+    queries = chatbot.model.encode(texts, normalize_embeddings=True)
+
+    exact = ExactIndex(vectors)
+    configs = [
+        ("int8, no re-rank", ExactIndex(vectors, quantize="int8", rerank_factor=1)),
+        ("int8 + re-rank x2", ExactIndex(vectors, quantize="int8", rerank_factor=2)),
+        ("int8 + re-rank x4", ExactIndex(vectors, quantize="int8", rerank_factor=4)),
+    ]
+
+    memory = configs[0][1].memory()
+    print(f"{len(vectors)} documents: float32 {memory['float_bytes'] / 1024:.0f} KiB, "
+          f"int8 + scales {memory['resident_bytes'] / 1024:.0f} KiB "
+          f"({memory['float_bytes'] / memory['resident_bytes']:.1f}x smaller)")
+    print(f"{len(texts)} queries ({len(questions)} competency questions), k={args.k}")
+
+    truth = [exact.search(q, args.k) for q in queries]
+    rated = [(i, q) for i, q in enumerate(questions) if q["values"]]
+
+    def recall(i, found):
+        # Un document à égalité avec le k-ième score float compte comme trouvé (beaucoup d'ex aequo
+        # entre documents presque identiques)
+        threshold = truth[i][0][-1] - 1e-6
+        return np.mean(np.asarray(vectors[found]) @ queries[i] >= threshold)
+
+    for name, index in configs:
+        found = [index.search(q, args.k)[1] for q in queries]
+        recall_all = np.mean([recall(i, f) for i, f in enumerate(found)])
+        competency_recall = np.mean([recall(i, found[i]) for i, _ in rated])
+        hits = np.mean([any(is_relevant(chatbot.documents[d], q["values"]) for d in found[i]) for i, q in rated])
+        print(f"{name:<20} recall@{args.k} vs float {recall_all:.3f}   "
+              f"on competency questions {competency_recall:.3f}   competency hit@{args.k} {hits:.2f}")
+
+    hits = np.mean([any(is_relevant(chatbot.documents[d], q["values"]) for d in truth[i][1]) for i, q in rated])
+    print(f"{'float32 exact':<20} competency hit@{args.k} {hits:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Débit d'encodage des questions sous charge concurrente: encode() par requête vs EmbeddingBatcher.
+
+Usage (depuis backend/): uv run benchmarks/bench_query_embedding.py [--clients 16] [--requests 50]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.chatbot.embedding_batcher import EmbeddingBatcher
+
+QUESTIONS = [
+    "Quel vélo électrique est disponible pour un tour en montagne ?",
+    "Quels tours passent par le Col du Galibier ?",
+    "Qui est le guide du tour au départ de Carcassonne ?",
+    "Quels avis ont été laissés sur les vélos cargo ?",
+    "Quelles réservations de vélos commencent en décembre ?",
+    "Quel est le prix par jour du tour le plus difficile ?",
+]
+
+
+def run_load(encode, clients, requests_per_client):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        local = []
+        for i in range(requests_per_client):
+            question = f"{QUESTIONS[(offset + i) % len(QUESTIONS)]} ({offset}-{i})"
+            start = time.perf_counter()
+            encode(question)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(args.model)
+    model.encode(QUESTIONS)  # préchauffage
+
+    print(f"{args.clients} concurrent clients x {args.requests} requests")
+    qps, p50, p95 = run_load(model.encode, args.clients, args.requests)
+    print(f"{'per-request encode':<22} {qps:8.1f} q/s   p50 {p50:6.1f} ms   p95 {p95:6.1f} ms")
+
+    batcher = EmbeddingBatcher(model.encode, args.max_batch_size, args.max_wait_ms)
+    qps, p50, p95 = run_load(batcher.encode, args.clients, args.requests)
+    print(f"{'micro-batched encode':<22} {qps:8.1f} q/s   p50 {p50:6.1f} ms   p95 {p95:6.1f} ms")
+    print(f"batcher stats: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Rappel@k et latence de l'index IVF-flat selon nprobe, comparés au scan exact.
+
+Usage (depuis backend/):
+    uv run benchmarks/bench_vector_index.py --embeddings search_index.embeddings.npy
+    uv run benchmarks/bench_vector_index.py --synthetic 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.chatbot.vector_index import ExactIndex, IVFFlatIndex, normalize
+
+
+def synthetic_vectors(n, dim, seed=0):
+    # Vecteurs regroupés en thèmes, plus proche d'un corpus réel qu'un bruit uniforme
+    rng = np.random.default_rng(seed)
+    topics = normalize(rng.normal(size=(max(1, n // 50), dim)))
+    return normalize(topics[rng.integers(len(topics), size=n)] + rng.normal(scale=1.4 / np.sqrt(dim), size=(n, dim)))
+
+
+def timed_search(index, queries, k, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append(set(index.search(q, k, **kwargs)[1].tolist()))
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", help="search_index.embeddings.npy produced by ChatBotService")
+    parser.add_argument("--synthetic", type=int, default=20000, help="corpus size when no index is given")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--nlist", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = normalize(np.load(args.embeddings))
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+
+    rng = np.random.default_rng(1)
+    # Requêtes proches de documents existants, légèrement bruitées
+    queries = normalize(vectors[rng.integers(len(vectors), size=args.queries)]
+                        + 0.05 * rng.normal(size=(args.queries, vectors.shape[1])))
+
+    start = time.perf_counter()
+    ivf = IVFFlatIndex(vectors, nlist=args.nlist)
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, nlist {ivf.nlist} "
+          f"(trained in {time.perf_counter() - start:.2f}s)")
+
+    exact_ms, truth = timed_search(ExactIndex(vectors), queries, args.k)
+    print(f"{'exact':>10}  recall@{args.k} 1.000  {exact_ms:.3f} ms/query")
+
+    nprobe = 1
+    while nprobe <= ivf.nlist:
+        ms, found = timed_search(ivf, queries, args.k, nprobe=nprobe)
+        recall = np.mean([len(a & b) / len(a) for a, b in zip(truth, found)])
+        print(f"{'nprobe ' + str(nprobe):>10}  recall@{args.k} {recall:.3f}  {ms:.3f} ms/query")
+        nprobe *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.sparql_service import SparqlService
+
+DATABASE_FOLDER = os.path.join(os.path.dirname(__file__), "..", "..", "database")
+COMPETENCY_FILE = os.path.join(DATABASE_FOLDER, "cto_competency_questions.txt")
+
+QUERY_HEADER = re.compile(r"^#\s*QUERY\s+(\d+)\s*:\s*(.*)$")
+
+
+def load_graph():
+    ttl_files = [
+        os.path.join(DATABASE_FOLDER, file)
+        for file in os.listdir(DATABASE_FOLDER)
+        if file.endswith(".ttl")
+    ]
+    return SparqlService(ttl_files).get_graph()
+
+
+def load_questions(path=COMPETENCY_FILE):
+    # Blocs "# QUERY n: question" (la question peut continuer sur les commentaires suivants) puis la requête
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            header = QUERY_HEADER.match(line.strip())
+            if header:
+                questions.append({"id": int(header.group(1)), "question": header.group(2).strip(), "sparql": ""})
+            elif not questions:
+                continue
+            elif line.startswith("#"):
+                text = line.lstrip("#").strip()
+                if text and not text.startswith("---") and not questions[-1]["sparql"]:
+                    questions[-1]["question"] += " " + text
+            else:
+                questions[-1]["sparql"] += line
+    return questions
+
+
+def answer_values(graph, sparql):
+    # Valeurs textuelles de la réponse attendue: un document qui en contient une est jugé pertinent
+    values = set()
+    try:
+        rows = list(graph.query(sparql))
+    except Exception as e:
+        print(f"Skipping reference query that rdflib cannot evaluate: {e}")
+        return values
+    for row in rows:
+        for value in row:
+            if value is None:
+                continue
+            text = str(value).strip()
+            if len(text) >= 4 and not text.startswith("http") and not re.fullmatch(r"[\d.,\-]+", text):
+                values.add(text)
+    return values
+
+
+def is_relevant(context, values):
+    return any(value in context for value in values)
@@ -0,0 +1,72 @@
+"""Évalue la recherche du chatbot (dense, BM25, hybride, hybride routée par type de document)
+sur les questions de compétence.
+
+La réponse attendue de chaque question est obtenue en exécutant sa requête SPARQL de référence;
+un document récupéré est pertinent s'il contient une des valeurs de cette réponse.
+
+Usage (depuis backend/): uv run benchmarks/eval_retrieval.py [--k 3] [--questions ../database/cto_queries.txt]
+"""
+import argparse
+import os
+import time
+
+from competency import COMPETENCY_FILE, answer_values, is_relevant, load_graph, load_questions
+from services.chatbot_service import INDEX_FILE, ChatBotService
+from services.chatbot.query_router import QueryRouter
+
+CONFIGS = [
+    ("dense", {"mode": "dense"}),
+    ("bm25", {"mode": "lexical"}),
+    ("hybrid rrf", {"mode": "hybrid", "fusion": "rrf"}),
+    ("hybrid weighted", {"mode": "hybrid", "fusion": "weighted"}),
+    ("hybrid routed", {"mode": "hybrid", "fusion": "rrf", "router": QueryRouter()}),
+]
+
+
+def evaluate(chatbot, questions, k, mode, fusion=None, router=None):
+    if fusion:
+        chatbot.fusion = fusion
+    chatbot.router = router
+    hits, reciprocal_ranks, precisions, elapsed = 0, 0.0, 0.0, 0.0
+    for q in questions:
+        start = time.perf_counter()
+        results = chatbot.search(q["question"], top_k=k, mode=mode)
+        elapsed += time.perf_counter() - start
+
+        relevant = [is_relevant(doc["context"], q["values"]) for doc in results]
+        hits += any(relevant)
+        reciprocal_ranks += next((1 / (rank + 1) for rank, rel in enumerate(relevant) if rel), 0.0)
+        precisions += sum(relevant) / k
+    n = len(questions)
+    return hits / n, reciprocal_ranks / n, precisions / n, elapsed / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=COMPETENCY_FILE)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--cache-file", default=INDEX_FILE)
+    parser.add_argument("--lexical-weight", type=float, default=0.5)
+    args = parser.parse_args()
+
+    graph = load_graph()
+    questions = load_questions(args.questions)
+    for q in questions:
+        q["values"] = answer_values(graph, q["sparql"])
+    questions = [q for q in questions if q["values"]]
+
+    chatbot = ChatBotService(
+        graph, os.getenv("GEMINI_API_KEY", "unused"), cache_file=args.cache_file,
+        lexical_weight=args.lexical_weight
+    )
+
+    print(f"{len(questions)} questions with a non-empty reference answer, k={args.k}")
+    print(f"{'retrieval':<16} {'hit@k':>6} {'MRR':>6} {'P@k':>6} {'ms/query':>9}")
+    for name, config in CONFIGS:
+        hit, mrr, precision, ms = evaluate(chatbot, questions, args.k, config["mode"], config.get("fusion"),
+                                            config.get("router"))
+        print(f"{name:<16} {hit:>6.2f} {mrr:>6.2f} {precision:>6.2f} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
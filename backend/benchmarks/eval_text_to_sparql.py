@@ -0,0 +1,76 @@
+"""Taille et couverture du prompt text-to-SPARQL élagué, sur les questions de compétence.
+
+Couverture: part des termes du schéma (cs:...) utilisés par la requête de référence qui figurent dans
+le prompt. Avec --execute, chaque prompt (complet et élagué) est aussi envoyé au LLM configuré et la
+requête générée (validée par rdflib) est jugée juste si ses valeurs recoupent celles de la requête de référence.
+
+Usage (depuis backend/): uv run benchmarks/eval_text_to_sparql.py [--budgets 2000,3000,4000] [--execute]
+"""
+import argparse
+import os
+import re
+
+from competency import COMPETENCY_FILE, DATABASE_FOLDER, answer_values, load_graph, load_questions
+from services.registry import ServiceRegistry
+from services.text_to_sparql.text_to_sparql_service import TextToSparqlService
+
+SCHEMA_TERM = re.compile(r"(?:cs:|<http://data\.cyclingtour\.fr/schema#)(\w+)")
+
+
+def term_coverage(prompt, sparql):
+    terms = set(SCHEMA_TERM.findall(sparql))
+    if not terms:
+        return 1.0
+    found = [t for t in terms if f"cs:{t}" in prompt or f"schema#{t}>" in prompt]
+    return len(found) / len(terms)
+
+
+def is_correct(graph, service, prompt, expected):
+    # Même critère que eval_retrieval: une valeur de la réponse attendue se retrouve dans la réponse obtenue
+    try:
+        query = service.generate_valid_sparql(prompt)
+    except ValueError:
+        return False
+    return bool(expected & answer_values(graph, query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=COMPETENCY_FILE)
+    parser.add_argument("--budgets", default="2000,3000,4000")
+    parser.add_argument("--execute", action="store_true", help="call the LLM and check the generated queries")
+    args = parser.parse_args()
+
+    graph = load_graph()
+    with open(os.path.join(DATABASE_FOLDER, "cto_schema.ttl"), encoding="utf-8") as f:
+        schema_content = f.read()
+    questions = load_questions(args.questions)
+    for q in questions:
+        q["values"] = answer_values(graph, q["sparql"])
+
+    llm = ServiceRegistry().llm_provider() if args.execute else None
+    budgets = [0] + [int(b) for b in args.budgets.split(",")]
+    print(f"{len(questions)} questions")
+    print(f"{'budget':>8} {'tokens':>8} {'full':>8} {'coverage':>9} {'complete':>9}" + (f" {'correct':>8}" if args.execute else ""))
+    for budget in budgets:
+        service = TextToSparqlService(graph, schema_content, os.getenv("GEMINI_API_KEY"),
+                                      llm=llm, prompt_budget=budget, cache_file=None)
+        tokens, full, coverage, complete, correct = 0, 0, 0.0, 0, 0
+        for q in questions:
+            prompt, stats = service.build_prompt(q["question"])
+            tokens += stats["prompt_tokens"]
+            full += stats["full_prompt_tokens"]
+            covered = term_coverage(prompt, q["sparql"])
+            coverage += covered
+            complete += covered == 1.0
+            if args.execute and q["values"]:
+                correct += is_correct(graph, service, prompt, q["values"])
+        n = len(questions)
+        line = f"{budget or 'full':>8} {tokens / n:>8.0f} {full / n:>8.0f} {coverage / n:>9.2f} {complete:>5}/{n:<3}"
+        if args.execute:
+            line += f" {correct:>4}/{sum(1 for q in questions if q['values'])}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
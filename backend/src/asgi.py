@@ -0,0 +1,156 @@
+"""Serveur asyncio (ASGI) pour les routes qui attendent un service distant: /api/enrich (DBpedia),
+/api/ask, /api/ask/stream (LLM) et /api/text-to-sparql. Une requête en attente ne bloque aucun thread;
+les calculs (SPARQL local, encodage, recherche, validation) tournent dans un pool borné de
+ASGI_COMPUTE_WORKERS threads. Toutes les autres routes sont servies par l'application Flask.
+
+Usage (depuis backend/): uv run src/asgi.py, ou uv run uvicorn asgi:app --app-dir src --port 5000
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from main import app as flask_app
+from routes.api import sse_error, sse_message
+from services.llm.scheduler import LLMUnavailableError
+from services.registry import registry
+
+# Évaluation SPARQL et recherche sont liées au CPU (et au GIL): quelques threads suffisent, les requêtes
+# en surnombre attendent leur tour sans occuper de thread
+compute = ThreadPoolExecutor(max_workers=int(os.getenv("ASGI_COMPUTE_WORKERS", "4")), thread_name_prefix="compute")
+
+
+async def run(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(compute, partial(fn, *args, **kwargs))
+
+
+def llm_unavailable(e):
+    return JSONResponse({'error': str(e), 'reason': e.reason}, 503,
+                        headers={'Retry-After': str(max(1, round(e.retry_after)))})
+
+
+async def json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return {}
+
+
+async def enrich(request):
+    data = await json_body(request)
+    local_query = data.get("query")
+    requested_fields = data.get("fields")
+    if not local_query:
+        return JSONResponse({"error": "Query is required"}, 400)
+
+    try:
+        sparql = await run(registry.sparql_service)
+        local_results = await run(sparql.execute_query, local_query)
+
+        dbpedia = registry.dbpedia_service()
+        uris_to_fetch = dbpedia.uris_to_enrich(local_results)
+        if not uris_to_fetch:
+            return JSONResponse({"message": "No URIs found to enrich"}, 200)
+
+        remote_data = await dbpedia.get_enriched_data_bulk_async(uris_to_fetch, fields=requested_fields)
+        return JSONResponse(dbpedia.merge(local_results, remote_data), 200)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, 500)
+
+
+async def ask(request):
+    data = await json_body(request)
+    question = data.get('question')
+    if not question:
+        return JSONResponse({'error': 'Question is required'}, 400)
+
+    types = data.get('types')
+    chatbot = await run(registry.chatbot_service)
+    try:
+        chatbot.check_types(types)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, 400)
+
+    try:
+        answer = await chatbot.ask_gemini_async(question, types=types, executor=compute)
+        return JSONResponse({'question': question, 'answer': answer}, 200)
+    except LLMUnavailableError as e:
+        return llm_unavailable(e)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, 500)
+
+
+async def ask_stream(request):
+    if request.method == "POST":
+        data = await json_body(request)
+        question, types = data.get('question'), data.get('types')
+    else:
+        question, types = request.query_params.get('question'), request.query_params.get('types')
+        types = types.split(',') if types else None
+    if not question:
+        return JSONResponse({'error': 'Question is required'}, 400)
+
+    chatbot = await run(registry.chatbot_service)
+    try:
+        chatbot.check_types(types)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, 400)
+
+    async def events():
+        stream = chatbot.ask_gemini_astream(question, types=types, executor=compute)
+        try:
+            async for event, payload in stream:
+                yield sse_message(event, payload)
+        except Exception as e:
+            yield sse_error(e)
+        finally:
+            # Client déconnecté: la génération amont est annulée
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def text_to_sparql(request):
+    data = await json_body(request)
+    text = data.get("text")
+    if not text:
+        return JSONResponse({"error": "Text is required"}, 400)
+
+    try:
+        service = await run(registry.text_to_sparql_service)
+        return JSONResponse(await service.text_to_sparql_async(text, executor=compute), 200)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 422)
+    except LLMUnavailableError as e:
+        return llm_unavailable(e)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+
+
+routes = [
+    Route("/api/enrich", enrich, methods=["POST"]),
+    Route("/api/ask", ask, methods=["POST"]),
+    Route("/api/ask/stream", ask_stream, methods=["GET", "POST"]),
+    Route("/api/text-to-sparql", text_to_sparql, methods=["POST"]),
+    # Routes synchrones (requêtes SPARQL, caches, métriques, documentation...) inchangées
+    Mount("/", app=WSGIMiddleware(flask_app)),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv("PORT", "5000")))
@@ -0,0 +1,39 @@
+"""Construit (ou met à jour) l'index du chatbot hors du démarrage du serveur.
+
+Usage (depuis backend/): uv run src/build_index.py [--workers 4] [--rebuild]
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from services.startup import startup_report
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to encode documents (default: one per core)")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the existing index and re-encode everything")
+    args = parser.parse_args()
+
+    # Même configuration que le serveur (CHATBOT_* dans .env), seul le nombre de processus change
+    os.environ["CHATBOT_ENCODE_WORKERS"] = str(args.workers)
+    from services.registry import registry
+
+    if args.rebuild:
+        from services.chatbot_service import INDEX_FILE
+
+        cache_file = os.getenv("CHATBOT_INDEX_FILE") or INDEX_FILE
+        for path in (cache_file, os.path.splitext(cache_file)[0] + ".embeddings.npy"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    chatbot = registry.chatbot_service()
+    print(f"Index ready: {len(chatbot.documents)} documents.")
+    print(startup_report()["phases"])
+
+
+if __name__ == "__main__":
+    main()
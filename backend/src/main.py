@@ -1,9 +1,41 @@
+import os
+import threading
+import time
 from flask import Flask
-from routes.api import api_blueprint
+from services.startup import PROCESS_START, record_phase, startup_report, timed_phase
 
-app = Flask(__name__)
+with timed_phase("app.import_routes"):
+    from routes.api import api_blueprint
+    from services.registry import registry
 
-app.register_blueprint(api_blueprint)
+
+first_request = threading.Event()
+
+
+def create_app(warmup=None):
+    # warmup: "none" (tout est chargé à la première requête qui en a besoin), "background" ou "blocking"
+    warmup = warmup or os.getenv("SERVICES_WARMUP", "none")
+
+    with timed_phase("app.create"):
+        app = Flask(__name__)
+        app.register_blueprint(api_blueprint)
+
+    @app.after_request
+    def report_first_request(response):
+        if not first_request.is_set():
+            first_request.set()
+            record_phase("time_to_first_request", time.perf_counter() - PROCESS_START)
+            print(f"Time to first request: {startup_report()}")
+        return response
+
+    if warmup in ("background", "blocking"):
+        services = [s.strip() for s in os.getenv("SERVICES_WARMUP_LIST", "sparql,chatbot,text_to_sparql").split(",")]
+        registry.warmup(services, background=(warmup == "background"))
+
+    return app
+
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000, debug=True)
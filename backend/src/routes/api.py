@@ -1,13 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_restx import Api, Resource, fields
 from flask_cors import CORS
-from services.sparql_service import SparqlService
-from services.dbpedia_service import DbpediaService
-from services.text_to_sparql.text_to_sparql_service import TextToSparqlService
-from services.chatbot_service import ChatBotService
-from urllib.parse import unquote
-from dotenv import load_dotenv
+from services.registry import registry
+from services.llm.scheduler import LLMUnavailableError
+from services.sparql_service import QueryRejectedError
+from services.startup import process_memory, startup_report
+import json
 import os
+from dotenv import load_dotenv
 
 load_dotenv()
 
@@ -21,24 +21,6 @@ api = Api(
     doc="/docs",
 )
 
-database_folder = os.path.join(os.path.dirname(__file__), "..", "..", "..", "database")
-ttl_files = [
-    os.path.join(database_folder, file)
-    for file in os.listdir(database_folder)
-    if file.endswith(".ttl")
-]
-gemini_key = os.getenv("GEMINI_API_KEY")
-
-with open(os.path.join(database_folder, "cto_schema.ttl"), "r", encoding="utf-8") as f:
-    schema_content = f.read()
-
-sparql_service = SparqlService(ttl_files)
-dbpedia_service = DbpediaService()
-chatbot_service = ChatBotService(sparql_service.graph, gemini_key)
-text_to_sparql_service = TextToSparqlService(
-    sparql_service.get_graph(), schema_content, gemini_key
-)
-
 query_model = api.model(
     "Query",
     {"query": fields.String(required=True, description="SPARQL query to execute")},
@@ -52,10 +34,22 @@ text_to_sqarl_model = api.model("TextToSparql", {
     "text": fields.String(required=True, description="Natural language text to convert to SPARQL"),
 })
 
+text_to_sparql_execute_model = api.model("TextToSparqlExecute", {
+    "text": fields.String(required=True, description="Natural language question to translate and run"),
+    "limit": fields.Integer(required=False, description="Maximum number of rows (capped by SPARQL_MAX_ROWS)"),
+    "timeout": fields.Float(required=False, description="Execution time limit in seconds (capped by SPARQL_TIMEOUT_S)"),
+    "stream": fields.Boolean(required=False, description="Stream the query then batches of rows as Server-Sent Events"),
+})
+
 nl_query_model = api.model('NaturalLanguageQuery', {
-    'question': fields.String(required=True, description='User question in natural language (e.g. "Where does the tour start?")')
+    'question': fields.String(required=True, description='User question in natural language (e.g. "Where does the tour start?")'),
+    'types': fields.List(fields.String, required=False, description='Only retrieve these document types (Tour, Path, Bike, Review, Booking); routed from the question when omitted')
 })
 
+def llm_unavailable(e):
+    # Refus immédiat de l'ordonnanceur LLM (surcharge, circuit ouvert, délai): 503 avec Retry-After
+    return {'error': str(e), 'reason': e.reason}, 503, {'Retry-After': str(max(1, round(e.retry_after)))}
+
 link_prediction_model = api.model("LinkPrediction", {
     "client_uri": fields.String(required=True, description="URI of the client for whom to predict tour recommendations"),
 })
@@ -70,7 +64,7 @@ class QueryEndpoint(Resource):
             return {"error": "Query is required"}, 400
 
         try:
-            results = sparql_service.execute_query(query)
+            results = registry.sparql_service().execute_query(query)
             return results, 200
         except Exception as e:
             return {"error": str(e)}, 500
@@ -87,32 +81,15 @@ class EnrichEndpoint(Resource):
             return {"error": "Query is required"}, 400
 
         try:
-            local_results = sparql_service.execute_query(local_query)
-
-            uris_to_fetch = set()
-            for row in local_results:
-                uri = row.get("sameAs")
-                if uri:
-                    uris_to_fetch.add(uri)
-    
+            local_results = registry.sparql_service().execute_query(local_query)
+
+            dbpedia = registry.dbpedia_service()
+            uris_to_fetch = dbpedia.uris_to_enrich(local_results)
             if not uris_to_fetch:
                 return {"message": "No URIs found to enrich"}, 200
 
-            remote_data = dbpedia_service.get_enriched_data_bulk(
-                list(uris_to_fetch), fields=requested_fields
-            )
-
-            final_response = []
-            for row in local_results:
-                merged_item = row.copy()
-
-                uri_key = row.get("sameAs")
-
-                if unquote(uri_key) and uri_key in remote_data:
-                    merged_item.update(remote_data[unquote(uri_key)])
-
-                final_response.append(merged_item)
-
+            remote_data = dbpedia.get_enriched_data_bulk(uris_to_fetch, fields=requested_fields)
+            final_response = dbpedia.merge(local_results, remote_data)
             return final_response, 200
 
         except Exception as e:
@@ -126,13 +103,81 @@ class NaturalLanguageEndpoint(Resource):
         question = request.json.get('question')
         if not question:
             return {'error': 'Question is required'}, 400
-        
+
+        types = request.json.get('types')
+        chatbot = registry.chatbot_service()
+        try:
+            chatbot.check_types(types)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
         try:
-            answer = chatbot_service.ask_gemini(question)
+            answer = chatbot.ask_gemini(question, types=types)
             return {'question': question, 'answer': answer}, 200
+        except LLMUnavailableError as e:
+            return llm_unavailable(e)
         except Exception as e:
             return {'error': str(e)}, 500
 
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_error(e):
+    if isinstance(e, LLMUnavailableError):
+        return sse_message("error", {'error': str(e), 'reason': e.reason, 'retry_after': e.retry_after})
+    return sse_message("error", {'error': str(e)})
+
+def sse_events(events):
+    try:
+        for event, data in events:
+            yield sse_message(event, data)
+    except Exception as e:
+        yield sse_error(e)
+    finally:
+        # Appelé aussi quand le client se déconnecte: propage la fermeture jusqu'au flux Gemini
+        events.close()
+
+@api.route('/ask/stream')
+class StreamingNaturalLanguageEndpoint(Resource):
+    @api.expect(nl_query_model)
+    def post(self):
+        """Ask the chatbot and stream retrieval results then answer tokens (Server-Sent Events)"""
+        return self._stream(request.json.get('question'), request.json.get('types'))
+
+    @api.doc(params={'question': 'User question in natural language', 'types': 'Comma-separated document types'})
+    def get(self):
+        """Same as POST, for EventSource clients"""
+        types = request.args.get('types')
+        return self._stream(request.args.get('question'), types.split(',') if types else None)
+
+    def _stream(self, question, types=None):
+        if not question:
+            return {'error': 'Question is required'}, 400
+
+        chatbot = registry.chatbot_service()
+        try:
+            chatbot.check_types(types)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        events = chatbot.ask_gemini_stream(question, types=types)
+        return Response(
+            stream_with_context(sse_events(events)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+@api.route('/ask/cache')
+class AnswerCacheEndpoint(Resource):
+    def get(self):
+        """Hit-rate metrics of the chatbot answer cache"""
+        return registry.chatbot_service().answer_cache.stats(), 200
+
+    def delete(self):
+        """Empty the chatbot answer cache"""
+        registry.chatbot_service().answer_cache.invalidate()
+        return registry.chatbot_service().answer_cache.stats(), 200
+
 @api.route("/text-to-sparql")
 class TextToSparqlEndpoint(Resource):
     @api.expect(text_to_sqarl_model)
@@ -144,11 +189,86 @@ class TextToSparqlEndpoint(Resource):
             return {"error": "Text is required"}, 400
         try:
             print("Received Text:" + text)
-            sparql_query = text_to_sparql_service.text_to_sparql(text)
+            sparql_query = registry.text_to_sparql_service().text_to_sparql(text)
             return sparql_query, 200
+        except ValueError as e:
+            return {"error": str(e)}, 422
+        except LLMUnavailableError as e:
+            return llm_unavailable(e)
         except Exception as e:
             return {"error": str(e)}, 500
 
+@api.route("/text-to-sparql/execute")
+class TextToSparqlExecuteEndpoint(Resource):
+    @api.expect(text_to_sparql_execute_model)
+    def post(self):
+        """Translate a question to SPARQL, validate and run it: query, rows and per-stage timings in one response"""
+        data = request.json
+        text = data.get("text")
+        if not text:
+            return {"error": "Text is required"}, 400
+
+        service = registry.text_to_sparql_service()
+        try:
+            max_rows, timeout = service.execution_limits(data.get("limit"), data.get("timeout"))
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        events = service.translate_and_execute(text, max_rows=max_rows, timeout=timeout)
+        if data.get("stream"):
+            return Response(
+                stream_with_context(sse_events(events)),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+            )
+
+        response = {"results": []}
+        try:
+            for event, payload in events:
+                if event == "rows":
+                    response["results"].extend(payload["rows"])
+                else:
+                    response.update(payload)
+            return response, 200
+        except ValueError as e:
+            return {"error": str(e)}, 422
+        except LLMUnavailableError as e:
+            return llm_unavailable(e)
+        except QueryRejectedError as e:
+            return {"error": str(e), **response}, 503, {'Retry-After': str(max(1, round(e.retry_after)))}
+        except Exception as e:
+            return {"error": str(e), **response}, 500
+
+@api.route("/text-to-sparql/cache")
+class TranslationCacheEndpoint(Resource):
+    def get(self):
+        """Hit-rate of the question -> SPARQL cache and validation retries"""
+        service = registry.text_to_sparql_service()
+        return {**service.translation_cache.stats(), "validation": service.validation_stats}, 200
+
+    def delete(self):
+        """Empty the question -> SPARQL cache"""
+        service = registry.text_to_sparql_service()
+        service.translation_cache.invalidate()
+        return service.translation_cache.stats(), 200
+
+@api.route("/llm/metrics")
+class LLMMetricsEndpoint(Resource):
+    def get(self):
+        """Calls, prompt tokens, latency percentiles and errors of the LLM, by caller"""
+        return registry.llm_provider().stats(), 200
+
+    def delete(self):
+        """Reset the LLM call metrics"""
+        registry.llm_provider().metrics.reset()
+        return registry.llm_provider().stats(), 200
+
+@api.route("/startup")
+class StartupEndpoint(Resource):
+    def get(self):
+        """Startup and lazy-initialization timings by phase, and memory of the serving process"""
+        return {**startup_report(), "pid": os.getpid(), "memory": process_memory()}, 200
+
 @api.route("/prediction")
 class LinkPredictionEndpoint(Resource):
     @api.expect(link_prediction_model)
@@ -159,7 +279,7 @@ class LinkPredictionEndpoint(Resource):
             return {"error": "Client URI is required"}, 400
 
         try:
-            predictions = sparql_service.predict_recommendations(client_uri)
+            predictions = registry.sparql_service().predict_recommendations(client_uri)
             return predictions, 200
         except Exception as e:
             return {"error": str(e)}, 500
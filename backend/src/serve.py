@@ -0,0 +1,270 @@
+"""Lancement en production sur plusieurs processus (pre-fork). Le processus maître charge une seule fois le
+graphe (fichiers TTL + inférence owlrl), MiniLM, les index du chatbot et le résumé du text-to-SPARQL, puis
+fork PREFORK_WORKERS workers qui acceptent les connexions sur le même port. Les workers héritent de cette
+mémoire en copie sur écriture: seules les pages qu'un worker modifie lui sont propres. Les vecteurs du
+chatbot sont lus en mmap dans search_index.embeddings.npy, donc partagés par le cache de pages.
+
+Signaux du maître:
+    SIGHUP   recharge les données (TTL, index) puis remplace les workers un par un, sans interruption
+    SIGUSR1  affiche la mémoire du maître et de chaque worker (Rss, Pss, partagée, privée)
+    SIGTERM / SIGINT  arrête les workers (fin des requêtes en cours) puis le maître
+Avec PREFORK_WATCH_S > 0, le rechargement est aussi déclenché quand un fichier TTL change.
+
+Usage (depuis backend/): uv run src/serve.py [--workers 4] [--app asgi|flask] [--port 5000]
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from services.registry import registry
+from services.startup import process_memory, timed_phase
+
+PRELOADED_SERVICES = "sparql,embedding_model,chatbot,text_to_sparql"
+# Services construits à partir des données: reconstruits au rechargement (MiniLM et le LLM sont conservés)
+DATA_SERVICES = ["sparql", "chatbot", "text_to_sparql"]
+
+
+def flush_worker_caches():
+    # os._exit ne passe pas par atexit: sans cela, un arrêt ou un rechargement perd les dernières traductions
+    if not registry.is_loaded("text_to_sparql"):
+        return
+    try:
+        registry.text_to_sparql_service().translation_cache.flush()
+    except Exception:
+        traceback.print_exc()
+
+
+def load_services(services):
+    with timed_phase("prefork.load"):
+        for name in services:
+            service = registry.load(name)
+            if name == "text_to_sparql":
+                # Résumé des données et découpage du schéma: calculés une fois ici plutôt que dans chaque worker
+                service.prompt_builder()
+    # Tout ce qui est chargé jusqu'ici n'est plus parcouru par le ramasse-miettes: sans cela, chaque collecte
+    # dans un worker écrit dans les en-têtes des objets et recopie peu à peu tout le graphe
+    gc.collect()
+    gc.freeze()
+
+
+def data_version():
+    files = sorted(registry.ttl_files())
+    return [(path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in files]
+
+
+def import_app(kind):
+    # Importée dans le maître: le code et les objets de l'application sont eux aussi partagés
+    if kind == "asgi":
+        from asgi import app
+    else:
+        from main import app
+    return app
+
+
+def run_worker(kind, app, sock, ready):
+    for signum in (signal.SIGHUP, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # N workers qui encodent chacun sur tous les cœurs se gênent; et le pool OpenMP éventuellement démarré
+    # par le maître n'existe pas dans le processus fils
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(int(os.getenv("PREFORK_TORCH_THREADS", "1")))
+
+    if kind == "asgi":
+        import uvicorn
+
+        server = uvicorn.Server(uvicorn.Config(app, log_level=os.getenv("LOG_LEVEL", "warning"), lifespan="off"))
+        os.write(ready, b"1")
+        os.close(ready)
+        # uvicorn gère SIGTERM: plus de nouvelles connexions, les requêtes en cours se terminent
+        server.run(sockets=[sock])
+    else:
+        from werkzeug.serving import make_server
+
+        host, port = sock.getsockname()[:2]
+        server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+        # shutdown() attend la fin de serve_forever: appelé depuis un autre thread
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+        os.write(ready, b"1")
+        os.close(ready)
+        server.serve_forever()
+        server.server_close()
+
+
+class PreforkMaster:
+    def __init__(self, kind, app, sock, workers, services, graceful_timeout=30.0, report_every=0.0, watch_every=0.0):
+        self.kind = kind
+        self.app = app
+        self.sock = sock
+        self.size = workers
+        self.services = services
+        self.graceful_timeout = graceful_timeout
+        self.report_every = report_every
+        self.watch_every = watch_every
+        # pid -> génération des données avec laquelle le worker a été forké
+        self.workers = {}
+        self.generation = 0
+        self.requests = set()
+        self.running = True
+
+    def spawn(self):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            code = 0
+            try:
+                run_worker(self.kind, self.app, self.sock, write_end)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                flush_worker_caches()
+                os._exit(code)
+        os.close(write_end)
+        self.workers[pid] = self.generation
+        # Le worker écrit un octet juste avant de servir; fin de fichier s'il meurt avant
+        ready = os.read(read_end, 1)
+        os.close(read_end)
+        if not ready:
+            print(f"Worker {pid} failed to start")
+            return None
+        return pid
+
+    def stop_worker(self, pid):
+        self.workers.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                return
+            time.sleep(0.05)
+        print(f"Worker {pid} did not stop within {self.graceful_timeout:g}s, killing it")
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if self.workers.pop(pid, None) is not None and self.running:
+                print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting it")
+                time.sleep(1)
+                self.spawn()
+
+    def reload(self):
+        print("Reloading data...")
+        start = time.perf_counter()
+        # Les workers en service gardent leur copie des anciennes données; le maître construit les nouvelles
+        gc.unfreeze()
+        previous = registry.reset(DATA_SERVICES)
+        try:
+            load_services(self.services)
+        except Exception as e:
+            print(f"Reload failed, keeping the current workers: {e}")
+            registry.restore(previous)
+            gc.freeze()
+            return
+        del previous
+        self.generation += 1
+        print(f"Data reloaded in {time.perf_counter() - start:.1f}s, replacing workers")
+
+        # Un nouveau worker prêt avant d'arrêter chaque ancien: la capacité ne baisse jamais
+        for pid in [pid for pid, generation in self.workers.items() if generation < self.generation]:
+            if self.spawn() is None:
+                print("New worker failed to start, keeping the remaining old workers")
+                return
+            self.stop_worker(pid)
+        self.report()
+
+    def report(self):
+        rows = [("master", os.getpid())] + [(f"worker g{generation}", pid) for pid, generation in self.workers.items()]
+        total = 0.0
+        for name, pid in rows:
+            memory = process_memory(pid)
+            total += memory.get("pss_mb", 0.0)
+            print(f"{name:<11} pid {pid:>7}  rss {memory.get('rss_mb', 0):>8.1f} MB  pss {memory.get('pss_mb', 0):>8.1f} MB"
+                  f"  shared {memory.get('shared_mb', 0):>8.1f} MB  private {memory.get('private_mb', 0):>8.1f} MB")
+        print(f"Total memory (pss): {total:.1f} MB for {len(self.workers)} workers")
+
+    def run(self):
+        for signum in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.requests.add(signum))
+
+        for _ in range(self.size):
+            self.spawn()
+        print(f"Serving {self.kind} app with {len(self.workers)} workers on port {self.sock.getsockname()[1]}")
+        self.report()
+
+        version = data_version() if self.watch_every else None
+        next_report = time.monotonic() + self.report_every
+        next_watch = time.monotonic() + self.watch_every
+        while True:
+            requests, self.requests = self.requests, set()
+            if requests & {signal.SIGTERM, signal.SIGINT}:
+                break
+            self.reap()
+            now = time.monotonic()
+            if self.watch_every and now >= next_watch:
+                next_watch = now + self.watch_every
+                current = data_version()
+                if current != version:
+                    version = current
+                    requests.add(signal.SIGHUP)
+            if signal.SIGHUP in requests:
+                self.reload()
+            if signal.SIGUSR1 in requests or (self.report_every and now >= next_report):
+                next_report = now + self.report_every
+                self.report()
+            time.sleep(0.2)
+
+        print("Stopping workers...")
+        self.running = False
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PREFORK_WORKERS") or os.cpu_count() or 2))
+    parser.add_argument("--app", choices=["asgi", "flask"], default=os.getenv("PREFORK_APP", "asgi"))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5000")))
+    args = parser.parse_args()
+
+    services = [s.strip() for s in os.getenv("PREFORK_SERVICES", PRELOADED_SERVICES).split(",") if s.strip()]
+    # Chargement complet dans le maître, pas de préchargement en arrière-plan dans l'application
+    os.environ["SERVICES_WARMUP"] = "none"
+    app = import_app(args.app)
+    start = time.perf_counter()
+    load_services(services)
+    print(f"Services loaded in {time.perf_counter() - start:.1f}s: {', '.join(services)}")
+
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    PreforkMaster(
+        args.app, app, sock, args.workers, services,
+        graceful_timeout=float(os.getenv("PREFORK_GRACEFUL_TIMEOUT_S", "30")),
+        report_every=float(os.getenv("PREFORK_REPORT_S", "0")),
+        watch_every=float(os.getenv("PREFORK_WATCH_S", "0")),
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_question(question):
+    question = unicodedata.normalize("NFKC", str(question)).casefold()
+    question = re.sub(r"\s+", " ", question)
+    return question.strip(" ?!.;,")
+
+
+class AnswerCache:
+    """Cache de réponses à deux niveaux: question normalisée exacte, puis question proche (embedding)
+    avec exactement les mêmes documents de contexte. LRU borné + TTL, vidé à chaque reconstruction d'index."""
+
+    def __init__(self, max_entries=512, ttl=3600, similarity_threshold=0.92):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()
+        self._by_context = {}
+        self._lock = threading.Lock()
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get_exact(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return entry["answer"]
+
+    def get_semantic(self, embedding, context_key):
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key in list(self._by_context.get(context_key, ())):
+                entry = self._live_entry(key)
+                if entry is None:
+                    continue
+                score = float(np.dot(entry["embedding"], embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._counters["semantic_hits"] += 1
+            return self._entries[best_key]["answer"]
+
+    def put(self, question, embedding, context_key, answer):
+        key = normalize_question(question)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": np.asarray(embedding, dtype=np.float32),
+                "context_key": context_key,
+                "created": time.monotonic(),
+            }
+            self._by_context.setdefault(context_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self._counters["invalidations"] += 1
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl and time.monotonic() - entry["created"] > self.ttl:
+            self._remove(key)
+            entry = None
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_context.get(entry["context_key"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry["context_key"]]
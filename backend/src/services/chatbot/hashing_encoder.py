@@ -0,0 +1,48 @@
+import hashlib
+
+import numpy as np
+
+from .lexical_index import tokenize
+
+# CHATBOT_MODEL=hashing: encodeur sans modèle ni réseau, pour le mode stub (CI, benchmarks hors ligne)
+HASHING_MODEL = "hashing"
+
+
+class HashingEncoder:
+    """Remplaçant de SentenceTransformer hors ligne: mots et trigrammes de caractères hachés dans dim
+    composantes, puis normalisés. Déterministe et sans dépendance; la similarité n'est que lexicale."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _bucket(self, feature):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            features = [token] + [f"#{token[i:i + 3]}" for i in range(max(1, len(token) - 2))]
+            for feature in features:
+                index, sign = self._bucket(feature)
+                vector[index] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        # Même contrat que SentenceTransformer.encode: un texte -> un vecteur, une liste -> une matrice
+        if isinstance(sentences, str):
+            return self._vector(sentences)
+        return np.array([self._vector(text) for text in sentences], dtype=np.float32).reshape(-1, self.dim)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+def load_embedding_model(model_name):
+    if model_name == HASHING_MODEL:
+        return HashingEncoder()
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
@@ -0,0 +1,101 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# Mots vides français (et quelques anglais), sans accents puisque le texte est normalisé avant filtrage
+STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "c", "d", "dans", "de", "des", "du", "elle", "en", "est", "et",
+    "eu", "il", "ils", "j", "je", "l", "la", "le", "les", "leur", "leurs", "lui", "m", "ma", "mais", "me",
+    "mes", "moi", "mon", "n", "ne", "nos", "notre", "nous", "on", "ou", "par", "pas", "pour", "qu", "que",
+    "quel", "quelle", "quelles", "quels", "qui", "s", "sa", "sans", "se", "ses", "son", "sont", "sur", "t",
+    "ta", "te", "tes", "toi", "ton", "tu", "un", "une", "vos", "votre", "vous", "y", "ete", "etre", "avoir",
+    "the", "of", "and", "to", "in", "is", "for", "on", "with", "what", "which", "who",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    # Minuscules sans accents ("Dénivelé" -> "denivele"); les élisions (l', d', qu') tombent avec les mots vides
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for token in TOKEN_RE.findall(text):
+        if token in STOPWORDS:
+            continue
+        # Pluriel naïf: "cols" -> "col", "velos" -> "velo"
+        if len(token) > 3 and token[-1] in "sx" and not token.isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Index inversé BM25; les poids par posting sont précalculés, une requête se résume à des additions."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.size = len(documents)
+        doc_tokens = [tokenize(doc) for doc in documents]
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = lengths.mean() if self.size and lengths.mean() > 0 else 1.0
+
+        postings = {}
+        for doc_id, tokens in enumerate(doc_tokens):
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(doc_id)
+                postings[token][1].append(tf)
+
+        self.postings = {}
+        for token, (ids, tfs) in postings.items():
+            ids = np.array(ids, dtype=np.int64)
+            tfs = np.array(tfs, dtype=np.float32)
+            idf = np.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / avg_length)
+            self.postings[token] = (ids, (idf * tfs * (k1 + 1) / (tfs + norm)).astype(np.float32))
+
+    def scores(self, query):
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token in self.postings:
+                ids, weights = self.postings[token]
+                scores[ids] += weights
+        return scores
+
+    def search(self, query, k, allowed=None):
+        scores = self.scores(query)
+        ids = np.flatnonzero(scores > 0)
+        if allowed is not None:
+            ids = np.intersect1d(ids, allowed, assume_unique=True)
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.float32), ids
+        k = min(k, len(ids))
+        best = ids[np.argpartition(-scores[ids], k - 1)[:k]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return scores[best], best
+
+
+def fuse(dense, lexical, method="rrf", lexical_weight=0.5, rrf_k=60):
+    """Fusionne deux listes (scores, ids) triées; renvoie les ids triés par score fusionné."""
+    fused = {}
+    if method == "rrf":
+        # Reciprocal rank fusion: seul le rang compte, insensible à l'échelle des scores
+        for weight, (_, ids) in ((1 - lexical_weight, dense), (lexical_weight, lexical)):
+            for rank, doc_id in enumerate(ids.tolist()):
+                fused[doc_id] = fused.get(doc_id, 0.0) + weight / (rrf_k + rank + 1)
+    elif method == "weighted":
+        # Combinaison linéaire des scores ramenés dans [0, 1] par liste
+        for weight, (scores, ids) in ((1 - lexical_weight, dense), (lexical_weight, lexical)):
+            if len(ids) == 0:
+                continue
+            low, high = float(scores.min()), float(scores.max())
+            for score, doc_id in zip(scores.tolist(), ids.tolist()):
+                normalized = (score - low) / (high - low) if high > low else 1.0
+                fused[doc_id] = fused.get(doc_id, 0.0) + weight * normalized
+    else:
+        raise ValueError(f"Unknown fusion method: {method}")
+    return sorted(fused, key=fused.get, reverse=True)
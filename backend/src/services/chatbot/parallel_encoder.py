@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# En dessous, démarrer les processus (un modèle chargé par processus) coûte plus que l'encodage
+MIN_DOCUMENTS_PER_WORKER = 256
+
+_worker_model = None
+
+
+def _load_model(model_name):
+    from .hashing_encoder import load_embedding_model
+
+    return load_embedding_model(model_name)
+
+
+def _init_worker(model_name, loader, threads):
+    global _worker_model
+    # Sans ça, chaque processus lance autant de threads torch qu'il y a de cœurs
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = (loader or _load_model)(model_name)
+
+
+def _encode_shard(texts, batch_size):
+    start = time.perf_counter()
+    vectors = np.asarray(_worker_model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    return vectors, time.perf_counter() - start
+
+
+def shard(texts, n_shards):
+    # Découpage contigu: la concaténation des résultats redonne l'ordre d'origine
+    bounds = np.linspace(0, len(texts), n_shards + 1).astype(int)
+    return [texts[bounds[i]:bounds[i + 1]] for i in range(n_shards) if bounds[i] < bounds[i + 1]]
+
+
+def encode_parallel(texts, model_name, workers, batch_size=32, loader=None, shards_per_worker=4):
+    """Encode texts sur un pool de processus (spawn), chacun avec sa copie du modèle.
+
+    loader(model_name) remplace SentenceTransformer(model_name); il doit être importable
+    depuis un processus neuf (fonction ou classe de module)."""
+    texts = list(texts)
+    workers = max(1, min(workers, len(texts) // MIN_DOCUMENTS_PER_WORKER))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    shards = shard(texts, workers * shards_per_worker)
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_name, loader, threads)) as pool:
+        parts = list(pool.map(_encode_shard, shards, [batch_size] * len(shards)))
+    elapsed = time.perf_counter() - start
+    encoding = sum(seconds for _, seconds in parts) / workers
+    print(
+        f"Encoded {len(texts)} documents with {workers} processes in {elapsed:.1f}s "
+        f"({len(texts) / elapsed:.0f} docs/s; {len(texts) / max(encoding, 1e-9):.0f} docs/s "
+        f"excluding process start and model load)."
+    )
+    return np.concatenate([vectors for vectors, _ in parts])
@@ -0,0 +1,29 @@
+from .lexical_index import tokenize
+
+# Mots qui orientent une question vers un type de document (tokenisés comme le texte indexé)
+ROUTES = {
+    'Tour': "tour tours circuit circuits package packages séjour séjours offre offres guide guides durée jours",
+    'Path': "parcours itinéraire itinéraires étape étapes col cols montagne montagnes altitude dénivelé "
+            "difficulté difficile distance kilomètres km départ arrivée ville villes",
+    'Bike': "vélo vélos bike bikes électrique électriques cargo vtt gravel location louer maintenance catégorie",
+    'Review': "avis note notes noté commentaire commentaires satisfait satisfaits évaluation recommande étoiles",
+    'Booking': "réservation réservations réservé réservée réserver booking client clients date dates",
+}
+
+
+class QueryRouter:
+    """Choisit les partitions (types de documents) à interroger d'après les mots de la question.
+
+    Aucune correspondance, ou plus de max_partitions types: la question est trop large, tout est scanné."""
+
+    def __init__(self, routes=None, max_partitions=3):
+        self.keywords = {doc_type: set(tokenize(words)) for doc_type, words in (routes or ROUTES).items()}
+        self.max_partitions = max_partitions
+
+    def route(self, question):
+        tokens = set(tokenize(question))
+        hits = {doc_type: len(tokens & keywords) for doc_type, keywords in self.keywords.items()}
+        matched = sorted((t for t in hits if hits[t]), key=hits.get, reverse=True)
+        if len(matched) > self.max_partitions:
+            return []
+        return matched
@@ -0,0 +1,153 @@
+import numpy as np
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, ids, k):
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    k = min(k, len(ids))
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return scores[best], ids[best]
+
+
+def rows(array, ids):
+    # Ids contigus (une partition de documents d'un même type): tranche sans copie
+    if ids is None:
+        return array
+    if len(ids) and ids[-1] - ids[0] + 1 == len(ids):
+        return array[ids[0]:ids[-1] + 1]
+    return array[ids]
+
+
+class QuantizedVectors:
+    """Vecteurs en int8 avec une échelle par vecteur (4x moins de mémoire que float32)."""
+
+    def __init__(self, vectors, block_size=4096):
+        self.block_size = block_size
+        self.codes = np.empty(vectors.shape, dtype=np.int8)
+        self.scales = np.empty(len(vectors), dtype=np.float32)
+        # Par blocs: les vecteurs float peuvent être un mmap qu'on ne veut pas charger d'un coup
+        for start in range(0, len(vectors), block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            scales = np.abs(block).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            self.codes[start:start + block_size] = np.round(block / scales[:, None]).astype(np.int8)
+            self.scales[start:start + block_size] = scales
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    def scores(self, query, ids=None):
+        codes = rows(self.codes, ids)
+        scales = rows(self.scales, ids)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.block_size):
+            block = codes[start:start + self.block_size].astype(np.float32)
+            scores[start:start + self.block_size] = block @ query
+        return scores * scales
+
+
+class ExactIndex:
+    """Produit scalaire contre tous les vecteurs (cosinus, vecteurs normalisés).
+
+    Avec des vecteurs quantifiés, le score est d'abord calculé en int8, puis les
+    k * rerank_factor meilleurs candidats sont re-classés avec les vecteurs float."""
+
+    kind = "exact"
+
+    def __init__(self, vectors, quantize=None, rerank_factor=4):
+        self.vectors = vectors
+        self.rerank_factor = rerank_factor
+        self.quantized = QuantizedVectors(vectors) if quantize == "int8" else None
+
+    def params(self):
+        return {"kind": self.kind, "quantize": "int8" if self.quantized is not None else None}
+
+    def attach(self, vectors):
+        self.vectors = vectors
+
+    def memory(self):
+        return {
+            "float_bytes": int(np.prod(self.vectors.shape)) * 4,
+            "resident_bytes": self.quantized.nbytes if self.quantized is not None else int(np.prod(self.vectors.shape)) * 4,
+        }
+
+    def _score(self, query, ids, k):
+        # ids=None: tous les vecteurs, sans copie par indexation
+        all_ids = np.arange(len(self.vectors)) if ids is None else ids
+        if self.quantized is None:
+            return top_k(np.asarray(rows(self.vectors, ids)) @ query, all_ids, k)
+        _, candidates = top_k(self.quantized.scores(query, ids), all_ids, k * self.rerank_factor)
+        # Lecture des lignes float dans l'ordre du fichier (mmap) pour le re-classement exact
+        candidates = np.sort(candidates)
+        return top_k(np.asarray(self.vectors[candidates]) @ query, candidates, k)
+
+    def search(self, query, k, ids=None):
+        # ids: sous-ensemble trié de documents (une partition) à scanner à la place de l'index complet
+        return self._score(query, ids, k)
+
+    def __getstate__(self):
+        # Les vecteurs sont déjà persistés avec les embeddings, on ne garde que la structure
+        state = self.__dict__.copy()
+        state["vectors"] = None
+        return state
+
+
+class IVFFlatIndex(ExactIndex):
+    """Index IVF-flat: k-means sphérique grossier, puis scan exact des nprobe listes les plus proches."""
+
+    kind = "ivf"
+
+    def __init__(self, vectors, nlist=None, nprobe=8, n_iter=20, seed=0, quantize=None, rerank_factor=4):
+        super().__init__(vectors, quantize, rerank_factor)
+        n = len(vectors)
+        self.nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        self.nprobe = nprobe
+        self.centroids, assignments = self._train(vectors, n_iter, seed)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    def params(self):
+        return dict(super().params(), nlist=self.nlist)
+
+    def _train(self, vectors, n_iter, seed):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), self.nlist, replace=False)].copy()
+        assignments = np.zeros(len(vectors), dtype=np.int64)
+        for _ in range(n_iter):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = np.bincount(assignments, minlength=self.nlist) == 0
+            # Une liste vide est réamorcée sur un vecteur au hasard
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            centroids = normalize(sums)
+        return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+    def search(self, query, k, nprobe=None, ids=None):
+        if ids is not None:
+            # Une partition se scanne directement, sans passer par les listes
+            return self._score(query, ids, k)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probed = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.sort(np.concatenate([self.lists[c] for c in probed]))
+        return self._score(query, candidates, k)
+
+
+def build_vector_index(vectors, kind="auto", min_size=1000, nlist=None, nprobe=8, quantize=None, rerank_factor=4):
+    # En dessous de min_size, le scan exact est plus rapide que l'index approché
+    if kind == "exact" or (kind == "auto" and len(vectors) < min_size):
+        return ExactIndex(vectors, quantize=quantize, rerank_factor=rerank_factor)
+    if kind in ("auto", "ivf"):
+        return IVFFlatIndex(vectors, nlist=nlist, nprobe=nprobe, quantize=quantize, rerank_factor=rerank_factor)
+    raise ValueError(f"Unknown vector index kind: {kind}")
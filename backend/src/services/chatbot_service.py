@@ -1,34 +1,290 @@
+import asyncio
 import os
 import pickle
-from sentence_transformers import SentenceTransformer, util
-import torch
-from google import genai
+import hashlib
+import threading
+import time
+from itertools import zip_longest
+import numpy as np
+from rdflib import Namespace
+from rdflib.namespace import RDFS
+from .startup import timed_phase
+from .chatbot.vector_index import build_vector_index, normalize
+from .chatbot.lexical_index import BM25Index, fuse
+from .chatbot.answer_cache import AnswerCache
+from .chatbot.embedding_batcher import EmbeddingBatcher
+from .chatbot.parallel_encoder import MIN_DOCUMENTS_PER_WORKER, encode_parallel
+from .llm.provider import DEFAULT_MODEL, GeminiProvider
+
+CS = Namespace("http://data.cyclingtour.fr/schema#")
+
+# Incrémenter si le format du cache ou la génération des documents change
+INDEX_FORMAT_VERSION = 4
+# Dans backend/src quel que soit le dossier d'exécution (fichiers générés, ignorés par git)
+INDEX_FILE = os.path.join(os.path.dirname(__file__), "..", "search_index.pkl")
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
 
 class ChatBotService:
-    def __init__(self, graph, api_key, cache_file="search_index.pkl"):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, graph, api_key, cache_file=INDEX_FILE, model_name='all-MiniLM-L6-v2',
+                 ann_index="auto", ann_min_size=1000, ann_nlist=None, ann_nprobe=8,
+                 retrieval_mode="hybrid", fusion="rrf", lexical_weight=0.5, rrf_k=60, hybrid_candidates=50,
+                 answer_cache=None, llm=None, model_loader=None,
+                 embed_batch_size=32, embed_max_wait_ms=5.0, llm_model=DEFAULT_MODEL,
+                 quantize="int8", rerank_factor=4, encode_workers=1, encode_loader=None,
+                 router=None, partition_quotas=None):
+        self.model_name = model_name
         self.graph = graph
         self.documents = []
         self.metadata = []
         self.embeddings = None
         self.cache_file = cache_file
-        
-        self.client = genai.Client(api_key=api_key)
+        # Vecteurs float normalisés, lus en mmap: seules les lignes re-classées sont chargées en mémoire
+        self.embeddings_file = os.path.splitext(cache_file)[0] + ".embeddings.npy"
 
-        self._build_index()
+        # "exact", "ivf" ou "auto" (exact sous ann_min_size documents); nprobe règle rappel / latence.
+        # quantize="int8": score sur vecteurs int8 puis re-classement float des k * rerank_factor premiers
+        self.vector_index_config = {
+            'kind': ann_index, 'min_size': ann_min_size, 'nlist': ann_nlist, 'quantize': quantize
+        }
+        self.ann_nprobe = ann_nprobe
+        self.rerank_factor = rerank_factor
+        self.vector_index = None
 
-    def _build_index(self):
-        if os.path.exists(self.cache_file):
-            print(f"Loading index from {self.cache_file}...")
+        # "hybrid" (BM25 + dense fusionnés), "dense" ou "lexical"
+        self.retrieval_mode = retrieval_mode
+        self.fusion = fusion
+        self.lexical_weight = lexical_weight
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates
+        self.lexical_index = None
+
+        # Partitions par type de document (Tour, Path, Bike, Review, Booking): le routeur choisit celles
+        # à scanner, chacune fournissant au plus partition_quotas[type] documents (top_k par défaut)
+        self.router = router
+        self.partition_quotas = partition_quotas or {}
+        self.partitions = {}
+
+        self.answer_cache = answer_cache or AnswerCache()
+
+        # Modèle de langage interchangeable (Gemini par défaut, stub hors ligne); le modèle d'embedding est
+        # chargé au premier usage (torch est lourd à importer)
+        self.api_key = api_key
+        self.llm = llm or GeminiProvider(api_key, llm_model)
+        self._model = None
+        self._model_loader = model_loader
+        self._lazy_lock = threading.Lock()
+
+        # Les questions concurrentes sont encodées ensemble; embed_batch_size <= 1 désactive le regroupement
+        self.query_encoder = None
+        if embed_batch_size and embed_batch_size > 1:
+            self.query_encoder = EmbeddingBatcher(
+                lambda texts: self.model.encode(texts), embed_batch_size, embed_max_wait_ms
+            )
+
+        # Reconstruction: encode_workers > 1 répartit les documents à encoder sur un pool de processus.
+        # encode_loader(model_name) remplace SentenceTransformer dans les processus (doit être importable)
+        self.encode_workers = encode_workers
+        self.encode_loader = encode_loader
+
+        with timed_phase("chatbot.index"):
+            self._build_index()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lazy_lock:
+                if self._model is None:
+                    with timed_phase("chatbot.model_load"):
+                        if self._model_loader:
+                            self._model = self._model_loader()
+                        else:
+                            from .chatbot.hashing_encoder import load_embedding_model
+                            self._model = load_embedding_model(self.model_name)
+        return self._model
+
+    def encode_query(self, user_query):
+        if self.query_encoder is not None:
+            return normalize(self.query_encoder.encode(user_query))
+        return normalize(self.model.encode(user_query))
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
             with open(self.cache_file, 'rb') as f:
                 data = pickle.load(f)
-                self.documents = data['documents']
-                self.metadata = data['metadata']
-                self.embeddings = data['embeddings']
+        except Exception as e:
+            print(f"Ignoring unreadable index {self.cache_file}: {e}")
+            return None
+        if data.get('version') != INDEX_FORMAT_VERSION or data.get('model') != self.model_name:
+            print(f"Index {self.cache_file} was built with another format or model, rebuilding.")
+            return None
+        try:
+            data['embeddings'] = np.load(self.embeddings_file, mmap_mode='r') if data['metadata'] else None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring index without readable embeddings {self.embeddings_file}: {e}")
+            return None
+        return data
+
+    def _build_index(self):
+        temp_docs, temp_meta = self._collect_documents()
+        cached = self._load_cache()
+
+        old_meta = cached['metadata'] if cached else []
+        old_embeddings = cached['embeddings'] if cached else None
+        old_ids = {m['id']: m['fingerprint'] for m in old_meta}
+        old_rows = {m['fingerprint']: i for i, m in enumerate(old_meta)}
+
+        new_ids = {m['id'] for m in temp_meta}
+        added = sum(1 for m in temp_meta if m['id'] not in old_ids)
+        changed = sum(1 for m in temp_meta if m['id'] in old_ids and old_ids[m['id']] != m['fingerprint'])
+        removed = sum(1 for doc_id in old_ids if doc_id not in new_ids)
+
+        # Seuls les textes jamais encodés passent par le modèle, le reste est repris du cache
+        to_encode = {}
+        for doc, meta in zip(temp_docs, temp_meta):
+            if meta['fingerprint'] not in old_rows and meta['fingerprint'] not in to_encode:
+                to_encode[meta['fingerprint']] = doc
+
+        print(
+            f"Index: {len(temp_docs)} documents ({added} new, {changed} changed, {removed} removed), "
+            f"{len(to_encode)} to encode."
+        )
+
+        self.documents = temp_docs
+        self.metadata = temp_meta
+        self.lexical_index = BM25Index(self.documents)
+        types = np.array([m['type'] for m in self.metadata])
+        self.partitions = {t: np.flatnonzero(types == t) for t in dict.fromkeys(types.tolist())}
+        # Les réponses en cache ont été produites avec l'ancien index
+        self.answer_cache.invalidate()
+
+        unchanged = cached is not None and (
+            [(m['id'], m['fingerprint']) for m in old_meta] == [(m['id'], m['fingerprint']) for m in temp_meta]
+        )
+        if unchanged:
+            self.embeddings = old_embeddings
+        else:
+            self.embeddings = self._save_embeddings(self._assemble_embeddings(old_rows, old_embeddings, to_encode))
+
+        index_reused = self._load_vector_index(cached if unchanged else None)
+        if unchanged and index_reused:
             return
-        
+
+        with open(self.cache_file, 'wb') as f:
+            pickle.dump({
+                'version': INDEX_FORMAT_VERSION,
+                'model': self.model_name,
+                'documents': self.documents,
+                'metadata': self.metadata,
+                'vector_index_config': self.vector_index_config,
+                'vector_index': self.vector_index
+            }, f)
+
+    def _save_embeddings(self, embeddings):
+        if embeddings is None:
+            return None
+        # Écriture puis renommage: un processus qui lit encore l'ancien fichier en mmap n'est pas affecté
+        tmp_file = self.embeddings_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            np.save(f, embeddings)
+        os.replace(tmp_file, self.embeddings_file)
+        return np.load(self.embeddings_file, mmap_mode='r')
+
+    def _load_vector_index(self, cached):
+        if self.embeddings is None:
+            self.vector_index = None
+            return False
+
+        vectors = self.embeddings
+        if cached and cached.get('vector_index_config') == self.vector_index_config and cached.get('vector_index'):
+            self.vector_index = cached['vector_index']
+            self.vector_index.attach(vectors)
+            reused = True
+        else:
+            self.vector_index = build_vector_index(
+                vectors,
+                kind=self.vector_index_config['kind'],
+                min_size=self.vector_index_config['min_size'],
+                nlist=self.vector_index_config['nlist'],
+                nprobe=self.ann_nprobe,
+                quantize=self.vector_index_config['quantize'],
+                rerank_factor=self.rerank_factor
+            )
+            reused = False
+
+        if hasattr(self.vector_index, 'nprobe'):
+            self.vector_index.nprobe = self.ann_nprobe
+        self.vector_index.rerank_factor = self.rerank_factor
+        memory = self.vector_index.memory()
+        print(
+            f"Vector index: {self.vector_index.kind} over {len(vectors)} documents, "
+            f"{memory['resident_bytes'] / 1024:.0f} KiB resident "
+            f"(float32: {memory['float_bytes'] / 1024:.0f} KiB)."
+        )
+        return reused
+
+    def _assemble_embeddings(self, old_rows, old_embeddings, to_encode):
+        if not self.documents:
+            return None
+
+        new_rows = {}
+        new_embeddings = None
+        if to_encode:
+            new_embeddings = normalize(self._encode_documents(list(to_encode.values())))
+            new_rows = {fp: i for i, fp in enumerate(to_encode)}
+
+        dim = new_embeddings.shape[1] if new_embeddings is not None else old_embeddings.shape[1]
+        embeddings = np.empty((len(self.metadata), dim), dtype=np.float32)
+        for i, meta in enumerate(self.metadata):
+            fp = meta['fingerprint']
+            embeddings[i] = new_embeddings[new_rows[fp]] if fp in new_rows else old_embeddings[old_rows[fp]]
+        return embeddings
+
+    def _encode_documents(self, texts):
+        if self.encode_workers > 1 and len(texts) >= 2 * MIN_DOCUMENTS_PER_WORKER:
+            with timed_phase("chatbot.encode_documents"):
+                return encode_parallel(texts, self.model_name, self.encode_workers, loader=self.encode_loader)
+
+        model = self.model
+        start = time.perf_counter()
+        with timed_phase("chatbot.encode_documents"):
+            embeddings = model.encode(texts)
+        elapsed = time.perf_counter() - start
+        print(f"Encoded {len(texts)} documents in {elapsed:.1f}s ({len(texts) / max(elapsed, 1e-9):.0f} docs/s).")
+        return embeddings
+
+    def _add_document(self, docs, meta, seen_ids, doc_type, key, uri, full_text):
+        # Identifiant stable: type + clé métier, suffixé si la même clé produit plusieurs textes
+        doc_id = f"{doc_type}:{key}"
+        seen_ids[doc_id] = seen_ids.get(doc_id, 0) + 1
+        if seen_ids[doc_id] > 1:
+            doc_id = f"{doc_id}@{seen_ids[doc_id]}"
+
+        docs.append(full_text)
+        meta.append({
+            'id': doc_id,
+            'fingerprint': fingerprint(full_text),
+            'uri': uri,
+            'type': doc_type,
+            'context': full_text
+        })
+
+    def _objects_by_subject(self, predicate):
+        # Objets regroupés par sujet, dans l'ordre de l'index sujet du store (celui que suit SPARQL)
+        return {
+            subject: list(self.graph.objects(subject, predicate))
+            for subject in dict.fromkeys(self.graph.subjects(predicate))
+        }
+
+    def _collect_documents(self):
         temp_docs = []
         temp_meta = []
+        seen_ids = {}
 
         # ==============================================================================
         # 1. LES TOURS (Offres Commerciales + Géographie liée)
@@ -47,38 +303,41 @@ class ChatBotService:
             OPTIONAL { ?tour cs:guideAssigned ?g . ?g foaf:name ?guideName }
         }
         """
+        # Un seul passage par prédicat au lieu d'une requête SPARQL par tour / par chemin
+        stages_by_tour = self._objects_by_subject(CS.includesStage)
+        labels = self._objects_by_subject(RDFS.label)
+        paths_by_stage = self._objects_by_subject(CS.stagePath)
+        difficulties = self._objects_by_subject(CS.difficulty)
+        elevation_gains = self._objects_by_subject(CS.elevationGain)
+        mountains_by_path = self._objects_by_subject(CS.includesMountain)
+        mountain_elevations = self._objects_by_subject(CS.elevation)
+
         for row in self.graph.query(query_tours):
             tour_uri = row['tour']
-            
-            q_details = """
-            PREFIX cs: <http://data.cyclingtour.fr/schema#>
-            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-            SELECT ?stageLabel ?difficulty ?elevation ?mountainLabel WHERE {
-                ?tour cs:includesStage ?stage .
-                ?stage rdfs:label ?stageLabel ;
-                       cs:stagePath ?path .
-                ?path cs:difficulty ?difficulty ;
-                      cs:elevationGain ?elevation .
-                OPTIONAL { 
-                    ?path cs:includesMountain ?mnt . 
-                    ?mnt rdfs:label ?mountainLabel 
-                }
-            }
-            """
-            details = self.graph.query(q_details, initBindings={'tour': tour_uri})
-            
+
             stages_txt = []
-            mountains = set()
+            mountains = {}
             total_difficulty = "Modéré"
-            
-            for d in details:
-                stages_txt.append(f"{d['stageLabel']} (Dénivelé: {d['elevation']}m)")
-                if d['mountainLabel']: mountains.add(str(d['mountainLabel']))
-                if "VeryHard" in str(d['difficulty']): 
-                    total_difficulty = "Très Difficile / Haute Montagne"
-                elif "Hard" in str(d['difficulty']):
-                    total_difficulty = "Difficile"
-            
+
+            # Même produit de lignes que l'ancienne requête par tour (OPTIONAL sur les cols)
+            for stage in stages_by_tour.get(tour_uri, ()):
+                for stage_label in labels.get(stage, ()):
+                    for path in paths_by_stage.get(stage, ()):
+                        mountain_labels = [
+                            label
+                            for mnt in mountains_by_path.get(path, ())
+                            for label in labels.get(mnt, ())
+                        ] or [None]
+                        for difficulty in difficulties.get(path, ()):
+                            for elevation in elevation_gains.get(path, ()):
+                                for mountain_label in mountain_labels:
+                                    stages_txt.append(f"{stage_label} (Dénivelé: {elevation}m)")
+                                    if mountain_label: mountains[str(mountain_label)] = None
+                                    if "VeryHard" in str(difficulty):
+                                        total_difficulty = "Très Difficile / Haute Montagne"
+                                    elif "Hard" in str(difficulty):
+                                        total_difficulty = "Difficile"
+
             full_text = (
                 f"Offre Touristique: {row['label']}. "
                 f"Niveau global: {total_difficulty}. "
@@ -88,8 +347,7 @@ class ChatBotService:
                 f"Cols et Montagnes traversés: {', '.join(mountains)}."
             )
             
-            temp_docs.append(full_text)
-            temp_meta.append({'uri': str(tour_uri), 'type': 'Tour', 'context': full_text})
+            self._add_document(temp_docs, temp_meta, seen_ids, 'Tour', str(tour_uri), str(tour_uri), full_text)
 
         # ==============================================================================
         # 2. LES CHEMINS (Détails techniques géographiques)
@@ -105,17 +363,12 @@ class ChatBotService:
         }
         """
         for row in self.graph.query(query_paths):
-            q_mnt = """
-            PREFIX cs: <http://data.cyclingtour.fr/schema#>
-            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-            SELECT ?mLabel ?mElev WHERE {
-                ?path cs:includesMountain ?m .
-                ?m rdfs:label ?mLabel ;
-                   cs:elevation ?mElev .
-            }
-            """
-            mnts = self.graph.query(q_mnt, initBindings={'path': row['path']})
-            mnt_txt = [f"{m['mLabel']} ({m['mElev']}m)" for m in mnts]
+            mnt_txt = [
+                f"{m_label} ({m_elev}m)"
+                for mnt in mountains_by_path.get(row['path'], ())
+                for m_label in labels.get(mnt, ())
+                for m_elev in mountain_elevations.get(mnt, ())
+            ]
             
             difficulty_str = str(row['diff']).split('#')[-1]
             
@@ -124,8 +377,7 @@ class ChatBotService:
                 f"Difficulté technique: {difficulty_str}. Dénivelé positif: {row['elev']}m. "
                 f"Liste des cols inclus: {', '.join(mnt_txt) if mnt_txt else 'Aucun col majeur'}."
             )
-            temp_docs.append(full_text)
-            temp_meta.append({'uri': str(row['path']), 'type': 'Path', 'context': full_text})
+            self._add_document(temp_docs, temp_meta, seen_ids, 'Path', str(row['path']), str(row['path']), full_text)
 
         # ==============================================================================
         # 3. LES VÉLOS
@@ -139,7 +391,7 @@ class ChatBotService:
                   cs:maintenanceStatus ?status ;
                   cs:pricePerDayBike ?price .
             OPTIONAL { ?bike rdfs:comment ?comment }
-            FILTER(?type != cs:Bike) 
+            FILTER(?type != cs:Bike && !isBlank(?type))
         }
         """
         for row in self.graph.query(query_bikes):
@@ -153,8 +405,9 @@ class ChatBotService:
                 f"Prix location: {row['price']}€/jour. "
                 f"Description technique: {row['comment']}."
             )
-            temp_docs.append(full_text)
-            temp_meta.append({'uri': str(row['bike']), 'type': 'Bike', 'context': full_text})
+            self._add_document(
+                temp_docs, temp_meta, seen_ids, 'Bike', f"{row['bike']}|{bike_type}", str(row['bike']), full_text
+            )
 
         # ==============================================================================
         # 4. AVIS CLIENTS
@@ -163,7 +416,7 @@ class ChatBotService:
         PREFIX cs: <http://data.cyclingtour.fr/schema#>
         PREFIX foaf: <http://xmlns.com/foaf/0.1/>
         PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-        SELECT ?clientName ?bikeLabel ?rating ?text WHERE {
+        SELECT ?review ?clientName ?bikeLabel ?rating ?text WHERE {
             ?review a cs:Review ;
                     cs:reviewText ?text ;
                     cs:rating ?rating ;
@@ -178,8 +431,7 @@ class ChatBotService:
                 f"Avis Client: Le client {row['clientName']} a noté le vélo '{row['bikeLabel']}' "
                 f"{row['rating']}/5. Commentaire du client: {row['text']}"
             )
-            temp_docs.append(full_text)
-            temp_meta.append({'uri': 'review', 'type': 'Review', 'context': full_text})
+            self._add_document(temp_docs, temp_meta, seen_ids, 'Review', str(row['review']), 'review', full_text)
 
         # ==============================================================================
         # 5. RÉSERVATIONS
@@ -188,7 +440,7 @@ class ChatBotService:
         PREFIX cs: <http://data.cyclingtour.fr/schema#>
         PREFIX foaf: <http://xmlns.com/foaf/0.1/>
         PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-        SELECT ?clientName ?bikeLabel ?dateStart ?dateEnd WHERE {
+        SELECT ?booking ?clientName ?bikeLabel ?dateStart ?dateEnd WHERE {
             ?booking a cs:BikeBooking ;
                      cs:bookedBy ?client ;
                      cs:bikeBooked ?bike ;
@@ -203,42 +455,67 @@ class ChatBotService:
                 f"Réservation: Le client {row['clientName']} a réservé le vélo '{row['bikeLabel']}' "
                 f"du {row['dateStart']} au {row['dateEnd']}."
             )
-            temp_docs.append(full_text)
-            temp_meta.append({'uri': 'booking', 'type': 'Booking', 'context': full_text})
-
-        self.documents = temp_docs
-        self.metadata = temp_meta
+            self._add_document(temp_docs, temp_meta, seen_ids, 'Booking', str(row['booking']), 'booking', full_text)
 
-        if self.documents:
-            self.embeddings = self.model.encode(self.documents, convert_to_tensor=True)
+        return temp_docs, temp_meta
 
-        with open(self.cache_file, 'wb') as f:
-            pickle.dump({
-                'documents': self.documents,
-                'metadata': self.metadata,
-                'embeddings': self.embeddings
-            }, f)
+    def check_types(self, types):
+        # Appelé par les routes de flux avant la réponse 200: un type inconnu y devient une erreur 400
+        unknown = [t for t in types or [] if t not in self.partitions]
+        if unknown:
+            raise ValueError(f"Unknown document types: {', '.join(unknown)}")
 
-    def search(self, user_query, top_k=3):
-        if self.embeddings is None or not self.documents:
+    def search(self, user_query, top_k=3, mode=None, query_embedding=None, types=None):
+        # types: filtre explicite sur les types de documents; sinon le routeur (s'il y en a un) décide
+        mode = mode or self.retrieval_mode
+        if self.vector_index is None or not self.documents:
             return []
 
-        query_embedding = self.model.encode(user_query, convert_to_tensor=True)
-        if self.embeddings.device != query_embedding.device:
-            query_embedding = query_embedding.to(self.embeddings.device)
-            
-        scores = util.cos_sim(query_embedding, self.embeddings)[0]
-        top_results = torch.topk(scores, k=min(top_k, len(self.documents)))
+        if types is None and self.router is not None:
+            types = self.router.route(user_query)
+        self.check_types(types)
 
-        results = []
-        for score, idx in zip(top_results.values, top_results.indices):
-            idx = int(idx)
-            results.append(self.metadata[idx])
-            
-        return results
+        if mode != "lexical" and query_embedding is None:
+            query_embedding = self.encode_query(user_query)
+
+        if not types:
+            top_ids = self._search_ids(user_query, query_embedding, top_k, mode, None)
+        else:
+            ranked = [
+                self._search_ids(
+                    user_query, query_embedding, min(self.partition_quotas.get(t, top_k), top_k), mode,
+                    self.partitions[t]
+                )
+                for t in types
+            ]
+            # Un document de chaque partition à tour de rôle: chaque type retenu est représenté
+            top_ids = [i for rank in zip_longest(*ranked) for i in rank if i is not None][:top_k]
+
+        return [self.metadata[int(idx)] for idx in top_ids]
+
+    def _search_ids(self, user_query, query_embedding, top_k, mode, ids):
+        # ids: documents d'une partition (triés), None pour tout l'index
+        candidates = max(top_k, self.hybrid_candidates)
+        if mode == "lexical":
+            return list(self.lexical_index.search(user_query, top_k, allowed=ids)[1])
+
+        dense = self.vector_index.search(query_embedding, top_k if mode == "dense" else candidates, ids=ids)
+        if mode == "dense":
+            return list(dense[1])
+        lexical = self.lexical_index.search(user_query, candidates, allowed=ids)
+        return fuse(dense, lexical, self.fusion, self.lexical_weight, self.rrf_k)[:top_k]
 
-    def ask_gemini(self, user_query):
-        retrieved_docs = self.search(user_query)
+    def _retrieve(self, user_query, types=None):
+        query_embedding = self.encode_query(user_query)
+        retrieved_docs = self.search(user_query, query_embedding=query_embedding, types=types)
+        context_key = tuple(doc['fingerprint'] for doc in retrieved_docs)
+        return query_embedding, retrieved_docs, context_key
+
+    def _cache_key(self, user_query, types):
+        # Une même question filtrée sur d'autres types n'a pas la même réponse
+        return f"{user_query} [{', '.join(sorted(types))}]" if types else user_query
+
+    def _build_prompt(self, user_query, retrieved_docs):
         context_str = "\n".join([doc['context'] for doc in retrieved_docs])
         
         print("Context for Gemini:\n", context_str)
@@ -262,9 +539,103 @@ class ChatBotService:
 
         Question : {user_query}
         """
-        
-        response = self.client.models.generate_content(
-            model='gemini-2.5-flash-lite',
-            contents=prompt
-        )
-        return response.text
+        return prompt
+
+    def _prepare(self, user_query, types=None):
+        # Tout ce qui précède l'appel au LLM (caches, encodage, recherche, prompt): réponse en cache, ou prompt
+        cache_key = self._cache_key(user_query, types)
+        cached_answer = self.answer_cache.get_exact(cache_key)
+        if cached_answer is not None:
+            return {'cache_key': cache_key, 'answer': cached_answer, 'documents': []}
+
+        query_embedding, retrieved_docs, context_key = self._retrieve(user_query, types)
+        prepared = {
+            'cache_key': cache_key,
+            'query_embedding': query_embedding,
+            'context_key': context_key,
+            'documents': [{'type': doc['type'], 'uri': doc['uri'], 'context': doc['context']} for doc in retrieved_docs],
+        }
+
+        cached_answer = self.answer_cache.get_semantic(query_embedding, context_key)
+        if cached_answer is not None:
+            self.answer_cache.put(cache_key, query_embedding, context_key, cached_answer)
+            prepared['answer'] = cached_answer
+        else:
+            prepared['prompt'] = self._build_prompt(user_query, retrieved_docs)
+        return prepared
+
+    def _store(self, prepared, answer):
+        if answer:
+            self.answer_cache.put(prepared['cache_key'], prepared['query_embedding'], prepared['context_key'], answer)
+
+    def _cached_events(self, prepared):
+        yield "context", {'documents': prepared['documents'], 'cached': True}
+        yield "token", {'text': prepared['answer']}
+        yield "done", {'cached': True}
+
+    def ask_gemini(self, user_query, types=None):
+        prepared = self._prepare(user_query, types)
+        if 'answer' in prepared:
+            return prepared['answer']
+
+        answer = self.llm.generate(prepared['prompt'], tag="chatbot")
+        self._store(prepared, answer)
+        return answer
+
+    def ask_gemini_stream(self, user_query, types=None):
+        # Générateur d'événements (nom, données): "context" dès la recherche faite, puis "token" au fil
+        # de la génération, puis "done". Fermer le générateur (client déconnecté) ferme le flux Gemini.
+        prepared = self._prepare(user_query, types)
+        if 'answer' in prepared:
+            yield from self._cached_events(prepared)
+            return
+
+        yield "context", {'documents': prepared['documents'], 'cached': False}
+
+        stream = self.llm.stream(prepared['prompt'], tag="chatbot")
+        parts = []
+        try:
+            for text in stream:
+                parts.append(text)
+                yield "token", {'text': text}
+        finally:
+            # Interrompt la requête amont si le client a abandonné en cours de route
+            stream.close()
+
+        self._store(prepared, "".join(parts))
+        yield "done", {'cached': False}
+
+    # Variantes asyncio (serveur ASGI): la partie calcul (encodage, recherche) tourne dans executor,
+    # l'attente du LLM ne bloque aucun thread
+
+    async def ask_gemini_async(self, user_query, types=None, executor=None):
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(executor, self._prepare, user_query, types)
+        if 'answer' in prepared:
+            return prepared['answer']
+
+        answer = await self.llm.agenerate(prepared['prompt'], tag="chatbot")
+        self._store(prepared, answer)
+        return answer
+
+    async def ask_gemini_astream(self, user_query, types=None, executor=None):
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(executor, self._prepare, user_query, types)
+        if 'answer' in prepared:
+            for event in self._cached_events(prepared):
+                yield event
+            return
+
+        yield "context", {'documents': prepared['documents'], 'cached': False}
+
+        stream = self.llm.astream(prepared['prompt'], tag="chatbot")
+        parts = []
+        try:
+            async for text in stream:
+                parts.append(text)
+                yield "token", {'text': text}
+        finally:
+            await stream.aclose()
+
+        self._store(prepared, "".join(parts))
+        yield "done", {'cached': False}
@@ -3,10 +3,15 @@ from urllib.parse import unquote
 import sys
 
 class DbpediaService:
-    def __init__(self):
-        self.sparql = SPARQLWrapper("http://dbpedia.org/sparql")
+    def __init__(self, endpoint="http://dbpedia.org/sparql", timeout=10.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.sparql = SPARQLWrapper(endpoint)
         self.sparql.setReturnFormat(JSON)
         self.sparql.addCustomHttpHeader("User-Agent", "Cycling Tour Operator")
+        self.sparql.setTimeout(int(timeout))
+        # Client HTTP asyncio (serveur ASGI), créé au premier appel
+        self._async_client = None
 
         self.FIELD_CONFIG = {
             'image': {
@@ -26,13 +31,23 @@ class DbpediaService:
             }
         }
 
-    def get_enriched_data_bulk(self, uri_list, fields=None):
-        if not uri_list:
-            return {}
+    def uris_to_enrich(self, local_results):
+        return list({row["sameAs"] for row in local_results if row.get("sameAs")})
 
-        if fields is None:
-            fields = ['image']
+    def merge(self, local_results, remote_data):
+        final_response = []
+        for row in local_results:
+            merged_item = row.copy()
 
+            uri_key = row.get("sameAs")
+
+            if uri_key and unquote(uri_key) in remote_data:
+                merged_item.update(remote_data[unquote(uri_key)])
+
+            final_response.append(merged_item)
+        return final_response
+
+    def build_query(self, uri_list, fields):
         formatted_uris = " ".join([f"<{unquote(uri)}>" for uri in uri_list])
 
         select_vars = ["?uri"]
@@ -51,7 +66,7 @@ class DbpediaService:
                 }}"""
                 where_clauses.append(clause)
 
-        query = f"""
+        return f"""
         PREFIX dbo: <http://dbpedia.org/ontology/>
         SELECT {' '.join(select_vars)}
         WHERE {{
@@ -60,26 +75,62 @@ class DbpediaService:
         }}
         """
 
-        self.sparql.setQuery(query)
+    def parse_results(self, results, fields):
+        enriched_data = {}
+        for result in results["results"]["bindings"]:
+            uri = result["uri"]["value"]
+
+            if uri not in enriched_data:
+                enriched_data[uri] = {}
+
+            for field in fields:
+                if field in self.FIELD_CONFIG:
+                    var_name = self.FIELD_CONFIG[field]['var'].lstrip('?')
+                    val = result.get(var_name, {}).get("value", None)
+                    if val:
+                        enriched_data[uri][field] = val
+
+        return enriched_data
+
+    def get_enriched_data_bulk(self, uri_list, fields=None):
+        if not uri_list:
+            return {}
+
+        if fields is None:
+            fields = ['image']
+
+        self.sparql.setQuery(self.build_query(uri_list, fields))
         
         try:
             results = self.sparql.query().convert()
-            
-            enriched_data = {}
-            for result in results["results"]["bindings"]:
-                uri = result["uri"]["value"]
-                
-                if uri not in enriched_data:
-                    enriched_data[uri] = {}
-
-                for field in fields:
-                    if field in self.FIELD_CONFIG:
-                        var_name = self.FIELD_CONFIG[field]['var'].lstrip('?')
-                        val = result.get(var_name, {}).get("value", None)
-                        if val:
-                            enriched_data[uri][field] = val
-                            
-            return enriched_data
+            return self.parse_results(results, fields)
+
+        except Exception as e:
+            print(f"Error querying DBpedia: {e}", file=sys.stderr)
+            return {}
+
+    async def get_enriched_data_bulk_async(self, uri_list, fields=None):
+        # Même requête que get_enriched_data_bulk, sans bloquer de thread pendant l'attente de DBpedia
+        if not uri_list:
+            return {}
+
+        if fields is None:
+            fields = ['image']
+
+        if self._async_client is None:
+            import httpx
+
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                headers={"User-Agent": "Cycling Tour Operator", "Accept": "application/sparql-results+json"},
+            )
+
+        try:
+            response = await self._async_client.get(
+                self.endpoint, params={"query": self.build_query(uri_list, fields), "format": "json"}
+            )
+            response.raise_for_status()
+            return self.parse_results(response.json(), fields)
 
         except Exception as e:
             print(f"Error querying DBpedia: {e}", file=sys.stderr)
@@ -0,0 +1,61 @@
+import threading
+from collections import deque
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class LLMMetrics:
+    """Compteurs des appels au modèle de langage par étiquette d'appelant ("chatbot", "text_to_sparql"):
+    tokens du prompt et de la réponse, latence totale et du premier token (window derniers appels), erreurs."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._tags = {}
+
+    def record(self, tag, prompt_tokens, output_tokens, seconds, first_token_seconds=None, error=None,
+               cancelled=False):
+        with self._lock:
+            entry = self._tags.get(tag)
+            if entry is None:
+                entry = self._tags[tag] = {
+                    "calls": 0, "errors": 0, "cancelled": 0, "prompt_tokens": 0, "output_tokens": 0,
+                    "last_error": None, "latencies": deque(maxlen=self.window),
+                    "first_token_latencies": deque(maxlen=self.window),
+                }
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["output_tokens"] += output_tokens
+            entry["latencies"].append(seconds)
+            if first_token_seconds is not None:
+                entry["first_token_latencies"].append(first_token_seconds)
+            if error is not None:
+                entry["errors"] += 1
+                entry["last_error"] = f"{type(error).__name__}: {error}"
+            if cancelled:
+                entry["cancelled"] += 1
+
+    def stats(self):
+        with self._lock:
+            tags = {tag: dict(entry, latencies=list(entry["latencies"]),
+                              first_token_latencies=list(entry["first_token_latencies"]))
+                    for tag, entry in self._tags.items()}
+        report = {}
+        for tag, entry in tags.items():
+            latencies, first_tokens = entry.pop("latencies"), entry.pop("first_token_latencies")
+            entry["avg_prompt_tokens"] = round(entry["prompt_tokens"] / entry["calls"], 1)
+            for name, values in (("latency_ms", latencies), ("first_token_ms", first_tokens)):
+                entry[name] = {
+                    f"p{q}": round(percentile(values, q) * 1000, 2) if values else None for q in (50, 95, 99)
+                }
+            report[tag] = entry
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._tags.clear()
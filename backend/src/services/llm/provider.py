@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import threading
+import time
+
+from .metrics import LLMMetrics
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    # Ordre de grandeur quand le fournisseur ne compte pas les tokens (pas de tokenizer Gemini hors ligne)
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def prompt_key(prompt):
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+
+
+class LLMProvider(ABC):
+    """Interface commune des modèles de langage. generate() renvoie la réponse complète, stream() ses
+    morceaux au fil de la génération (fermer le générateur interrompt la requête amont). Chaque appel est
+    mesuré dans self.metrics sous l'étiquette de l'appelant.
+
+    Une implémentation fournit _generate(prompt, temperature, usage), _stream(...) et _astream(...) (générateur
+    asynchrone), et remplit usage["prompt_tokens"] / usage["output_tokens"] quand le fournisseur les compte.
+    _agenerate passe par défaut par un thread."""
+
+    name = "llm"
+
+    def __init__(self, model, metrics=None):
+        self.model = model
+        self.metrics = metrics or LLMMetrics()
+
+    @abstractmethod
+    def _generate(self, prompt, temperature, usage):
+        ...
+
+    @abstractmethod
+    def _stream(self, prompt, temperature, usage):
+        ...
+
+    async def _agenerate(self, prompt, temperature, usage):
+        # Fournisseur sans client asyncio: l'appel bloquant part dans un thread
+        return await asyncio.to_thread(self._generate, prompt, temperature, usage)
+
+    @abstractmethod
+    async def _astream(self, prompt, temperature, usage):
+        ...
+
+    def _record(self, tag, prompt, text, usage, seconds, first_token_seconds=None, error=None, cancelled=False):
+        self.metrics.record(
+            tag,
+            prompt_tokens=usage.get("prompt_tokens") or estimate_tokens(prompt),
+            output_tokens=usage.get("output_tokens") or (estimate_tokens(text) if text else 0),
+            seconds=seconds,
+            first_token_seconds=first_token_seconds,
+            error=error,
+            cancelled=cancelled,
+        )
+
+    def generate(self, prompt, temperature=None, tag="default"):
+        usage = {}
+        start = time.perf_counter()
+        try:
+            text = self._generate(prompt, temperature, usage)
+        except Exception as e:
+            self._record(tag, prompt, None, usage, time.perf_counter() - start, error=e)
+            raise
+        seconds = time.perf_counter() - start
+        self._record(tag, prompt, text, usage, seconds, first_token_seconds=seconds)
+        return text
+
+    def stream(self, prompt, temperature=None, tag="default"):
+        usage, parts = {}, []
+        first_token = error = None
+        completed = False
+        start = time.perf_counter()
+        chunks = self._stream(prompt, temperature, usage)
+        try:
+            for text in chunks:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(text)
+                yield text
+            completed = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            chunks.close()
+            self._record(tag, prompt, "".join(parts), usage, time.perf_counter() - start, first_token, error,
+                         cancelled=not completed and error is None)
+
+    async def agenerate(self, prompt, temperature=None, tag="default"):
+        usage = {}
+        start = time.perf_counter()
+        try:
+            text = await self._agenerate(prompt, temperature, usage)
+        except Exception as e:
+            self._record(tag, prompt, None, usage, time.perf_counter() - start, error=e)
+            raise
+        seconds = time.perf_counter() - start
+        self._record(tag, prompt, text, usage, seconds, first_token_seconds=seconds)
+        return text
+
+    async def astream(self, prompt, temperature=None, tag="default"):
+        usage, parts = {}, []
+        first_token = error = None
+        completed = False
+        start = time.perf_counter()
+        chunks = self._astream(prompt, temperature, usage)
+        try:
+            async for text in chunks:
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(text)
+                yield text
+            completed = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await chunks.aclose()
+            self._record(tag, prompt, "".join(parts), usage, time.perf_counter() - start, first_token, error,
+                         cancelled=not completed and error is None)
+
+    def stats(self):
+        return {"provider": self.name, "model": self.model, "calls": self.metrics.stats()}
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, metrics=None, timeout=None):
+        super().__init__(model, metrics)
+        self.api_key = api_key
+        # Délai HTTP de chaque requête (secondes): un flux bloqué finit par rendre la main
+        self.timeout = timeout
+        # google.genai est lourd à importer: client créé au premier appel
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google import genai
+                    http_options = {"timeout": int(self.timeout * 1000)} if self.timeout else None
+                    self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+        return self._client
+
+    def _config(self, temperature):
+        if temperature is None:
+            return None
+        from google.genai import types
+
+        return types.GenerateContentConfig(temperature=temperature)
+
+    def _usage(self, response, usage):
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return
+        if metadata.prompt_token_count:
+            usage["prompt_tokens"] = metadata.prompt_token_count
+        if metadata.candidates_token_count:
+            usage["output_tokens"] = metadata.candidates_token_count
+
+    def _generate(self, prompt, temperature, usage):
+        response = self.client.models.generate_content(
+            model=self.model, contents=prompt, config=self._config(temperature)
+        )
+        self._usage(response, usage)
+        return response.text
+
+    def _stream(self, prompt, temperature, usage):
+        stream = self.client.models.generate_content_stream(
+            model=self.model, contents=prompt, config=self._config(temperature)
+        )
+        try:
+            for chunk in stream:
+                # Le dernier morceau porte le décompte des tokens de tout l'appel
+                self._usage(chunk, usage)
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            # Interrompt la requête amont si l'appelant a abandonné en cours de route
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+    async def _agenerate(self, prompt, temperature, usage):
+        response = await self.client.aio.models.generate_content(
+            model=self.model, contents=prompt, config=self._config(temperature)
+        )
+        self._usage(response, usage)
+        return response.text
+
+    async def _astream(self, prompt, temperature, usage):
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model, contents=prompt, config=self._config(temperature)
+        )
+        try:
+            async for chunk in stream:
+                self._usage(chunk, usage)
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose:
+                await aclose()
+
+
+class RecordingProvider(LLMProvider):
+    """Enregistre dans un fichier JSONL les réponses d'un autre fournisseur (Gemini), pour les rejouer
+    ensuite hors ligne avec StubProvider: une ligne {key, model, prompt_tokens, output_tokens, response}."""
+
+    def __init__(self, provider, path):
+        super().__init__(provider.model, provider.metrics)
+        self.provider = provider
+        self.name = provider.name
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _save(self, prompt, text, usage):
+        record = {
+            "key": prompt_key(prompt),
+            "model": self.model,
+            "prompt_tokens": usage.get("prompt_tokens") or estimate_tokens(prompt),
+            "output_tokens": usage.get("output_tokens") or estimate_tokens(text),
+            "response": text,
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _generate(self, prompt, temperature, usage):
+        text = self.provider._generate(prompt, temperature, usage)
+        if text:
+            self._save(prompt, text, usage)
+        return text
+
+    def _stream(self, prompt, temperature, usage):
+        parts = []
+        chunks = self.provider._stream(prompt, temperature, usage)
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield text
+        finally:
+            chunks.close()
+        # Réponse interrompue: pas d'enregistrement partiel
+        if parts:
+            self._save(prompt, "".join(parts), usage)
+
+    async def _agenerate(self, prompt, temperature, usage):
+        text = await self.provider._agenerate(prompt, temperature, usage)
+        if text:
+            self._save(prompt, text, usage)
+        return text
+
+    async def _astream(self, prompt, temperature, usage):
+        parts = []
+        chunks = self.provider._astream(prompt, temperature, usage)
+        try:
+            async for text in chunks:
+                parts.append(text)
+                yield text
+        finally:
+            await chunks.aclose()
+        if parts:
+            self._save(prompt, "".join(parts), usage)
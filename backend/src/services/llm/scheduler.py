@@ -0,0 +1,367 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .provider import LLMProvider
+
+# Codes HTTP d'une erreur passagère du fournisseur (google.genai.errors.APIError.code): on réessaie
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+# Attente d'une place côté asyncio: le sémaphore est partagé avec les threads, on le sonde
+SLOT_POLL_INTERVAL = 0.01
+
+
+class LLMUnavailableError(RuntimeError):
+    """Appel refusé ou abandonné sans attendre: circuit ouvert, trop d'appels en cours, débit dépassé ou
+    délai écoulé. retry_after: secondes conseillées avant de réessayer (en-tête Retry-After)."""
+
+    def __init__(self, message, reason, retry_after=1.0):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """rate jetons par seconde, au plus burst d'avance; rate=None: débit illimité."""
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate or 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait_time(self):
+        # Réserve un jeton et renvoie l'attente nécessaire avant de l'utiliser (0 s'il est disponible)
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self):
+        if self.rate:
+            with self._lock:
+                self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class CircuitBreaker:
+    """Ouvert après failure_threshold échecs passagers consécutifs: les appels sont refusés pendant
+    reset_timeout secondes, puis un seul appel d'essai (semi-ouvert) décide de la réouverture."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open":
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise LLMUnavailableError("LLM circuit is open after repeated upstream failures",
+                                              "circuit_open", retry_after=remaining)
+                self.state = "half_open"
+                self.trial_running = False
+            if self.state == "half_open":
+                if self.trial_running:
+                    raise LLMUnavailableError("LLM circuit is half-open, a trial call is running",
+                                              "circuit_open", retry_after=1.0)
+                self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"LLM circuit opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        # Appel d'essai terminé sans verdict sur l'amont (erreur de la requête elle-même)
+        with self._lock:
+            self.trial_running = False
+
+
+class LLMScheduler:
+    """Ordonnanceur partagé des appels au modèle de langage:
+    - au plus max_in_flight appels en cours; au-delà on attend queue_timeout secondes puis on refuse;
+    - débit limité par un seau à jetons (rate appels/s, burst d'avance);
+    - chaque appel a un délai total (deadline secondes, tentatives comprises);
+    - les erreurs passagères sont réessayées max_retries fois (backoff exponentiel à jitter complet);
+    - un disjoncteur refuse immédiatement les appels quand l'amont est en panne.
+
+    Un appel qui dépasse son délai rend la main à l'appelant tout de suite, mais garde sa place jusqu'à
+    ce que la requête amont se termine: le nombre de requêtes réellement en cours reste borné."""
+
+    def __init__(self, max_in_flight=8, rate=None, burst=None, queue_timeout=1.0, deadline=30.0, max_retries=2,
+                 backoff_base=0.5, backoff_max=4.0, breaker=None):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "in_flight": 0, "retries": 0, "rejected": 0, "deadline_exceeded": 0,
+                         "failures": 0}
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self.counters[name] += delta
+
+    def _reject(self, message, reason, retry_after):
+        self._count("rejected")
+        raise LLMUnavailableError(message, reason, retry_after)
+
+    def _queue_timeout(self, deadline):
+        return max(0.0, min(self.queue_timeout, deadline - time.monotonic()))
+
+    def _admit(self, acquired, deadline):
+        # Après l'attente d'une place: refus, ou réservation d'un jeton de débit (renvoie l'attente à faire)
+        if not acquired:
+            self.breaker.release()
+            self._reject(f"Too many LLM calls in flight ({self.max_in_flight})", "overloaded", self.queue_timeout)
+        wait = self.bucket.wait_time()
+        if time.monotonic() + wait > deadline or wait > self.queue_timeout:
+            self.bucket.refund()
+            self._slots.release()
+            self.breaker.release()
+            self._reject("LLM rate limit reached", "rate_limited", wait)
+        self._count("in_flight")
+        return wait
+
+    def _acquire(self, deadline):
+        self.breaker.allow()
+        time.sleep(self._admit(self._slots.acquire(timeout=self._queue_timeout(deadline)), deadline))
+
+    async def _aacquire(self, deadline):
+        self.breaker.allow()
+        give_up = time.monotonic() + self._queue_timeout(deadline)
+        acquired = self._slots.acquire(blocking=False)
+        try:
+            while not acquired and time.monotonic() < give_up:
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+                acquired = self._slots.acquire(blocking=False)
+        except asyncio.CancelledError:
+            # Appelant parti pendant l'attente d'une place: l'appel d'essai éventuel n'aura pas lieu
+            self.breaker.release()
+            raise
+        wait = self._admit(acquired, deadline)
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self._release()
+            self.breaker.release()
+            raise
+
+    def _release(self, _=None):
+        self._count("in_flight", -1)
+        self._slots.release()
+
+    def _backoff(self, attempt, deadline):
+        # Jitter complet: attente tirée entre 0 et base * 2^tentative, sans dépasser le délai restant
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    async def _abackoff(self, attempt, deadline):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    def _settle(self, error):
+        if error is None:
+            self.breaker.record_success()
+        elif is_retryable(error):
+            self._count("failures")
+            self.breaker.record_failure()
+        else:
+            # Requête refusée par le fournisseur (400...): l'amont fonctionne
+            self.breaker.release()
+
+    def call(self, fn):
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            self._acquire(deadline)
+            future = self._executor.submit(fn)
+            future.add_done_callback(self._release)
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                self._count("deadline_exceeded")
+                self._settle(TimeoutError())
+                raise LLMUnavailableError(f"LLM call exceeded its {self.deadline:g}s deadline", "deadline")
+            except Exception as e:
+                self._settle(e)
+                if not is_retryable(e) or attempt == self.max_retries or not self._backoff(attempt, deadline):
+                    raise
+                self._count("retries")
+                print(f"Retrying LLM call after {type(e).__name__}: {e}")
+                continue
+            self._settle(None)
+            return result
+
+    def stream(self, open_stream):
+        # Flux: seules l'ouverture et l'attente du premier morceau sont réessayées; ensuite le délai
+        # est vérifié entre deux morceaux et le flux amont est fermé s'il est dépassé
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            self._acquire(deadline)
+            chunks = open_stream()
+            started = False
+            try:
+                for chunk in chunks:
+                    if time.monotonic() > deadline:
+                        self._count("deadline_exceeded")
+                        self._settle(TimeoutError())
+                        raise LLMUnavailableError(f"LLM stream exceeded its {self.deadline:g}s deadline", "deadline")
+                    started = True
+                    yield chunk
+            except LLMUnavailableError:
+                raise
+            except GeneratorExit:
+                # Appelant parti: pas de verdict sur l'amont
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self._settle(e)
+                if started or not is_retryable(e) or attempt == self.max_retries or not self._backoff(attempt, deadline):
+                    raise
+                self._count("retries")
+                print(f"Retrying LLM stream after {type(e).__name__}: {e}")
+                continue
+            finally:
+                chunks.close()
+                self._release()
+            self._settle(None)
+            return
+
+    async def acall(self, coro_fn):
+        # Variante asyncio de call(): à l'échéance la requête amont est annulée, sa place libérée
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            await self._aacquire(deadline)
+            try:
+                result = await asyncio.wait_for(coro_fn(), max(0.0, deadline - time.monotonic()))
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                error = e
+            else:
+                self._settle(None)
+                return result
+            finally:
+                self._release()
+            if isinstance(error, TimeoutError) and time.monotonic() >= deadline:
+                self._count("deadline_exceeded")
+                self._settle(error)
+                raise LLMUnavailableError(f"LLM call exceeded its {self.deadline:g}s deadline", "deadline") from error
+            self._settle(error)
+            if not is_retryable(error) or attempt == self.max_retries or not await self._abackoff(attempt, deadline):
+                raise error
+            self._count("retries")
+            print(f"Retrying LLM call after {type(error).__name__}: {error}")
+
+    async def astream(self, open_stream):
+        # Variante asyncio de stream(): le délai s'applique aussi à l'attente de chaque morceau
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            await self._aacquire(deadline)
+            chunks = open_stream()
+            started, error = False, None
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(chunks), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk
+            except (GeneratorExit, asyncio.CancelledError):
+                self.breaker.release()
+                raise
+            except Exception as e:
+                error = e
+            finally:
+                await chunks.aclose()
+                self._release()
+            if error is None:
+                self._settle(None)
+                return
+            if isinstance(error, TimeoutError) and time.monotonic() >= deadline:
+                self._count("deadline_exceeded")
+                self._settle(error)
+                raise LLMUnavailableError(f"LLM stream exceeded its {self.deadline:g}s deadline", "deadline") from error
+            self._settle(error)
+            if started or not is_retryable(error) or attempt == self.max_retries or not await self._abackoff(attempt, deadline):
+                raise error
+            self._count("retries")
+            print(f"Retrying LLM stream after {type(error).__name__}: {error}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["circuit"] = self.breaker.state
+        stats["max_in_flight"] = self.max_in_flight
+        return stats
+
+
+class ScheduledProvider(LLMProvider):
+    """Fait passer tous les appels d'un fournisseur par un LLMScheduler."""
+
+    def __init__(self, provider, scheduler):
+        super().__init__(provider.model, provider.metrics)
+        self.provider = provider
+        self.name = provider.name
+        self.scheduler = scheduler
+
+    def _generate(self, prompt, temperature, usage):
+        return self.scheduler.call(lambda: self.provider._generate(prompt, temperature, usage))
+
+    def _stream(self, prompt, temperature, usage):
+        return self.scheduler.stream(lambda: self.provider._stream(prompt, temperature, usage))
+
+    async def _agenerate(self, prompt, temperature, usage):
+        return await self.scheduler.acall(lambda: self.provider._agenerate(prompt, temperature, usage))
+
+    def _astream(self, prompt, temperature, usage):
+        return self.scheduler.astream(lambda: self.provider._astream(prompt, temperature, usage))
+
+    def stats(self):
+        return {**self.provider.stats(), "scheduler": self.scheduler.stats()}
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+
+from .provider import LLMProvider, prompt_key
+
+
+def load_recordings(path):
+    # Fichier JSONL écrit par RecordingProvider; la dernière réponse enregistrée pour un prompt l'emporte
+    recordings = {}
+    if not path or not os.path.exists(path):
+        return recordings
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recordings[record["key"]] = record
+    return recordings
+
+
+class StubProvider(LLMProvider):
+    """Modèle local sans réseau: rejoue les réponses enregistrées (même prompt), sinon répond de façon
+    déterministe à partir du prompt. Latence du premier token et délai entre tokens configurables, pour
+    mesurer les API de bout en bout hors ligne (CI, tests de charge)."""
+
+    name = "stub"
+
+    def __init__(self, recordings=None, first_token_ms=300.0, token_ms=30.0, model="stub", metrics=None):
+        super().__init__(model, metrics)
+        self.recordings = load_recordings(recordings)
+        self.first_token = first_token_ms / 1000
+        self.token_delay = token_ms / 1000
+        self._lock = threading.Lock()
+        self.replay_stats = {"replayed": 0, "synthesized": 0}
+
+    def _answer(self, contents):
+        # Prompt text-to-SPARQL: une requête valide quelconque, pour que la validation passe hors ligne
+        if "### YOUR TASK" in contents:
+            return "SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 10"
+        question = re.search(r"Question\s*:\s*(.+)", contents)
+        context = re.search(r"Utilise le contexte suivant pour répondre :\s*\n\s*(.+)", contents)
+        answer = f"[stub] Réponse à « {question.group(1).strip() if question else contents[:80]} »."
+        if context:
+            answer += f" D'après le contexte : {context.group(1).strip()[:200]}"
+        return answer
+
+    def _tokens(self, prompt, usage):
+        record = self.recordings.get(prompt_key(prompt))
+        with self._lock:
+            self.replay_stats["replayed" if record else "synthesized"] += 1
+        if record is None:
+            text = self._answer(prompt)
+        else:
+            # Décomptes de l'appel enregistré: les mêmes chiffres qu'avec le vrai modèle
+            text = record["response"]
+            usage["prompt_tokens"] = record.get("prompt_tokens")
+            usage["output_tokens"] = record.get("output_tokens")
+        return re.findall(r"\s*\S+\s*", text) or [text]
+
+    def _generate(self, prompt, temperature, usage):
+        tokens = self._tokens(prompt, usage)
+        time.sleep(self.first_token + self.token_delay * max(0, len(tokens) - 1))
+        return "".join(tokens)
+
+    def _stream(self, prompt, temperature, usage):
+        tokens = self._tokens(prompt, usage)
+        time.sleep(self.first_token)
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.token_delay)
+            yield token
+
+    async def _agenerate(self, prompt, temperature, usage):
+        tokens = self._tokens(prompt, usage)
+        await asyncio.sleep(self.first_token + self.token_delay * max(0, len(tokens) - 1))
+        return "".join(tokens)
+
+    async def _astream(self, prompt, temperature, usage):
+        tokens = self._tokens(prompt, usage)
+        await asyncio.sleep(self.first_token)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    def stats(self):
+        with self._lock:
+            replay = dict(self.replay_stats, recordings=len(self.recordings))
+        return {**super().stats(), "replay": replay}
@@ -0,0 +1,206 @@
+import os
+import threading
+
+from .startup import timed_phase
+
+DATABASE_FOLDER = os.path.join(os.path.dirname(__file__), "..", "..", "..", "database")
+
+
+class ServiceRegistry:
+    """Services partagés par tout le processus, construits au premier appel (ou par warmup())."""
+
+    def __init__(self, database_folder=DATABASE_FOLDER):
+        self.database_folder = database_folder
+        self._instances = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _get(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._instances:
+                with timed_phase(f"init.{name}"):
+                    self._instances[name] = factory()
+        return self._instances[name]
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+    def reset(self, names):
+        # Les services retirés seront reconstruits au prochain appel (données modifiées sur disque); renvoie
+        # les anciennes instances, que restore() remet en place si la reconstruction échoue
+        return {name: self._instances.pop(name) for name in names if name in self._instances}
+
+    def restore(self, instances):
+        self._instances.update(instances)
+
+    def ttl_files(self):
+        return [
+            os.path.join(self.database_folder, file)
+            for file in os.listdir(self.database_folder)
+            if file.endswith(".ttl")
+        ]
+
+    def schema_file(self):
+        return os.path.join(self.database_folder, "cto_schema.ttl")
+
+    def schema_content(self):
+        with open(self.schema_file(), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def sparql_service(self):
+        from .sparql_service import SparqlService
+
+        return self._get("sparql", lambda: SparqlService(self.ttl_files()))
+
+    def dbpedia_service(self):
+        from .dbpedia_service import DbpediaService
+
+        return self._get("dbpedia", lambda: DbpediaService(
+            endpoint=os.getenv("DBPEDIA_ENDPOINT", "http://dbpedia.org/sparql"),
+            timeout=float(os.getenv("DBPEDIA_TIMEOUT_S", "10")),
+        ))
+
+    def llm_provider(self):
+        # Un seul modèle de langage pour le chatbot et le text-to-SPARQL. LLM_PROVIDER=stub rejoue hors ligne
+        # les réponses de LLM_STUB_RECORDINGS, enregistrées au préalable avec Gemini et LLM_RECORD=fichier.
+        # Tous les appels passent par un ordonnanceur commun (concurrence, débit, délai, disjoncteur).
+        def factory():
+            from .llm.scheduler import CircuitBreaker, LLMScheduler, ScheduledProvider
+
+            model = os.getenv("LLM_MODEL", "gemini-2.5-flash-lite")
+            deadline = float(os.getenv("LLM_DEADLINE_S", "30"))
+            if os.getenv("LLM_PROVIDER", "gemini") == "stub":
+                from .llm.stub_provider import StubProvider
+
+                provider = StubProvider(
+                    recordings=os.getenv("LLM_STUB_RECORDINGS") or None,
+                    first_token_ms=float(os.getenv("LLM_STUB_FIRST_TOKEN_MS", "300")),
+                    token_ms=float(os.getenv("LLM_STUB_TOKEN_MS", "30")),
+                    model=model,
+                )
+            else:
+                from .llm.provider import GeminiProvider, RecordingProvider
+
+                provider = GeminiProvider(os.getenv("GEMINI_API_KEY"), model, timeout=deadline)
+                if os.getenv("LLM_RECORD"):
+                    provider = RecordingProvider(provider, os.getenv("LLM_RECORD"))
+
+            rate = float(os.getenv("LLM_RATE_PER_S", "0")) or None
+            scheduler = LLMScheduler(
+                max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+                rate=rate,
+                burst=float(os.getenv("LLM_BURST", "0")) or None,
+                queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_S", "1")),
+                deadline=deadline,
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_S", "30")),
+                ),
+            )
+            return ScheduledProvider(provider, scheduler)
+
+        return self._get("llm", factory)
+
+    def embedding_model(self):
+        # CHATBOT_MODEL=hashing: encodeur haché sans téléchargement, avec LLM_PROVIDER=stub pour le hors ligne
+        def factory():
+            from .chatbot.hashing_encoder import load_embedding_model
+
+            return load_embedding_model(os.getenv("CHATBOT_MODEL", "all-MiniLM-L6-v2"))
+
+        return self._get("embedding_model", factory)
+
+    def chatbot_service(self):
+        def factory():
+            from .chatbot_service import INDEX_FILE, ChatBotService
+            from .chatbot.answer_cache import AnswerCache
+            from .chatbot.query_router import QueryRouter
+
+            # "Booking:2,Review:2": nombre maximal de documents de chaque type dans le contexte
+            quotas = {}
+            for item in filter(None, os.getenv("CHATBOT_PARTITION_QUOTAS", "").split(",")):
+                doc_type, quota = item.split(":")
+                quotas[doc_type.strip()] = int(quota)
+
+            return ChatBotService(
+                self.sparql_service().get_graph(),
+                os.getenv("GEMINI_API_KEY"),
+                cache_file=os.getenv("CHATBOT_INDEX_FILE") or INDEX_FILE,
+                model_name=os.getenv("CHATBOT_MODEL", "all-MiniLM-L6-v2"),
+                ann_index=os.getenv("CHATBOT_ANN_INDEX", "auto"),
+                ann_nprobe=int(os.getenv("CHATBOT_ANN_NPROBE", "8")),
+                retrieval_mode=os.getenv("CHATBOT_RETRIEVAL", "hybrid"),
+                fusion=os.getenv("CHATBOT_FUSION", "rrf"),
+                lexical_weight=float(os.getenv("CHATBOT_LEXICAL_WEIGHT", "0.5")),
+                answer_cache=AnswerCache(
+                    max_entries=int(os.getenv("CHATBOT_CACHE_SIZE", "512")),
+                    ttl=float(os.getenv("CHATBOT_CACHE_TTL", "3600")),
+                    similarity_threshold=float(os.getenv("CHATBOT_CACHE_THRESHOLD", "0.92")),
+                ),
+                llm=self.llm_provider(),
+                model_loader=self.embedding_model,
+                embed_batch_size=int(os.getenv("CHATBOT_EMBED_BATCH_SIZE", "32")),
+                embed_max_wait_ms=float(os.getenv("CHATBOT_EMBED_MAX_WAIT_MS", "5")),
+                quantize=None if os.getenv("CHATBOT_QUANTIZE", "int8") == "none" else os.getenv("CHATBOT_QUANTIZE", "int8"),
+                rerank_factor=int(os.getenv("CHATBOT_RERANK_FACTOR", "4")),
+                encode_workers=int(os.getenv("CHATBOT_ENCODE_WORKERS", "1")),
+                router=None if os.getenv("CHATBOT_ROUTING", "on") == "off" else QueryRouter(),
+                partition_quotas=quotas,
+            )
+
+        return self._get("chatbot", factory)
+
+    def text_to_sparql_service(self):
+        def factory():
+            from .text_to_sparql.text_to_sparql_service import TextToSparqlService
+
+            return TextToSparqlService(
+                self.sparql_service().get_graph(),
+                self.schema_content(),
+                os.getenv("GEMINI_API_KEY"),
+                llm=self.llm_provider(),
+                prompt_budget=int(os.getenv("TEXT_TO_SPARQL_PROMPT_BUDGET", "3000")),
+                embed=lambda text: self.embedding_model().encode(text),
+                cache_threshold=float(os.getenv("TEXT_TO_SPARQL_CACHE_THRESHOLD", "0.95")),
+                max_attempts=int(os.getenv("TEXT_TO_SPARQL_MAX_ATTEMPTS", "3")),
+                schema_file=self.schema_file(),
+                max_rows=int(os.getenv("SPARQL_MAX_ROWS", "1000")),
+                query_timeout=float(os.getenv("SPARQL_TIMEOUT_S", "10")),
+                max_evaluations=int(os.getenv("SPARQL_MAX_EVALUATIONS", "4")),
+            )
+
+        return self._get("text_to_sparql", factory)
+
+    def load(self, name):
+        return {
+            "sparql": self.sparql_service,
+            "dbpedia": self.dbpedia_service,
+            "chatbot": self.chatbot_service,
+            "text_to_sparql": self.text_to_sparql_service,
+            "embedding_model": self.embedding_model,
+            "llm": self.llm_provider,
+        }[name]()
+
+    def warmup(self, services=("sparql", "chatbot", "text_to_sparql"), background=True):
+        def run():
+            for name in services:
+                try:
+                    self.load(name)
+                except Exception as e:
+                    print(f"Warmup of {name} failed: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="services-warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+registry = ServiceRegistry()
@@ -1,11 +1,139 @@
+import queue
+import threading
+import time
 from urllib.parse import unquote
 from rdflib import Graph, URIRef, Namespace
 from rdflib.namespace import RDFS
-import owlrl
+from .startup import timed_phase
 
 CS = Namespace("http://data.cyclingtour.fr/schema#")
 CTO = Namespace("http://data.cyclingtour.fr/data#")
 
+# L'analyseur SPARQL de rdflib (pyparsing) n'est pas sûr entre threads: plusieurs premières analyses
+# simultanées le laissent dans un état faux. Les requêtes sont donc analysées une à une, puis évaluées
+# en parallèle.
+_parse_lock = threading.Lock()
+
+
+def prepare_query(query, graph=None):
+    from rdflib.plugins.sparql import prepareQuery
+
+    # Mêmes préfixes que graph.query(texte): ceux déclarés dans le graphe
+    init_ns = dict(graph.namespaces()) if graph is not None else {}
+    with _parse_lock:
+        return prepareQuery(query, initNs=init_ns)
+
+
+class QueryRejectedError(RuntimeError):
+    """Toutes les places d'évaluation sont prises: la requête n'est pas lancée."""
+
+    retry_after = 1.0
+
+
+class EvaluationPool:
+    """Threads d'évaluation partagés par les requêtes générées. Une évaluation garde sa place jusqu'à
+    sa vraie fin, échéance dépassée ou non (rdflib ne s'interrompt pas au milieu d'un calcul): au plus
+    max_workers calculs tournent, et une requête de plus est refusée au lieu d'empiler des threads.
+    Threads démons, comme avant: un calcul sans fin n'empêche pas l'arrêt du serveur."""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def _run(self, fn):
+        try:
+            fn()
+        finally:
+            self._slots.release()
+
+    def submit(self, fn):
+        if not self._slots.acquire(blocking=False):
+            raise QueryRejectedError(f"Too many SPARQL queries running ({self.max_workers}), try again later")
+        threading.Thread(target=self._run, args=(fn,), name="sparql-query", daemon=True).start()
+
+
+class QueryExecution:
+    """Évalue une requête sur un thread à part (pris dans pool s'il est fourni) et livre les lignes au fil
+    de l'eau.
+
+    S'arrête après max_rows lignes ou à l'échéance de timeout secondes; truncated vaut alors
+    "row_limit" ou "timeout". rdflib ne s'interrompt pas au milieu d'un calcul: après l'échéance,
+    le thread s'arrête à la ligne suivante et son résultat est ignoré."""
+
+    _END = object()
+
+    def __init__(self, graph, query, max_rows=None, timeout=None, pool=None):
+        self.graph = graph
+        self.query = query
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.pool = pool
+        self.truncated = None
+        self.row_count = 0
+        self.first_row_seconds = None
+        self.seconds = None
+        self._rows = queue.Queue()
+        self._stop = threading.Event()
+
+    def _row(self, result, row):
+        if result.type == "ASK":
+            return {"ask": str(bool(row)).lower()}
+        if result.type in ("CONSTRUCT", "DESCRIBE"):
+            return {"subject": str(row[0]), "predicate": str(row[1]), "object": str(row[2])}
+        # Variables non liées (OPTIONAL) omises plutôt que rendues "None"
+        return {str(var): str(row[var]) for var in row.labels if row[var] is not None}
+
+    def _run(self):
+        try:
+            query = prepare_query(self.query, self.graph) if isinstance(self.query, str) else self.query
+            result = self.graph.query(query)
+            produced = 0
+            for row in result:
+                if self._stop.is_set():
+                    break
+                self._rows.put(self._row(result, row))
+                produced += 1
+                # Une ligne de plus que la limite: elle indique seulement que le résultat est tronqué
+                if self.max_rows is not None and produced > self.max_rows:
+                    break
+        except Exception as e:
+            self._rows.put(e)
+        self._rows.put(self._END)
+
+    def __iter__(self):
+        start = time.perf_counter()
+        deadline = start + self.timeout if self.timeout else None
+        if self.pool is not None:
+            self.pool.submit(self._run)
+        else:
+            threading.Thread(target=self._run, name="sparql-query", daemon=True).start()
+        try:
+            while True:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    self.truncated = "timeout"
+                    break
+                try:
+                    item = self._rows.get(timeout=remaining)
+                except queue.Empty:
+                    self.truncated = "timeout"
+                    break
+                if item is self._END:
+                    break
+                if isinstance(item, Exception):
+                    raise Exception(f"Error executing query: {item}")
+                if self.max_rows is not None and self.row_count >= self.max_rows:
+                    self.truncated = "row_limit"
+                    break
+                if self.first_row_seconds is None:
+                    self.first_row_seconds = time.perf_counter() - start
+                self.row_count += 1
+                yield item
+        finally:
+            self._stop.set()
+            self.seconds = time.perf_counter() - start
+
+
 class SparqlService:
     def __init__(self, ttl_files):
         self.graph = Graph()
@@ -13,8 +141,10 @@ class SparqlService:
         self.graph.bind("cto", CTO)
         self.graph.bind("rdfs", RDFS)
         
-        self._load_ttl_files(ttl_files)
-        self.apply_inference()
+        with timed_phase("graph.parse"):
+            self._load_ttl_files(ttl_files)
+        with timed_phase("graph.inference"):
+            self.apply_inference()
 
     def _load_ttl_files(self, ttl_files):
         for ttl_file in ttl_files:
@@ -25,12 +155,14 @@ class SparqlService:
                 print(f"Error loading {ttl_file}: {e}")
 
     def apply_inference(self):
+        import owlrl
+
         print("Applying RDFS inference...")
         owlrl.DeductiveClosure(owlrl.RDFS_Semantics).expand(self.graph)
 
     def execute_query(self, query):
         try:
-            results = self.graph.query(query)
+            results = self.graph.query(prepare_query(query, self.graph))
             return [{str(var): str(row[var]) for var in row.labels} for row in results]
         except Exception as e:
             raise Exception(f"Error executing query: {e}")
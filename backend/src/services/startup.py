@@ -0,0 +1,49 @@
+import threading
+import time
+from contextlib import contextmanager
+
+PROCESS_START = time.perf_counter()
+
+_phases = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def timed_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+
+def record_phase(name, seconds):
+    with _lock:
+        _phases[name] = round(_phases.get(name, 0.0) + seconds, 4)
+
+
+def startup_report():
+    with _lock:
+        phases = dict(_phases)
+    return {"phases": phases, "seconds_since_process_start": round(time.perf_counter() - PROCESS_START, 4)}
+
+
+def process_memory(pid="self"):
+    # Linux: Pss répartit les pages partagées entre les processus qui les lisent (fork, mmap), Private est ce
+    # que le processus est seul à occuper. Vide ailleurs que sous Linux.
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    mb = lambda *names: round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+    }
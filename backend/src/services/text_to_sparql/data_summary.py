@@ -1,52 +1,53 @@
-from rdflib import Graph
+from rdflib import BNode, Graph
+from rdflib.namespace import RDF
+
+
+def graph_version(graph):
+    # Le graphe n'est modifié qu'au chargement (parse + inférence), qui change toujours sa taille
+    return len(graph)
 
 
 def get_rdf_data_summary(graph):
     summary = "### DATA SAMPLES & STRUCTURE\n"
     summary += "Here is a summary of the Classes and Properties found in the actual RDF data, with examples:\n\n"
 
-    query_classes = """
-    SELECT DISTINCT ?type WHERE {
-        ?s a ?type .
-    }
-    """
-    classes = graph.query(query_classes)
-    for row_c in classes:
-        class_uri = str(row_c.type)
-        if "www.w3.org" in class_uri and "schema.org" not in class_uri:
-            pass
+    # Un seul parcours des triplets rdf:type, dans l'ordre que suit "SELECT DISTINCT ?type { ?s a ?type }"
+    instances = {}
+    for s, _, class_uri in graph.triples((None, RDF.type, None)):
+        instances.setdefault(class_uri, []).append(s)
+
+    # Les triplets de chaque sujet ne sont lus qu'une fois, même s'il a plusieurs classes (inférence)
+    subject_triples = {}
+
+    for class_uri, subjects in instances.items():
         summary += f"#### Class: <{class_uri}>\n"
-        query_props = f"""
-        SELECT DISTINCT ?p WHERE {{
-            ?s a <{class_uri}> .
-            ?s ?p ?o .
-        }}
-        """
-
-        properties = graph.query(query_props)
-        if not properties:
+
+        # Propriétés dans l'ordre de première apparition, trois exemples au plus par propriété
+        samples = {}
+        # Classe anonyme (restriction OWL): l'ancienne requête <{class_uri}> ne trouvait rien, on garde ce rendu
+        for s in subjects if not isinstance(class_uri, BNode) else ():
+            if s not in subject_triples:
+                subject_triples[s] = list(graph.predicate_objects(s))
+            for p, o in subject_triples[s]:
+                values = samples.setdefault(p, [])
+                if len(values) < 3:
+                    values.append(o)
+
+        if not samples:
             summary += "  (No properties found for instances of this class)\n"
             continue
 
-        for row_p in properties:
-            prop_uri = str(row_p.p)
-            query_samples = f"""
-            SELECT ?o WHERE {{
-                ?s a <{class_uri}> .
-                ?s <{prop_uri}> ?o .
-            }} LIMIT 3
-            """
-
-            samples = graph.query(query_samples)
+        for prop_uri, objects in samples.items():
             sample_vals = []
-            for s_row in samples:
-                val = str(s_row.o)
+            for o in objects:
+                val = str(o)
                 val = val.replace("\n", " ").strip()
                 if len(val) > 50:
                     val = val[:47] + "..."
                 sample_vals.append(val)
 
             vals_str = ", ".join([f"'{v}'" for v in sample_vals])
+            prop_uri = str(prop_uri)
             prop_name = (
                 prop_uri.split("#")[-1] if "#" in prop_uri else prop_uri.split("/")[-1]
             )
@@ -43,3 +43,16 @@ def get_sparql_prompt(schema_content, data_summary, user_question):
     Assistant:
     """
 
+
+
+def get_retry_feedback(previous_query, error):
+    return f"""
+    ### PREVIOUS ATTEMPT (REJECTED)
+    Your previous answer was not a valid SPARQL query:
+    {previous_query}
+
+    The rdflib parser reported: {error}
+
+    Return a corrected query that follows the same OUTPUT FORMAT rules.
+    Assistant:
+    """
@@ -0,0 +1,161 @@
+import re
+
+from rdflib import BNode, Graph, URIRef
+from rdflib.collection import Collection
+from rdflib.namespace import OWL, RDFS, SKOS
+
+from ..chatbot.lexical_index import BM25Index, tokenize
+from ..llm.provider import estimate_tokens
+from .prompt import get_sparql_prompt
+
+# Questions en français (ou en anglais courant), schéma en anglais: équivalences du domaine pour l'appariement lexical
+SYNONYMS = {
+    "vélo": "bike", "vélos": "bike", "électrique": "electric", "route": "road", "vtt": "mountain bike",
+    "prix": "price", "tarif": "price", "jour": "day", "étape": "stage", "parcours": "path",
+    "chemin": "path", "itinéraire": "path", "départ": "start", "arrivée": "end", "longueur": "length",
+    "distance": "length", "dénivelé": "elevation gain", "difficulté": "difficulty", "facile": "easy",
+    "difficile": "hard", "moyen": "moderate", "montagne": "mountain", "col": "mountain",
+    "sommet": "mountain", "haut": "higher", "proche": "near", "réservation": "booking", "réservé": "booked",
+    "réserver": "booking", "client": "client", "avis": "review", "note": "rating", "commentaire": "review text",
+    "guide": "guide", "capacité": "capacity", "participants": "capacity", "durée": "duration",
+    "maintenance": "maintenance status", "réparation": "repair", "disponible": "available",
+    "téléphone": "phone", "contact": "contact", "date": "date", "circuit": "tour package", "séjour": "tour package",
+    "customer": "client", "rental": "bike booking", "rent": "bike booking", "cost": "price", "climb": "mountain",
+    "gradient": "elevation", "service": "maintenance status",
+}
+
+
+def split_camel_case(name):
+    return re.sub(r"(?<=[a-z])(?=[A-Z])", " ", name)
+
+
+def local_name(uri):
+    uri = str(uri)
+    return uri.split("#")[-1] if "#" in uri else uri.split("/")[-1]
+
+
+class SchemaPromptBuilder:
+    """Construit le prompt text-to-SPARQL avec les seuls termes du schéma (classes, propriétés, concepts)
+    proches de la question, et les exemples de données de ces classes, dans la limite de max_tokens."""
+
+    def __init__(self, schema_content, data_summary, max_tokens=3000):
+        self.schema_content = schema_content
+        self.data_summary = data_summary
+        self.max_tokens = max_tokens
+
+        self.prefixes, self.blocks = self._split_schema(schema_content)
+        self.summary_header, self.sections = self._split_summary(data_summary)
+        self.terms = list(self.blocks)
+
+        schema = Graph()
+        schema.parse(data=schema_content, format="turtle")
+        self.neighbors = {term: self._neighbors(schema, term) for term in self.terms}
+        self.lexical_index = BM25Index([self._describe(schema, term) for term in self.terms])
+        self.synonyms = {}
+        for word, translation in SYNONYMS.items():
+            for token in tokenize(word):
+                self.synonyms[token] = translation
+
+        self.full_tokens = estimate_tokens(get_sparql_prompt(schema_content, data_summary, ""))
+
+    def _split_schema(self, schema_content):
+        # Un bloc par sujet: de sa première ligne (colonne 0) jusqu'au sujet suivant
+        prefixes, blocks, current = [], {}, None
+        for line in schema_content.splitlines():
+            if line.startswith("@prefix"):
+                prefixes.append(line)
+            elif line.startswith("#") or not line.strip():
+                current = None
+            elif not line[0].isspace():
+                subject = line.split()[0]
+                current = blocks.setdefault(self._expand(subject, prefixes), [])
+                current.append(line)
+            elif current is not None:
+                current.append(line)
+        return "\n".join(prefixes), {term: "\n".join(lines) for term, lines in blocks.items()}
+
+    def _expand(self, curie, prefixes):
+        prefix, _, name = curie.partition(":")
+        for line in prefixes:
+            parts = line.split()
+            if parts[1] == prefix + ":":
+                return URIRef(parts[2].strip("<>") + name)
+        return URIRef(curie)
+
+    def _split_summary(self, data_summary):
+        header, sections, current = [], {}, None
+        for line in data_summary.splitlines():
+            match = re.match(r"#### Class: <(.*)>$", line)
+            if match:
+                current = sections.setdefault(URIRef(match.group(1)), [])
+            if current is None:
+                header.append(line)
+            elif line.strip():
+                current.append(line)
+        return "\n".join(header), {uri: "\n".join(lines) for uri, lines in sections.items()}
+
+    def _classes(self, schema, node):
+        # Classe nommée, ou membres d'un owl:unionOf
+        if isinstance(node, BNode):
+            union = schema.value(node, OWL.unionOf)
+            return [c for c in Collection(schema, union) if isinstance(c, URIRef)] if union else []
+        return [node]
+
+    def _neighbors(self, schema, term):
+        # Ce qu'il faut pour utiliser un terme: domaine et portée d'une propriété, classes parentes,
+        # propriétés inverses, schéma d'un concept SKOS
+        related = []
+        for predicate in (RDFS.domain, RDFS.range, RDFS.subClassOf, OWL.inverseOf, SKOS.inScheme, SKOS.broader):
+            for value in schema.objects(term, predicate):
+                related.extend(self._classes(schema, value))
+        return [t for t in dict.fromkeys(related) if t in self.blocks and t != term]
+
+    def _describe(self, schema, term):
+        words = [split_camel_case(local_name(term))]
+        for predicate in (RDFS.label, RDFS.comment, SKOS.prefLabel, SKOS.altLabel, SKOS.definition):
+            words.extend(str(value) for value in schema.objects(term, predicate))
+        return " ".join(words)
+
+    def _query(self, question):
+        tokens = tokenize(question)
+        return " ".join(tokens + [self.synonyms[t] for t in tokens if t in self.synonyms])
+
+    def _render(self, selected):
+        blocks = [self.blocks[t] for t in self.terms if t in selected]
+        sections = [text for uri, text in self.sections.items() if uri in selected]
+        schema = self.prefixes + "\n\n" + "\n\n".join(blocks)
+        summary = self.summary_header + "\n" + "\n\n".join(sections) + "\n"
+        return schema, summary
+
+    def build(self, question):
+        scores = self.lexical_index.scores(self._query(question))
+
+        # Termes trouvés, puis leurs voisins (demi-score), puis le reste dans l'ordre du schéma
+        priority = {}
+        for i in sorted(range(len(self.terms)), key=lambda i: -scores[i]):
+            if scores[i] <= 0:
+                break
+            term = self.terms[i]
+            priority[term] = max(priority.get(term, 0.0), float(scores[i]))
+            for neighbor in self.neighbors[term]:
+                priority[neighbor] = max(priority.get(neighbor, 0.0), float(scores[i]) / 2)
+        order = sorted(priority, key=priority.get, reverse=True)
+        order += [t for t in self.terms if t not in priority]
+
+        selected = set()
+        prompt = get_sparql_prompt(*self._render(selected), question)
+        for term in order:
+            candidate = get_sparql_prompt(*self._render(selected | {term}), question)
+            if estimate_tokens(candidate) > self.max_tokens:
+                continue
+            selected.add(term)
+            prompt = candidate
+
+        stats = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "full_prompt_tokens": self.full_tokens + estimate_tokens(question),
+            "schema_terms": len(selected),
+            "schema_terms_total": len(self.terms),
+            "matched_terms": sum(1 for term in priority if term in selected),
+        }
+        return prompt, stats
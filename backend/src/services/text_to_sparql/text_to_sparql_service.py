@@ -1,29 +1,211 @@
-from time import time
-from google import genai
-from google.genai import types
-from .data_summary import get_rdf_data_summary
-from .prompt import get_sparql_prompt
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from ..chatbot.vector_index import normalize
+from ..llm.provider import GeminiProvider, estimate_tokens
+from ..sparql_service import EvaluationPool, QueryExecution, prepare_query
+from .data_summary import get_rdf_data_summary, graph_version
+from .prompt import get_retry_feedback, get_sparql_prompt
+from .prompt_pruning import SchemaPromptBuilder
+from .translation_cache import TranslationCache
+from .validation import clean_sparql, parse_error
+
+# Dans backend/src, comme l'index du chatbot, quel que soit le dossier d'exécution
+CACHE_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "sparql_cache.pkl")
 
 
 class TextToSparqlService:
-    def __init__(self, graph, schema_content, api_key):
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, graph, schema_content, api_key, llm=None, prompt_budget=3000,
+                 cache_file=CACHE_FILE, embed=None, cache_threshold=0.95, max_attempts=3, schema_file=None,
+                 max_rows=1000, query_timeout=10.0, max_evaluations=4):
+        if not isinstance(max_attempts, int) or max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, not {max_attempts!r}")
+        self.api_key = api_key
+        self.llm = llm or GeminiProvider(api_key)
         self.graph = graph
         self.schema_content = schema_content
+        # Résumé des données calculé une fois, recalculé seulement si le graphe change
+        self._summary = None
+        self._summary_version = None
+        self._summary_lock = threading.Lock()
+        # Budget (tokens estimés) du prompt élagué aux termes du schéma proches de la question; 0: prompt complet
+        self.prompt_budget = prompt_budget
+        self._prompt_builder = None
+
+        # Requêtes déjà traduites et validées, vidées quand le schéma change (schema_file est surveillé
+        # s'il est fourni). embed(texte) -> vecteur permet de retrouver une question formulée autrement.
+        self.embed = embed
+        self.schema_file = schema_file
+        self._schema_mtime = os.stat(schema_file).st_mtime_ns if schema_file else None
+        self.translation_cache = TranslationCache(cache_file, self._schema_fingerprint(), cache_threshold)
+
+        # Une requête que rdflib ne sait pas lire est renvoyée au modèle avec l'erreur, max_attempts fois au plus
+        self.max_attempts = max_attempts
+        self._validation_lock = threading.Lock()
+        self.validation_stats = {"generated": 0, "retries": 0, "failures": 0}
+
+        # Plafonds d'exécution des requêtes générées; un appelant peut demander moins, pas plus.
+        # Au plus max_evaluations requêtes évaluées à la fois, celles dont l'échéance est passée comprises
+        self.max_rows = max_rows
+        self.query_timeout = query_timeout
+        self.evaluations = EvaluationPool(max_evaluations)
+
+    def data_summary(self):
+        version = graph_version(self.graph)
+        if self._summary_version != version:
+            with self._summary_lock:
+                if self._summary_version != version:
+                    self._summary = get_rdf_data_summary(self.graph)
+                    self._prompt_builder = None
+                    self._summary_version = version
+        return self._summary
+
+    def prompt_builder(self):
+        data_summary = self.data_summary()
+        with self._summary_lock:
+            if self._prompt_builder is None:
+                self._prompt_builder = SchemaPromptBuilder(self.schema_content, data_summary, self.prompt_budget)
+            return self._prompt_builder
+
+    def build_prompt(self, text_query):
+        if not self.prompt_budget:
+            prompt = get_sparql_prompt(self.schema_content, self.data_summary(), text_query)
+            return prompt, {"prompt_tokens": estimate_tokens(prompt), "full_prompt_tokens": estimate_tokens(prompt)}
+        return self.prompt_builder().build(text_query)
+
+    def _schema_fingerprint(self):
+        return hashlib.sha1(self.schema_content.encode("utf-8")).hexdigest()
+
+    def _check_schema(self):
+        if not self.schema_file:
+            return
+        mtime = os.stat(self.schema_file).st_mtime_ns
+        if mtime == self._schema_mtime:
+            return
+        with self._summary_lock:
+            if mtime == self._schema_mtime:
+                return
+            with open(self.schema_file, "r", encoding="utf-8") as f:
+                schema_content = f.read()
+            self._schema_mtime = mtime
+            if schema_content == self.schema_content:
+                return
+            print(f"{self.schema_file} changed, dropping cached SPARQL translations.")
+            self.schema_content = schema_content
+            self._prompt_builder = None
+        self.translation_cache.invalidate(self._schema_fingerprint())
+
+    def _lookup(self, text_query):
+        # Requête en cache, sinon le prompt à envoyer au LLM; renvoie (requête, embedding, prompt)
+        self._check_schema()
+        cached = self.translation_cache.get_exact(text_query)
+        if cached is not None:
+            return cached, None, None
+
+        embedding = normalize(self.embed(text_query)) if self.embed else None
+        cached = self.translation_cache.get_similar(text_query, embedding)
+        if cached is not None:
+            self.translation_cache.put(text_query, embedding, cached)
+            return cached, embedding, None
+
+        prompt, stats = self.build_prompt(text_query)
+        print(f"Text-to-SPARQL prompt: ~{stats['prompt_tokens']} tokens (full prompt ~{stats['full_prompt_tokens']}).")
+        return None, embedding, prompt
 
     def text_to_sparql(self, text_query):
-        data_summary = get_rdf_data_summary(self.graph)
-        prompt = get_sparql_prompt(self.schema_content, data_summary, text_query)
-        sparql_query = self.call_gemini_api(prompt)
+        cached, embedding, prompt = self._lookup(text_query)
+        if cached is not None:
+            return cached
+        sparql_query = self.generate_valid_sparql(prompt)
+        self.translation_cache.put(text_query, embedding, sparql_query)
+        return sparql_query
+
+    async def text_to_sparql_async(self, text_query, executor=None):
+        # Variante asyncio: embedding et construction du prompt dans executor, le LLM attendu sans thread
+        loop = asyncio.get_running_loop()
+        cached, embedding, prompt = await loop.run_in_executor(executor, self._lookup, text_query)
+        if cached is not None:
+            return cached
+        sparql_query = await self.generate_valid_sparql_async(prompt, executor)
+        self.translation_cache.put(text_query, embedding, sparql_query)
         return sparql_query
 
-    def call_gemini_api(self, prompt, model="gemini-2.5-flash-lite", temperature=0.0):
-        try:
-            response = self.client.models.generate_content(
-                model=model,
-                contents=prompt,
-                config=types.GenerateContentConfig(temperature=temperature),
-            )
-            return response.text
-        except Exception as e:
-            return f"An error occurred: {e}"
+    def execution_limits(self, max_rows=None, timeout=None):
+        """(max_rows, timeout) plafonnés par la configuration, None pour la valeur par défaut. ValueError
+        si une valeur n'est pas strictement positive: à appeler avant de commencer la réponse (400)."""
+        if max_rows is not None and (isinstance(max_rows, bool) or not isinstance(max_rows, int) or max_rows <= 0):
+            raise ValueError(f"limit must be a positive integer, not {max_rows!r}")
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not timeout > 0):
+            raise ValueError(f"timeout must be a positive number of seconds, not {timeout!r}")
+        return (self.max_rows if max_rows is None else min(max_rows, self.max_rows),
+                self.query_timeout if timeout is None else min(timeout, self.query_timeout))
+
+    def translate_and_execute(self, text_query, max_rows=None, timeout=None, batch_size=50):
+        # Événements (nom, données): "query" dès la traduction validée, "rows" par lots de batch_size
+        # lignes, puis "done" avec le nombre de lignes, la troncature éventuelle et le temps de chaque étape
+        max_rows, timeout = self.execution_limits(max_rows, timeout)
+        start = time.perf_counter()
+        sparql_query = self.text_to_sparql(text_query)
+        translated = time.perf_counter()
+        prepared = prepare_query(sparql_query, self.graph)
+        parsed = time.perf_counter()
+        timings = {
+            "translation_ms": round((translated - start) * 1000, 2),
+            "parse_ms": round((parsed - translated) * 1000, 2),
+        }
+        yield "query", {"query": sparql_query, "timings": dict(timings)}
+
+        execution = QueryExecution(self.graph, prepared, max_rows=max_rows, timeout=timeout, pool=self.evaluations)
+        batch = []
+        for row in execution:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield "rows", {"rows": batch}
+                batch = []
+        if batch:
+            yield "rows", {"rows": batch}
+
+        timings["execution_ms"] = round(execution.seconds * 1000, 2)
+        if execution.first_row_seconds is not None:
+            timings["first_row_ms"] = round(execution.first_row_seconds * 1000, 2)
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        yield "done", {"row_count": execution.row_count, "truncated": execution.truncated, "timings": timings}
+
+    def _validate(self, prompt, generated, attempt):
+        # Renvoie (requête, None) si rdflib la lit, sinon (None, prompt de la tentative suivante)
+        query = clean_sparql(generated)
+        error = parse_error(query, self.graph)
+        with self._validation_lock:
+            self.validation_stats["generated"] += 1
+            if error is not None:
+                self.validation_stats["retries" if attempt < self.max_attempts else "failures"] += 1
+        if error is None:
+            return query, None
+        print(f"Generated SPARQL rejected (attempt {attempt}/{self.max_attempts}): {error}")
+        if attempt == self.max_attempts:
+            raise ValueError(f"Generated SPARQL is still invalid after {self.max_attempts} attempts: {error}")
+        return None, prompt + get_retry_feedback(query, error)
+
+    def generate_valid_sparql(self, prompt):
+        attempt_prompt = prompt
+        for attempt in range(1, self.max_attempts + 1):
+            query, attempt_prompt = self._validate(prompt, self.generate(attempt_prompt), attempt)
+            if query is not None:
+                return query
+        # Inatteignable: _validate lève à la dernière tentative
+        raise ValueError(f"No valid SPARQL generated in {self.max_attempts} attempts")
+
+    async def generate_valid_sparql_async(self, prompt, executor=None):
+        loop = asyncio.get_running_loop()
+        attempt_prompt = prompt
+        for attempt in range(1, self.max_attempts + 1):
+            generated = await self.llm.agenerate(attempt_prompt, temperature=0.0, tag="text_to_sparql")
+            query, attempt_prompt = await loop.run_in_executor(executor, self._validate, prompt, generated, attempt)
+            if query is not None:
+                return query
+        raise ValueError(f"No valid SPARQL generated in {self.max_attempts} attempts")
+
+    def generate(self, prompt, temperature=0.0):
+        return self.llm.generate(prompt, temperature=temperature, tag="text_to_sparql")
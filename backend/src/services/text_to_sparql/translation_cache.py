@@ -0,0 +1,164 @@
+import atexit
+import os
+import pickle
+import re
+import threading
+import time
+import weakref
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou entre processus
+    fcntl = None
+
+from ..chatbot.answer_cache import normalize_question
+
+# Nombres et textes entre guillemets: deux questions proches qui diffèrent par ces valeurs
+# ("moins de 40 €" / "moins de 50 €") ne doivent pas partager la même requête. L'apostrophe d'une
+# élision (l'étape) n'ouvre pas de citation.
+LITERAL_RE = re.compile(r"\d+(?:[.,]\d+)?|\"[^\"]*\"|(?<!\w)'[^']*'|«[^»]*»")
+
+
+def literal_signature(question):
+    return tuple(sorted(m.strip("\"'«» ").casefold() for m in LITERAL_RE.findall(question)))
+
+
+# Un seul gestionnaire atexit pour tous les caches: recréer le service (rechargement) n'en ajoute pas
+_live_caches = weakref.WeakSet()
+
+
+@atexit.register
+def flush_all():
+    for cache in list(_live_caches):
+        cache.flush()
+
+
+class TranslationCache:
+    """Cache persistant question -> requête SPARQL validée: question normalisée exacte, puis question
+    proche (embedding) avec les mêmes valeurs littérales. Vidé quand l'empreinte du schéma change.
+
+    Le fichier est réécrit au plus une fois toutes les save_delay secondes, hors du verrou des lectures,
+    et à l'arrêt du processus: une traduction ne paie pas l'écriture de tout le cache. Les workers pre-fork
+    partagent ce fichier: chaque écriture fusionne, sous verrou, les entrées déjà sur disque."""
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, path, schema_fingerprint, similarity_threshold=0.95, max_entries=2048, save_delay=5.0):
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        # Vidé depuis la dernière écriture: les entrées sur disque ne sont alors pas reprises
+        self._cleared = False
+        self._timer = None
+        self._counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+        self.schema_fingerprint = schema_fingerprint
+        self._entries = self._load()
+        _live_caches.add(self)
+
+    def _load(self, schema_fingerprint=None, quiet=False):
+        schema_fingerprint = schema_fingerprint or self.schema_fingerprint
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable SPARQL cache {self.path}: {e}")
+            return {}
+        if data.get("version") != self.FORMAT_VERSION or data.get("schema") != schema_fingerprint:
+            if not quiet:
+                print(f"SPARQL cache {self.path} was built for another schema, starting empty.")
+            return {}
+        return data["entries"]
+
+    def _schedule_save(self):
+        # Sous self._lock: une seule écriture programmée à la fois (un minuteur hérité d'un fork n'est plus vivant)
+        self._dirty = True
+        if (self._timer is None or not self._timer.is_alive()) and self.path:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        # Instantané pris sous _save_lock: deux écritures successives ne peuvent pas s'inverser sur disque
+        with self._save_lock:
+            with self._lock:
+                self._timer = None
+                if not self._dirty or not self.path:
+                    return
+                self._dirty = False
+                cleared, self._cleared = self._cleared, False
+                schema, entries = self.schema_fingerprint, dict(self._entries)
+            with open(self.path + ".lock", "ab") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Lu sous le verrou: les traductions écrites par un autre worker depuis notre chargement sont gardées
+                merged = {} if cleared else self._load(schema, quiet=True)
+                merged.update(entries)
+                newest = sorted(merged.items(), key=lambda item: item[1]["created"])[-self.max_entries:]
+                data = {"version": self.FORMAT_VERSION, "schema": schema, "entries": dict(newest)}
+                # Nom propre au processus et au thread: deux workers ne tronquent pas le même fichier temporaire
+                tmp_file = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_file, "wb") as f:
+                    pickle.dump(data, f)
+                os.replace(tmp_file, self.path)
+
+    def get_exact(self, question):
+        with self._lock:
+            entry = self._entries.get(normalize_question(question))
+            if entry is None:
+                return None
+            self._counters["exact_hits"] += 1
+            return entry["sparql"]
+
+    def get_similar(self, question, embedding):
+        signature = literal_signature(question)
+        with self._lock:
+            best, best_score = None, self.similarity_threshold
+            for entry in self._entries.values() if embedding is not None else ():
+                if entry["embedding"] is None or entry["literals"] != signature:
+                    continue
+                score = float(np.dot(entry["embedding"], embedding))
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["semantic_hits"] += 1
+            return best["sparql"]
+
+    def put(self, question, embedding, sparql):
+        with self._lock:
+            self._entries[normalize_question(question)] = {
+                "question": question,
+                "sparql": sparql,
+                "embedding": None if embedding is None else np.asarray(embedding, dtype=np.float32),
+                "literals": literal_signature(question),
+                "created": time.time(),
+            }
+            # Dictionnaire ordonné par insertion: les plus anciennes entrées partent en premier
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._schedule_save()
+
+    def invalidate(self, schema_fingerprint=None):
+        with self._lock:
+            if schema_fingerprint is not None:
+                self.schema_fingerprint = schema_fingerprint
+            self._entries.clear()
+            self._cleared = True
+            self._counters["invalidations"] += 1
+            self._schedule_save()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters, entries=len(self._entries))
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,35 @@
+import json
+import re
+
+from ..sparql_service import prepare_query
+
+# "PREFIX cs: [http://...](http://...)": forme markdown recopiée des exemples du prompt
+MARKDOWN_IRI_RE = re.compile(r"\[(https?://[^\]\s]+)\]\(\1\)")
+
+
+def clean_sparql(text):
+    # Retire ce que le modèle ajoute autour de la requête: bloc ```sparql, réponse entière en chaîne JSON.
+    # Les \" d'un littéral SPARQL sont des échappements valides: ils ne sont pas touchés
+    query = (text or "").strip()
+    query = re.sub(r"^```(?:sparql)?\s*", "", query)
+    query = re.sub(r"\s*```$", "", query)
+    if len(query) > 1 and query[0] == query[-1] == '"':
+        try:
+            decoded = json.loads(query)
+        except ValueError:
+            decoded = None
+        if isinstance(decoded, str):
+            query = decoded.strip()
+    query = MARKDOWN_IRI_RE.sub(r"<\1>", query)
+    return query.strip()
+
+
+def parse_error(query, graph=None):
+    """Message d'erreur de rdflib si la requête ne se compile pas (syntaxe, préfixe inconnu...), sinon None.
+    Les préfixes déclarés par graph (cs:...) sont connus, comme à l'exécution. Les requêtes de mise à jour
+    (INSERT/DELETE) sont refusées: elles ne passent pas par prepareQuery."""
+    try:
+        prepare_query(query, graph)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
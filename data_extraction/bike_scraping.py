@@ -1,25 +1,40 @@
-import cloudscraper
+import argparse
+import asyncio
 from bs4 import BeautifulSoup
 from rdflib import Graph, Literal, RDF, URIRef, Namespace
 from rdflib.namespace import XSD, RDFS, FOAF
 from datetime import date, timedelta, datetime
-import time
 import random
 import re
 import os
+from urllib.parse import urlsplit
 from faker import Faker
+from crawler import CloudscraperFetcher, CrawlError, Crawler, HttpxFetcher
+from http_cache import HttpCache
+from triple_sink import TripleSink
 
 CS = Namespace("http://data.cyclingtour.fr/schema#")
 CTO_DATA = Namespace("http://data.cyclingtour.fr/data#")
 
+BASE_URL = "https://www.decathlon.fr"
+LISTING_PATH = "/tous-les-sports/velo-cyclisme/velos"
+REVIEWS_PATH = "/fr/ajax/nfs/openvoice/reviews/product/{sku}?page=0&size=20"
+CHECKPOINT_FILE = "data/bike_crawl.jsonl"
+OUTPUT_FOLDER = "../database"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+}
+
 fake = Faker("fr_FR")
 fake.seed_instance(42)
 
-g_bikes = Graph()
-g_clients = Graph()
-g_reviews = Graph()
-g_bookings = Graph()    
-g_tour_bookings = Graph()
+# Triplets écrits au fil de l'eau (data/rdf_stream), mis en forme dans --output-folder à la fin
+g_bikes = TripleSink("cto_data_bikes")
+g_clients = TripleSink("cto_data_clients")
+g_reviews = TripleSink("cto_data_reviews")
+g_bookings = TripleSink("cto_data_bookings_bike")
+g_tour_bookings = TripleSink("cto_data_bookings_tour")
 
 list_names_created = set()
 
@@ -99,23 +114,10 @@ def get_bike_type(name, description):
     return CS.Bike
 
 
-def fetch_real_reviews_via_api(scraper, sku, bike_uri, bike_slug):
-    api_url = f"https://www.decathlon.fr/fr/ajax/nfs/openvoice/reviews/product/{sku}?page=0&size=20"
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept": "application/json",
-    }
-    response = scraper.get(api_url, headers=headers)
-
-    if response.status_code != 200:
-        return
-
-    data = response.json()
-    reviews = data.get("reviews", [])
-
+def add_reviews(reviews, sku, bike_uri, bike_slug):
+    # Renvoie l'état de maintenance du vélo, déduit des réservations de ses clients
     if not reviews:
-        return
+        return CS.MaintenanceOperational
 
     has_in_progress = False
     latest_global_end_date = date.min
@@ -229,7 +231,6 @@ def fetch_real_reviews_via_api(scraper, sku, bike_uri, bike_slug):
         g_reviews.add((review_uri, CS.reviewedBy, client_uri))
         g_reviews.add((review_uri, CS.reviewsItem, bike_uri))
 
-    g_bikes.remove((bike_uri, CS.maintenanceStatus, None))
     final_maintenance_status = CS.MaintenanceOperational
 
     if has_in_progress:
@@ -246,16 +247,11 @@ def fetch_real_reviews_via_api(scraper, sku, bike_uri, bike_slug):
             [CS.MaintenanceOperational, CS.MaintenanceUnderRepair]
         )
 
-    g_bikes.add((bike_uri, CS.maintenanceStatus, final_maintenance_status))
+    return final_maintenance_status
 
 
-def scrape_bike_page(url, scraper):
-    print(f"Scraping : {url}")
-    response = scraper.get(url)
-    if response.status_code != 200:
-        return False
-
-    soup = BeautifulSoup(response.content, "html.parser")
+def parse_bike_page(html):
+    soup = BeautifulSoup(html, "html.parser")
 
     name_tag = soup.find("h1", class_=re.compile("product-name"))
     bike_name = name_tag.get_text(strip=True) if name_tag else "Vélo Inconnu"
@@ -267,82 +263,128 @@ def scrape_bike_page(url, scraper):
     desc_text = desc_div.get_text(" ", strip=True) if desc_div else ""
     full_desc = desc_text[:500].replace('"', "")
 
-    bike_slug = generate_slug(bike_name)
+    sku = None
+    ref_span = soup.find("span", class_=re.compile("current-selected-model"))
+    if ref_span:
+        match = re.search(r"Ref\.\s*:\s*(\d+)", ref_span.get_text())
+        if match:
+            sku = match.group(1)
+
+    return {"name": bike_name, "price": purchase_price, "description": full_desc, "sku": sku}
+
+
+async def crawl_bike(crawler, url):
+    # Résultat enregistré dans le checkpoint: page produit analysée et avis bruts de l'API. Seul un 404
+    # est définitif; tout autre échec (403 anti-robots...) lève CrawlError et le vélo sera retenté
+    response = await crawler.get(url)
+    if response.status_code == 404:
+        print(f"Page {url}: HTTP 404")
+        return None
+    if response.status_code != 200:
+        raise CrawlError(f"page HTTP {response.status_code}")
+    bike = parse_bike_page(response.content)
+    bike["reviews"] = []
+    if bike["sku"]:
+        site = urlsplit(url)
+        api_url = f"{site.scheme}://{site.netloc}" + REVIEWS_PATH.format(sku=bike["sku"])
+        reviews = await crawler.get(api_url, headers={"Accept": "application/json"})
+        if reviews.status_code == 200:
+            bike["reviews"] = reviews.json().get("reviews", [])
+        elif reviews.status_code != 404:
+            raise CrawlError(f"reviews HTTP {reviews.status_code}")
+    print(f"Scraped : {url} ({len(bike['reviews'])} avis)")
+    return bike
+
+
+def add_bike(bike):
+    bike_slug = generate_slug(bike["name"])
     bike_uri = CTO_DATA[f"Bike_{bike_slug}"]
 
-    g_bikes.add((bike_uri, RDF.type, get_bike_type(bike_name, full_desc)))
-    g_bikes.add((bike_uri, RDFS.label, Literal(bike_name, datatype=XSD.string)))
-    g_bikes.add((bike_uri, RDFS.comment, Literal(full_desc, datatype=XSD.string)))
-    rental_price = round(purchase_price * 0.015, 2)
+    g_bikes.add((bike_uri, RDF.type, get_bike_type(bike["name"], bike["description"])))
+    g_bikes.add((bike_uri, RDFS.label, Literal(bike["name"], datatype=XSD.string)))
+    g_bikes.add((bike_uri, RDFS.comment, Literal(bike["description"], datatype=XSD.string)))
+    rental_price = round(bike["price"] * 0.015, 2)
     g_bikes.add(
         (bike_uri, CS.pricePerDayBike, Literal(rental_price, datatype=XSD.decimal))
     )
     g_bikes.add((bike_uri, CS.availableFrom, Literal(date.today(), datatype=XSD.date)))
 
-    g_bikes.add((bike_uri, CS.maintenanceStatus, CS.MaintenanceOperational))
-
-    sku = None
-    ref_span = soup.find("span", class_=re.compile("current-selected-model"))
-    if ref_span:
-        match = re.search(r"Ref\.\s*:\s*(\d+)", ref_span.get_text())
-        if match:
-            sku = match.group(1)
-    if sku:
-        fetch_real_reviews_via_api(scraper, sku, bike_uri, bike_slug)
-    return True
+    # Un flux ne permet pas de corriger un triplet: l'état est écrit une fois les avis traités
+    maintenance_status = CS.MaintenanceOperational
+    if bike["sku"]:
+        maintenance_status = add_reviews(bike["reviews"], bike["sku"], bike_uri, bike_slug)
+    g_bikes.add((bike_uri, CS.maintenanceStatus, maintenance_status))
 
 
-def get_bike_links(main_url, scraper):
+async def get_bike_links(crawler, base_url):
     links = set()
-    response = scraper.get(main_url)
+    response = await crawler.get(base_url + LISTING_PATH)
     soup = BeautifulSoup(response.content, "html.parser")
     all_links = soup.find_all("a", href=True)
     for a in all_links:
         href = a["href"]
         if "/p/" in href and "/_/R-p-" in href:
             full_url = (
-                "https://www.decathlon.fr" + href if href.startswith("/") else href
+                base_url + href if href.startswith("/") else href
             )
             links.add(full_url.split("?")[0])
-    return list(links)
+    return sorted(links)
+
+
+async def crawl(args):
+    # cloudscraper pour Decathlon (protection anti-robots), httpx pour un serveur local (fixture_server.py)
+    fetcher = HttpxFetcher() if args.fetcher == "httpx" else CloudscraperFetcher()
+    crawler = Crawler(fetcher, headers=HEADERS, per_host=args.per_host, min_interval=args.min_interval,
+                      checkpoint=args.checkpoint, cache=HttpCache())
+    try:
+        all_links = await get_bike_links(crawler, args.base_url.rstrip("/"))
+        print(f"Found {len(all_links)} bike links.")
+        bikes = await crawler.run(all_links, crawl_bike)
+    finally:
+        await crawler.aclose()
+    print(f"Crawl: {crawler.report()}")
+    return all_links, bikes
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Crawl des vélos Decathlon et de leurs avis")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--fetcher", choices=["cloudscraper", "httpx"], default="cloudscraper")
+    parser.add_argument("--per-host", type=int, default=4, help="requêtes simultanées par hôte")
+    parser.add_argument("--min-interval", type=float, default=0.5, help="secondes minimum entre deux requêtes vers un hôte")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="reprise d'un crawl interrompu")
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER)
+    args = parser.parse_args()
+
     path_to_tour_ttl = "../database/cto_data_tour.ttl"
     
     load_tour_packages(path_to_tour_ttl)
     
     if not AVAILABLE_PACKAGES:
         print("ATTENTION: Aucun package n'a été chargé. Les TourBookings ne seront pas générés correctement.")
-    
-    scraper = cloudscraper.create_scraper()
-    main_url = "https://www.decathlon.fr/tous-les-sports/velo-cyclisme/velos"
 
-    all_links = get_bike_links(main_url, scraper)
-    print(f"Found {len(all_links)} bike links.")
+    if os.path.dirname(args.checkpoint):
+        os.makedirs(os.path.dirname(args.checkpoint), exist_ok=True)
+    all_links, bikes = asyncio.run(crawl(args))
 
     if len(all_links) == 0:
         print("No bike links found. Exiting.")
         return
 
-    for i, url in enumerate(all_links):
-        scrape_bike_page(url, scraper)
-        time.sleep(random.uniform(1, 3))
-
-    g_bikes.serialize("../database/cto_data_bikes.ttl", format="turtle")
-    print("cto_data_bikes.ttl generated")
-
-    g_clients.serialize("../database/cto_data_clients.ttl", format="turtle")
-    print("cto_data_clients.ttl generated")
-
-    g_reviews.serialize("../database/cto_data_reviews.ttl", format="turtle")
-    print("cto_data_reviews.ttl generated")
-
-    g_bookings.serialize("../database/cto_data_bookings_bike.ttl", format="turtle")
-    print("cto_data_bookings_bike.ttl generated")
-    
-    g_tour_bookings.serialize("../database/cto_data_bookings_tour.ttl", format="turtle")
-    print("cto_data_bookings_tour.ttl generated")
+    # Graphes construits après le crawl, dans l'ordre des liens: même résultat qu'on ait repris ou non
+    for url in all_links:
+        if bikes.get(url):
+            add_bike(bikes[url])
+
+    outputs = [
+        (g_bikes, "cto_data_bikes.ttl"),
+        (g_clients, "cto_data_clients.ttl"),
+        (g_reviews, "cto_data_reviews.ttl"),
+        (g_bookings, "cto_data_bookings_bike.ttl"),
+        (g_tour_bookings, "cto_data_bookings_tour.ttl"),
+    ]
+    for sink, file_name in outputs:
+        sink.finalize(os.path.join(args.output_folder, file_name))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
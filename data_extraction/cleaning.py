@@ -1,7 +1,12 @@
 import pandas as pd
+import random
 import requests
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from urllib.parse import quote
+from crawler import Checkpoint
+from http_cache import HttpCache, OfflineMiss
 
 FOLDER = "data/"
 INPUT_CSV = "tdf_stages_enriched_wiki_final.csv" 
@@ -10,45 +15,131 @@ LOG_FILE = "removed_uris.txt"
 MIN_YEAR = 2009
 SPARQL_ENDPOINT = "https://dbpedia.org/sparql"
 BATCH_SIZE = 50
+WORKERS = 4
+VERDICT_FILE = FOLDER + "dbpedia_verdicts.jsonl"
+
+cache = HttpCache()
 
 def get_full_url(uri_fragment):
     s = uri_fragment.strip()
     if not s: return None
     return f"http://dbpedia.org/resource/{s}"
 
-def check_uris_via_sparql(uri_list):
-    if not uri_list:
-        return set()
+class UriValidator:
+    """Vérifie l'existence d'URIs DBpedia par lots SPARQL (VALUES), plusieurs lots à la fois. Chaque URI
+    reçoit un verdict: "present", "absent" ou "unknown" (la vérification a échoué: rien ne permet de dire
+    qu'elle n'existe pas). Les erreurs passagères (429, 5xx, réseau, connexion impossible) sont retentées sur le
+    même lot avec attente exponentielle. Un lot trop long (413, 414, réponse trop lente: ReadTimeout) est coupé
+    en deux et la taille des lots suivants réduite d'autant; un lot refusé par le parseur (400) est coupé jusqu'à isoler l'URI mal formée, jugée
+    absente. Les verdicts définitifs sont gardés dans verdict_file d'une exécution à l'autre."""
 
-    values_clause = " ".join([f"<{u}>" for u in uri_list])
-    
-    query = f"""
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    SPLIT_STATUSES = {400, 413, 414}
+
+    def __init__(self, endpoint=SPARQL_ENDPOINT, batch_size=BATCH_SIZE, workers=WORKERS, max_retries=3,
+                 timeout=10, verdict_file=VERDICT_FILE):
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.verdicts = Checkpoint(verdict_file)
+        self.stats = {"cached": 0, "queries": 0, "retries": 0, "splits": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _query(self, batch):
+        values_clause = " ".join([f"<{u}>" for u in batch])
+        query = f"""
     SELECT DISTINCT ?s WHERE {{
       VALUES ?s {{ {values_clause} }}
       ?s ?p ?o .
     }}
     """
-
-    try:
         params = {'query': query, 'format': 'json'}
         headers = {'User-Agent': 'TDF-Data-Cleaner/1.0 (Student Lab)'}
-        
-        r = requests.get(SPARQL_ENDPOINT, params=params, headers=headers, timeout=10)
-        
-        if r.status_code != 200:
-            print(f"  [!] SPARQL Error {r.status_code}: {r.text[:100]}")
-            return set()
-            
-        data = r.json()
-        valid_uris = set()
-        for binding in data['results']['bindings']:
-            valid_uris.add(binding['s']['value'])
-            
-        return valid_uris
-        
-    except Exception as e:
-        print(f"  [!] Connection exception: {e}")
-        return set()
+        self._count("queries")
+        r = cache.get(self.endpoint, params=params, headers=headers, timeout=self.timeout)
+        if not r.from_cache:
+            time.sleep(0.1)
+        return r
+
+    def _too_long(self, batch):
+        # Les lots déjà en file au-dessus de la nouvelle limite sont coupés sans être envoyés
+        with self._lock:
+            self.batch_size = min(self.batch_size, max(1, len(batch) // 2))
+        return batch, "split"
+
+    def _check(self, batch):
+        # Renvoie (lot, URIs présentes) ou (lot, "split") ou (lot, None) si le verdict reste inconnu
+        if len(batch) > self.batch_size:
+            return batch, "split"
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = self._query(batch)
+                if r.status_code == 200:
+                    return batch, {b['s']['value'] for b in r.json()['results']['bindings']}
+            except OfflineMiss as e:
+                error = e
+                break
+            except requests.ReadTimeout as e:
+                # Seule une réponse trop lente dépend de la taille du lot; ConnectTimeout (endpoint
+                # injoignable) est retenté tel quel plus bas, sinon une panne éclaterait tous les lots
+                if len(batch) > 1:
+                    return self._too_long(batch)
+                error = e
+            except (requests.RequestException, ValueError, KeyError) as e:
+                error = e
+            else:
+                error = f"SPARQL Error {r.status_code}: {r.text[:100]}"
+                if r.status_code in (413, 414) and len(batch) > 1:
+                    return self._too_long(batch)
+                if r.status_code == 400:
+                    if len(batch) > 1:
+                        return batch, "split"
+                    print(f"  [!] Malformed URI {batch[0]}: {error}")
+                    return batch, set()
+                if r.status_code not in self.RETRY_STATUSES:
+                    break
+            if attempt < self.max_retries:
+                self._count("retries")
+                time.sleep(random.uniform(0, min(30, 2 ** attempt)))
+        print(f"  [!] Could not check {len(batch)} URIs ({batch[0]}...): {error}")
+        return batch, None
+
+    def validate(self, uris):
+        uris = sorted(set(uris))
+        verdicts = {uri: self.verdicts.results[uri] for uri in uris if uri in self.verdicts}
+        self.stats["cached"] = len(verdicts)
+        todo = [uri for uri in uris if uri not in verdicts]
+        print(f"  {len(verdicts)} verdicts from {self.verdicts.path}, {len(todo)} URIs to check "
+              f"({self.workers} concurrent batches of {self.batch_size})")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {pool.submit(self._check, todo[i:i + self.batch_size]) for i in range(0, len(todo), self.batch_size)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, present = future.result()
+                    if present == "split":
+                        self._count("splits")
+                        half = len(batch) // 2
+                        pending |= {pool.submit(self._check, batch[:half]), pool.submit(self._check, batch[half:])}
+                        continue
+                    # Écrits depuis ce seul thread: pas d'écritures concurrentes dans verdict_file
+                    for uri in batch:
+                        if present is None:
+                            verdicts[uri] = "unknown"
+                        else:
+                            verdicts[uri] = "present" if uri in present else "absent"
+                            self.verdicts.save(uri, verdicts[uri])
+        return verdicts
+
+    def close(self):
+        self.verdicts.close()
 
 def process_csv():
     print(f"Reading {FOLDER + INPUT_CSV}...")
@@ -78,22 +169,21 @@ def process_csv():
     
     print(f"Found {len(all_raw_uris)} unique URIs to validate.")
 
-    valid_map = set()
-    uri_list = list(all_raw_uris)
-    
-    for i in range(0, len(uri_list), BATCH_SIZE):
-        batch = uri_list[i : i + BATCH_SIZE]
-        print(f"  > Checking batch {i}-{i+len(batch)} via SPARQL...")
-        
-        valid_batch = check_uris_via_sparql(batch)
-        valid_map.update(valid_batch)
-        
-        time.sleep(0.1)
+    # Lots formés dans l'ordre trié: mêmes requêtes (et réponses en cache) d'une exécution à l'autre
+    validator = UriValidator()
+    try:
+        verdicts = validator.validate(all_raw_uris)
+    finally:
+        validator.close()
+    counts = pd.Series(list(verdicts.values())).value_counts().to_dict()
 
-    print(f"Validation complete. {len(valid_map)} URIs confirmed valid.")
+    print(f"Validation complete: {counts.get('present', 0)} present, {counts.get('absent', 0)} absent, "
+          f"{counts.get('unknown', 0)} unknown (kept). {validator.stats}")
+    print(f"HTTP cache: {cache.report()}")
 
     print("Cleaning CSV entries...")
     removed_log = []
+    unknown_log = []
     
     for index, row in df.iterrows():
         for col in uri_columns:
@@ -106,11 +196,15 @@ def process_csv():
             valid_parts = []
             
             for p in parts:
-                full_url = get_full_url(p)
-                if full_url in valid_map:
-                    valid_parts.append(p)
-                else:
+                verdict = verdicts.get(get_full_url(p))
+                if verdict == "absent":
                     removed_log.append(f"Row {index} [{col}]: Removed '{p}' (Not found in DBpedia)")
+                else:
+                    # Vérification impossible (erreur réseau, endpoint indisponible): l'URI est gardée
+                    if verdict == "unknown":
+                        unknown_log.append(f"Row {index} [{col}]: Kept '{p}' (DBpedia check failed)")
+                    if p:
+                        valid_parts.append(p)
             
             new_val = ",".join(valid_parts)
             df.at[index, col] = new_val
@@ -122,6 +216,9 @@ def process_csv():
     with open(LOG_FILE, "w", encoding="utf-8") as f:
         f.write(f"Total URIs removed: {len(removed_log)}\n")
         f.write("\n".join(removed_log))
+        if unknown_log:
+            f.write(f"\n\nTotal URIs kept without verification: {len(unknown_log)}\n")
+            f.write("\n".join(unknown_log))
 
     print("Done!")
 
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from http_cache import OfflineMiss, Response
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpxFetcher:
+    """Client HTTP asyncio (httpx), pour les sites sans protection anti-robots et le serveur de test."""
+
+    def __init__(self, timeout=30.0):
+        import httpx
+
+        self.client = httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+
+    async def __call__(self, url, headers):
+        response = await self.client.get(url, headers=headers)
+        return Response(url, response.status_code, response.headers, response.content)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class CloudscraperFetcher:
+    """cloudscraper (nécessaire pour Decathlon) n'a pas d'API asyncio: chaque requête part dans un thread,
+    avec une session par thread (les cookies de vérification sont propres à la session)."""
+
+    def __init__(self, timeout=30.0):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _get(self, url, headers):
+        import cloudscraper
+
+        if not hasattr(self._local, "scraper"):
+            self._local.scraper = cloudscraper.create_scraper()
+        response = self._local.scraper.get(url, headers=headers, timeout=self.timeout)
+        return Response(url, response.status_code, response.headers, response.content)
+
+    async def __call__(self, url, headers):
+        return await asyncio.to_thread(self._get, url, headers)
+
+    async def aclose(self):
+        pass
+
+
+class HostLimiter:
+    """Politesse envers un hôte: au plus max_concurrency requêtes simultanées, et un intervalle minimal entre
+    deux débuts de requête qui s'adapte aux réponses (AIMD): divisé par decrease à chaque succès jusqu'à
+    min_interval, doublé à chaque demande de ralentir jusqu'à max_interval. Un Retry-After suspend tout
+    l'hôte."""
+
+    def __init__(self, max_concurrency=4, min_interval=0.5, max_interval=30.0, decrease=0.9):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.decrease = decrease
+        self.interval = min_interval
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        await asyncio.sleep(start - now)
+
+    def on_success(self):
+        self.interval = max(self.min_interval, self.interval * self.decrease)
+
+    def on_throttle(self, retry_after=None):
+        self.interval = min(self.max_interval, max(self.interval * 2, self.min_interval or 0.1))
+        if retry_after:
+            self._next_start = max(self._next_start, time.monotonic() + retry_after)
+
+
+def retry_after_seconds(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Checkpoint:
+    """Résultats déjà obtenus, un par ligne JSON {key, result}, écrits au fil du crawl: un crawl interrompu
+    reprend là où il s'est arrêté. Une dernière ligne tronquée (arrêt brutal) est ignorée."""
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        truncated = False
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    truncated = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.results[record["key"]] = record["result"]
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        if truncated:
+            # Sinon la prochaine ligne serait collée au morceau de ligne laissé par l'arrêt
+            self._file.write("\n")
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def save(self, key, result):
+        self.results[key] = result
+        if self._file:
+            self._file.write(json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class CrawlError(Exception):
+    pass
+
+
+class Crawler:
+    """Moteur de crawl asyncio: limite de concurrence et débit adaptatif par hôte, nouvelles tentatives avec
+    attente exponentielle (jitter) sur erreurs réseau et codes 429 / 5xx, reprise sur checkpoint. Avec un
+    HttpCache, les réponses en cache sont servies sans passer par les limites de l'hôte."""
+
+    def __init__(self, fetcher=None, headers=None, per_host=4, min_interval=0.5, max_interval=30.0,
+                 max_retries=4, backoff_base=1.0, backoff_max=60.0, checkpoint=None, cache=None):
+        self.fetcher = fetcher or HttpxFetcher()
+        self.cache = cache
+        self.headers = headers or {}
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.checkpoint = Checkpoint(checkpoint)
+        self.hosts = {}
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0, "resumed": 0}
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(self.per_host, self.min_interval, self.max_interval)
+        return self.hosts[host]
+
+    async def get(self, url, headers=None):
+        headers = {**self.headers, **(headers or {})}
+        entry = self.cache.lookup(url, headers) if self.cache else None
+        if entry and self.cache.fresh(entry):
+            return self.cache.response(entry)
+        if self.cache and self.cache.mode == "offline":
+            raise OfflineMiss(f"{url} is not in the HTTP cache")
+
+        response = await self._fetch(url, {**headers, **(self.cache.conditional_headers(entry) if self.cache else {})})
+        if not self.cache:
+            return response
+        if response.status_code == 304 and entry:
+            return self.cache.revalidated(entry, url, headers)
+        return self.cache.store(url, headers, response)
+
+    async def _fetch(self, url, headers):
+        host = self._host(url)
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            async with host.semaphore:
+                await host.wait_turn()
+                self.stats["requests"] += 1
+                try:
+                    response = await self.fetcher(url, headers)
+                except Exception as e:
+                    error = e
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        host.on_success()
+                        return response
+                    error = CrawlError(f"HTTP {response.status_code}")
+                    retry_after = retry_after_seconds(response.headers.get("retry-after"))
+                    # 429, ou 503 avec Retry-After: l'hôte demande de ralentir; autres 5xx: simple erreur
+                    if response.status_code == 429 or retry_after is not None:
+                        self.stats["throttled"] += 1
+                        host.on_throttle(retry_after)
+            if attempt == self.max_retries:
+                break
+            self.stats["retries"] += 1
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            await asyncio.sleep(max(delay, retry_after or 0))
+        self.stats["failed"] += 1
+        raise CrawlError(f"{url}: {error}")
+
+    async def run(self, items, handler, key=str):
+        """handler(crawler, item) pour chaque élément pas encore dans le checkpoint; son résultat (sérialisable
+        en JSON) y est enregistré. Un élément en échec n'est pas enregistré et sera retenté à la reprise.
+        Renvoie {clé: résultat} pour tous les éléments, y compris ceux des crawls précédents."""
+        pending = [item for item in items if key(item) not in self.checkpoint]
+        self.stats["resumed"] = len(items) - len(pending)
+
+        async def one(item):
+            try:
+                result = await handler(self, item)
+            except Exception as e:
+                print(f"Échec {key(item)}: {e}")
+                return
+            self.checkpoint.save(key(item), result)
+
+        # La limite par hôte régule le débit: pas besoin de borner ici le nombre de tâches
+        await asyncio.gather(*(one(item) for item in pending))
+        return {key(item): self.checkpoint.results[key(item)] for item in items if key(item) in self.checkpoint}
+
+    async def aclose(self):
+        self.checkpoint.close()
+        await self.fetcher.aclose()
+
+    def report(self):
+        intervals = {host: round(limiter.interval, 2) for host, limiter in self.hosts.items()}
+        report = {**self.stats, "interval_s": intervals}
+        if self.cache:
+            report["cache"] = self.cache.report()
+        return report
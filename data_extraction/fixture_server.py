@@ -0,0 +1,137 @@
+"""Faux site Decathlon local pour tester bike_scraping.py sans réseau: page de liste, pages produit et API
+d'avis, avec latence, erreurs 500 / 503 injectées au hasard et 429 (Retry-After) au-delà de --rate-limit
+requêtes par seconde. Le serveur compte les requêtes, les refus et le maximum de requêtes simultanées,
+pour vérifier la politesse du crawler.
+
+Usage:
+    python fixture_server.py --port 8765 --products 50 --fail-rate 0.1 --rate-limit 20
+    python bike_scraping.py --base-url http://127.0.0.1:8765 --fetcher httpx --output-folder /tmp/bikes
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LISTING_PATH = "/tous-les-sports/velo-cyclisme/velos"
+
+
+def product_page(i):
+    return f"""<html><body>
+<h1 class="product-name">Vélo {'VTT électrique' if i % 3 == 0 else 'route Triban'} modèle {i}</h1>
+<span class="vtmn-price">{499 + i * 10},99 €</span>
+<div class="description">Vélo de test numéro {i}, cadre aluminium.</div>
+<span class="current-selected-model">Ref. : {800000 + i}</span>
+</body></html>""".encode()
+
+
+def reviews(sku):
+    i = int(sku) - 800000
+    return json.dumps({"reviews": [
+        {"author": {"username": f"client{i}_{j}"}, "comment": f"Avis {j} sur le vélo {i}", "rating": {"code": 1 + (i + j) % 5}}
+        for j in range(i % 4)
+    ]}).encode()
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, products=50, latency=0.05, fail_rate=0.0, rate_limit=0, retry_after=1, seed=0):
+        super().__init__(("127.0.0.1", port), FixtureHandler)
+        self.products = products
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = []
+        self.stats = {"requests": 0, "failures_injected": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.stats["requests"] += 1
+            server.stats["in_flight"] += 1
+            server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.stats["in_flight"])
+            # Fenêtre glissante d'une seconde pour la limite de débit
+            now = time.monotonic()
+            server.recent = [t for t in server.recent if now - t < 1] + [now]
+            limited = server.rate_limit and len(server.recent) > server.rate_limit
+            fail = not limited and server.random.random() < server.fail_rate
+            if limited:
+                server.stats["rate_limited"] += 1
+            if fail:
+                server.stats["failures_injected"] += 1
+        try:
+            time.sleep(server.latency)
+            if limited:
+                self.send(429, b"", "text/plain", {"Retry-After": str(server.retry_after)})
+            elif fail:
+                self.send(server.random.choice([500, 503]), b"", "text/plain")
+            else:
+                self.route()
+        finally:
+            with server.lock:
+                server.stats["in_flight"] -= 1
+
+    def route(self):
+        path = self.path.split("?")[0]
+        if path == LISTING_PATH:
+            links = "".join(f'<a href="/p/velo-{i}/_/R-p-{800000 + i}?mc={i}">Vélo {i}</a>' for i in range(self.server.products))
+            self.send(200, f"<html><body>{links}</body></html>".encode(), "text/html")
+        elif path.startswith("/p/velo-"):
+            i = int(path.split("/")[2].split("-")[1])
+            if i >= self.server.products:
+                self.send(404, b"", "text/plain")
+            else:
+                self.send(200, product_page(i), "text/html")
+        elif path.startswith("/fr/ajax/nfs/openvoice/reviews/product/"):
+            self.send(200, reviews(path.rsplit("/", 1)[1]), "application/json")
+        else:
+            self.send(404, b"", "text/plain")
+
+    def send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="secondes par réponse")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="proportion d'erreurs 500 / 503")
+    parser.add_argument("--rate-limit", type=float, default=0, help="requêtes par seconde au-delà desquelles répondre 429")
+    args = parser.parse_args()
+
+    server = FixtureServer(args.port, args.products, args.latency, args.fail_rate, args.rate_limit)
+    print(f"Fixture server on {server.url} ({args.products} products), Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Cache HTTP sur disque partagé par les scripts de collecte (Wikipedia, DBpedia, Decathlon).
+
+Chaque réponse est rangée en deux parties: une entrée JSON par requête (URL finale + en-tête Accept) qui
+garde le statut, les en-têtes utiles et l'empreinte sha256 du corps, et le corps lui-même compressé (gzip)
+sous son empreinte: deux pages identiques ne sont stockées qu'une fois.
+
+Modes (HTTP_CACHE_MODE):
+    cache       réponse en cache réutilisée telle quelle (revalidée au-delà de HTTP_CACHE_MAX_AGE secondes)
+    revalidate  requête conditionnelle à chaque fois (If-None-Match / If-Modified-Since; 304 = cache)
+    offline     aucun accès réseau: rejoue le cache, OfflineMiss si la réponse n'y est pas
+    refresh     tout est retéléchargé et le cache mis à jour
+Seules les réponses définitives (200, 404, 410) sont gardées; les 429 / 5xx sont renvoyées sans être
+stockées. Dossier: HTTP_CACHE_DIR (data/http_cache par défaut, relatif au dossier d'exécution).
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from requests.models import PreparedRequest
+
+CACHEABLE_STATUSES = {200, 404, 410}
+KEPT_HEADERS = ("content-type", "etag", "last-modified")
+MODES = ("cache", "revalidate", "offline", "refresh")
+
+
+class OfflineMiss(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = {k.lower(): v for k, v in headers.items()}
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def full_url(url, params=None):
+    if not params:
+        return url
+    request = PreparedRequest()
+    request.prepare_url(url, params)
+    return request.url
+
+
+class HttpCache:
+    def __init__(self, folder=None, mode=None, max_age=None):
+        self.folder = folder or os.getenv("HTTP_CACHE_DIR", "data/http_cache")
+        self.mode = mode or os.getenv("HTTP_CACHE_MODE", "cache")
+        if self.mode not in MODES:
+            raise ValueError(f"HTTP cache mode must be one of {MODES}, not {self.mode!r}")
+        if max_age is None and os.getenv("HTTP_CACHE_MAX_AGE"):
+            max_age = float(os.getenv("HTTP_CACHE_MAX_AGE"))
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "downloaded": 0, "stored_bytes": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def _path(self, kind, digest, suffix):
+        return os.path.join(self.folder, kind, digest[:2], digest + suffix)
+
+    def _write(self, path, data):
+        # Écriture puis renommage: un autre processus (ou un arrêt brutal) ne voit jamais de fichier partiel
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def key(self, url, headers=None):
+        accept = next((v for k, v in (headers or {}).items() if k.lower() == "accept"), "")
+        return hashlib.sha256(f"GET {url}\n{accept}".encode("utf-8")).hexdigest()
+
+    def lookup(self, url, headers=None):
+        if self.mode == "refresh":
+            return None
+        try:
+            with open(self._path("entries", self.key(url, headers), ".json"), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Corps supprimé à la main: l'entrée ne sert plus à rien
+        return entry if os.path.exists(self._path("objects", entry["body"], ".gz")) else None
+
+    def fresh(self, entry):
+        # Réutilisable sans requête réseau
+        if self.mode == "offline":
+            return True
+        if self.mode != "cache":
+            return False
+        return self.max_age is None or time.time() - entry["fetched_at"] <= self.max_age
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry["headers"].get("etag"):
+            headers["If-None-Match"] = entry["headers"]["etag"]
+        if entry and entry["headers"].get("last-modified"):
+            headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+        return headers
+
+    def response(self, entry):
+        with open(self._path("objects", entry["body"], ".gz"), "rb") as f:
+            content = gzip.decompress(f.read())
+        self._count("hits")
+        return Response(entry["url"], entry["status"], entry["headers"], content, from_cache=True)
+
+    def revalidated(self, entry, url, headers):
+        # 304: le corps en cache est toujours valable, seule la date de vérification change
+        entry = dict(entry, fetched_at=time.time())
+        self._write(self._path("entries", self.key(url, headers), ".json"), json.dumps(entry).encode("utf-8"))
+        self._count("revalidated")
+        return self.response(entry)
+
+    def store(self, url, headers, response):
+        self._count("downloaded")
+        if response.status_code not in CACHEABLE_STATUSES:
+            return response
+        digest = hashlib.sha256(response.content).hexdigest()
+        body_path = self._path("objects", digest, ".gz")
+        if not os.path.exists(body_path):
+            compressed = gzip.compress(response.content, compresslevel=6)
+            self._write(body_path, compressed)
+            self._count("stored_bytes", len(compressed))
+        entry = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            "body": digest,
+            "fetched_at": time.time(),
+        }
+        self._write(self._path("entries", self.key(url, headers), ".json"), json.dumps(entry).encode("utf-8"))
+        return response
+
+    @property
+    def session(self):
+        # Une session (connexions keep-alive) par thread: get() peut être appelé depuis un pool de threads
+        if not hasattr(self._local, "session"):
+            import requests
+
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def get(self, url, params=None, headers=None, timeout=10):
+        """Équivalent de requests.get(url, params, headers, timeout) qui passe par le cache."""
+        url = full_url(url, params)
+        entry = self.lookup(url, headers)
+        if entry and self.fresh(entry):
+            return self.response(entry)
+        if self.mode == "offline":
+            raise OfflineMiss(f"{url} is not in the HTTP cache ({self.folder})")
+
+        r = self.session.get(url, headers={**(headers or {}), **self.conditional_headers(entry)}, timeout=timeout)
+        if r.status_code == 304 and entry:
+            return self.revalidated(entry, url, headers)
+        return self.store(url, headers, Response(url, r.status_code, r.headers, r.content))
+
+    def report(self):
+        with self._lock:
+            return dict(self.stats, mode=self.mode)
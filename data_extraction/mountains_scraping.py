@@ -1,9 +1,9 @@
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 import time
 import re
 from urllib.parse import quote
+from http_cache import HttpCache
 
 FOLDER = "data/"
 
@@ -15,6 +15,8 @@ HEADERS = {
     "User-Agent": "Mountain-Scraper/1.0 (Educational Project)"
 }
 
+cache = HttpCache()
+
 def get_mountain_details(mountain_name):
     safe_name = mountain_name.replace(" ", "_")
     url = WIKI_BASE_URL + quote(safe_name)
@@ -30,8 +32,10 @@ def get_mountain_details(mountain_name):
     }
 
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        
+        response = cache.get(url, headers=HEADERS, timeout=10)
+        if not response.from_cache:
+            time.sleep(0.1)
+
         if response.status_code != 200:
             print(f"Not found {url}")
             return data
@@ -92,7 +96,6 @@ def main():
         print(f"[{i}/{total}] Scraping : {mountain}")
         details = get_mountain_details(mountain)
         results.append(details)
-        time.sleep(0.1)
 
     df_results = pd.DataFrame(results)
     
@@ -100,6 +103,7 @@ def main():
     df_results = df_results[cols_order]
     
     df_results.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
+    print(f"HTTP cache: {cache.report()}")
 
 if __name__ == "__main__":
     main()
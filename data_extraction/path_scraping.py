@@ -1,12 +1,19 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 import re
 import urllib.parse
+from http_cache import HttpCache
 
 DATA_FOLDER = "data/"
 INPUT_FILE = "tdf_stages.csv"
 OUTPUT_FILE = "tdf_stages_enriched_wiki_final.csv"
+FIXTURE_FILE = "fixtures/tdf_stages_sample.csv"
+FETCH_WORKERS = 8
 
 def clean_distance(dist_str):
     if pd.isna(dist_str): return 0
@@ -40,6 +47,9 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
+# Pages Wikipedia gardées sur disque: une nouvelle exécution (après correction du parsing) ne retélécharge rien
+cache = HttpCache()
+
 def get_wiki_url(year, stage):
     if str(stage) == "1":
         stage_str = "1re"
@@ -52,7 +62,7 @@ def get_wiki_url(year, stage):
 def scrape_stage_data(year, stage, is_mountain_stage=False):
     url = get_wiki_url(year, stage)
     try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = cache.get(url, headers=HEADERS, timeout=10)
         if response.status_code != 200:
             return None, []
 
@@ -90,50 +100,101 @@ def scrape_stage_data(year, stage, is_mountain_stage=False):
         print(f"Error scraping {year} stage {stage}: {e}")
         return None, []
 
-print("1. Reading CSV...")
-df = pd.read_csv(DATA_FOLDER + INPUT_FILE)
+def clean_mountains_for_uri(mt_string):
+    if not mt_string: return ""
+    names = str(mt_string).split(", ")
+    uris = [dbpedia_format(n) for n in names]
+    return ",".join(uris)
 
-print("2. Cleaning Data (Splitting Cities)...")
-df[['Start_City', 'End_City']] = df['Course'].apply(lambda x: pd.Series(split_course(x)))
-df['Distance_Value'] = df['Distance'].apply(clean_distance)
 
-df['Elevation_Gain'] = 0
-df['Mountain_Name'] = ""
+# Versions vectorisées des fonctions ci-dessus (mêmes résultats, vérifiés par --check)
 
-i=0
-total_rows = len(df)
+def dbpedia_format_series(names):
+    return names.str.strip().str.replace(" ", "_", regex=False).str.replace("’", "'", regex=False)
 
-print("3. Scraping Wikipedia for enrichment...")
 
-for index, row in df.iterrows():
-    type_str = str(row['Type']).lower()
+def clean_distance_series(distances):
+    values = distances.astype("string").str.extract(r"(\d+(?:\.\d+)?)", expand=False)
+    return pd.to_numeric(values, errors="coerce").fillna(0).astype(float)
 
-    i += 1
-    if i % 100 == 0 or i == total_rows:
-        print(f"   Processing row {i}/{total_rows} - Year: {row['Year']}, Stage: {row['Stage']}")
 
-    ele, mts = scrape_stage_data(row['Year'], row['Stage'], "mountain" in type_str)
-    
-    if ele: 
-        df.at[index, 'Elevation_Gain'] = ele
-    else:
-        if "high" in type_str: df.at[index, 'Elevation_Gain'] = 4000
-        elif "mountain" in type_str: df.at[index, 'Elevation_Gain'] = 2500
-        
-    if mts: 
-        df.at[index, 'Mountain_Name'] = ", ".join(mts)
+def split_course_series(courses):
+    parts = courses.astype("string").str.split(r" to | - ", regex=True)
+    start = parts.str[0].str.strip().fillna("Unknown")
+    end = parts.str[1].str.strip().fillna("Unknown")
+    return start, end
+
+
+def format_city_uri_series(names):
+    names = names.astype("string").str.strip()
+    parts = names.str.extract(r"^(.*?)\s*\((.*?)\)$")
+    complex_uri = dbpedia_format_series(parts[0]) + "," + dbpedia_format_series(parts[1])
+    return complex_uri.fillna(dbpedia_format_series(names)).fillna("").astype(object)
+
+
+def mountains_uri_series(names):
+    names = names.fillna("").astype("string")
+    # split(", ") puis dbpedia_format de chaque nom: les espaces autour des séparateurs disparaissent
+    return dbpedia_format_series(names.str.replace(r"\s*, \s*", ",", regex=True)).astype(object)
+
+
+@contextmanager
+def timed(name, timings):
+    start = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - start, 3)
+
+
+def clean_stages(df):
+    df = df.copy()
+    df['Start_City'], df['End_City'] = split_course_series(df['Course'])
+    df['Start_City'] = df['Start_City'].astype(object)
+    df['End_City'] = df['End_City'].astype(object)
+    df['Distance_Value'] = clean_distance_series(df['Distance'])
+    return df
 
-def clean_mountains_for_uri(mt_string):
-    if not mt_string: return ""
-    names = str(mt_string).split(", ")
-    uris = [dbpedia_format(n) for n in names]
-    return ",".join(uris)
 
-print("4. Formatting URIs...")
+def enrich_stages(df, scrape=None, workers=FETCH_WORKERS):
+    """Une seule requête par étape (Year, Stage) même si elle apparaît sur plusieurs lignes, les pages
+    téléchargées en parallèle, puis un seul merge avec le tableau."""
+    scrape = scrape or scrape_stage_data
+    type_str = df['Type'].astype(str).str.lower()
+    is_mountain = type_str.str.contains("mountain", regex=False)
+
+    keys = df.assign(is_mountain=is_mountain).groupby(['Year', 'Stage'], sort=False)['is_mountain'].any()
+    total = len(keys)
+    done = [0]
+
+    def fetch(key):
+        (year, stage), mountain = key
+        elevation, mountains = scrape(year, stage, mountain)
+        done[0] += 1
+        if done[0] % 100 == 0 or done[0] == total:
+            print(f"   Scraped {done[0]}/{total} stages")
+        return year, stage, elevation, ", ".join(mountains) if mountains else ""
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        scraped = pd.DataFrame(list(pool.map(fetch, keys.items())),
+                               columns=['Year', 'Stage', 'Scraped_Elevation', 'Scraped_Mountains'])
+
+    df = df.merge(scraped, on=['Year', 'Stage'], how='left')
+    elevation = pd.to_numeric(df['Scraped_Elevation'], errors='coerce').fillna(0)
+    # Pas de dénivelé trouvé: valeur par défaut selon le type d'étape
+    df['Elevation_Gain'] = np.select(
+        [elevation > 0, type_str.str.contains("high", regex=False).to_numpy(), is_mountain.to_numpy()],
+        [elevation, 4000, 2500],
+        default=0,
+    ).astype(int)
+    df['Mountain_Name'] = df['Scraped_Mountains'].where(is_mountain.to_numpy(), "").fillna("").astype(object)
+    return df.drop(columns=['Scraped_Elevation', 'Scraped_Mountains'])
+
+
+def format_uris(df):
+    df['Start_City_URI'] = format_city_uri_series(df['Start_City'])
+    df['End_City_URI'] = format_city_uri_series(df['End_City'])
+    df['Mountain_URI'] = mountains_uri_series(df['Mountain_Name'])
+    return df
 
-df['Start_City_URI'] = df['Start_City'].apply(format_complex_city_uri)
-df['End_City_URI'] = df['End_City'].apply(format_complex_city_uri)
-df['Mountain_URI'] = df['Mountain_Name'].apply(clean_mountains_for_uri)
 
 output_columns = [
     'Year', 'Stage', 'Start_City', 'End_City', 
@@ -141,5 +202,86 @@ output_columns = [
     'Mountain_Name', 'Start_City_URI', 'End_City_URI', 'Mountain_URI'
 ]
 
-df.to_csv(DATA_FOLDER + OUTPUT_FILE, columns=output_columns, index=False)
-print(f"\nSaved to '{DATA_FOLDER + OUTPUT_FILE}'.")
+
+def run_pipeline(df, scrape=None, workers=FETCH_WORKERS, timings=None):
+    timings = {} if timings is None else timings
+    with timed("clean", timings):
+        df = clean_stages(df)
+    with timed("scrape", timings):
+        df = enrich_stages(df, scrape, workers)
+    with timed("uris", timings):
+        df = format_uris(df)
+    return df[output_columns]
+
+
+def run_pipeline_rowwise(df, scrape):
+    # Ancienne version ligne à ligne, gardée comme référence pour --check
+    df = df.copy()
+    df[['Start_City', 'End_City']] = df['Course'].apply(lambda x: pd.Series(split_course(x)))
+    df['Distance_Value'] = df['Distance'].apply(clean_distance)
+    df['Elevation_Gain'] = 0
+    df['Mountain_Name'] = ""
+    for index, row in df.iterrows():
+        type_str = str(row['Type']).lower()
+        ele, mts = scrape(row['Year'], row['Stage'], "mountain" in type_str)
+        if ele:
+            df.at[index, 'Elevation_Gain'] = ele
+        else:
+            if "high" in type_str: df.at[index, 'Elevation_Gain'] = 4000
+            elif "mountain" in type_str: df.at[index, 'Elevation_Gain'] = 2500
+        if mts:
+            df.at[index, 'Mountain_Name'] = ", ".join(mts)
+    df['Start_City_URI'] = df['Start_City'].apply(format_complex_city_uri)
+    df['End_City_URI'] = df['End_City'].apply(format_complex_city_uri)
+    df['Mountain_URI'] = df['Mountain_Name'].apply(clean_mountains_for_uri)
+    return df[output_columns]
+
+
+def fixture_scrape(year, stage, is_mountain_stage=False):
+    # Réponses déterministes à la place de Wikipedia: pas de page, dénivelé nul, ou dénivelé et cols
+    seed = (int(year) * 31 + sum(map(ord, str(stage)))) % 5
+    if seed == 0:
+        return None, []
+    if seed == 1:
+        return 0, []
+    mountains = ["Col du Tourmalet", "Côte de l’Alpe", " Alpe d'Huez"][: seed - 1] if is_mountain_stage else []
+    return 800 + seed * 350, mountains
+
+
+def regression_check(fixture):
+    df = pd.read_csv(fixture)
+    timings = {}
+    expected = run_pipeline_rowwise(df, fixture_scrape)
+    actual = run_pipeline(df, fixture_scrape, timings=timings)
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+    print(f"OK: {len(df)} rows of {fixture} identical to the row-wise version ({timings})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrichissement des étapes du Tour de France depuis Wikipedia")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, help="pages Wikipedia téléchargées en parallèle")
+    parser.add_argument("--check", nargs="?", const=FIXTURE_FILE, metavar="CSV",
+                        help="compare le pipeline à la version ligne à ligne sur un CSV de test, sans réseau")
+    args = parser.parse_args()
+
+    if args.check:
+        regression_check(args.check)
+        return
+
+    timings = {}
+    print("1. Reading CSV...")
+    with timed("read", timings):
+        df = pd.read_csv(DATA_FOLDER + INPUT_FILE)
+
+    print("2. Cleaning, scraping Wikipedia and formatting URIs...")
+    df = run_pipeline(df, workers=args.workers, timings=timings)
+
+    with timed("write", timings):
+        df.to_csv(DATA_FOLDER + OUTPUT_FILE, index=False)
+    print(f"\nSaved to '{DATA_FOLDER + OUTPUT_FILE}'.")
+    print(f"Timings (s): {timings}")
+    print(f"HTTP cache: {cache.report()}")
+
+
+if __name__ == "__main__":
+    main()
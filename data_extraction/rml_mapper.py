@@ -0,0 +1,439 @@
+"""Exécute mapping.ttl sans moteur RML externe. Seul le sous-ensemble de RML / R2RML utilisé par le projet est
+interprété: sources CSV, rr:template, rml:reference, rr:constant (rr:class, rr:predicate, rr:object),
+rr:termType, rr:datatype, rr:language et les fonctions GREL string_split / string_replace (fnml). Tout autre
+élément du mapping lève une MappingError plutôt que d'être ignoré.
+
+Les CSV sont lus par blocs de --chunksize lignes et chaque terme est calculé colonne par colonne sur le bloc
+(pandas), puis écrit aussitôt: la mémoire ne dépend pas de la taille des sources.
+    --format nt      N-Triples, une ligne par triplet
+    --format turtle  Turtle, un bloc par ligne du CSV (sujet; prédicats; objets), préfixes du mapping
+    --format pretty  N-Triples puis passe finale rdflib (sujets triés, objets regroupés): même mise en forme
+                     que database/cto_mountains_paths.ttl, mais le graphe entier est chargé en mémoire
+Les valeurs vides d'un CSV sont des valeurs nulles: le triplet correspondant n'est pas produit.
+
+Le fichier database/cto_mountains_paths.ttl contient aussi des triplets cs:isNear que le mapping ne produit
+pas: la sortie va donc par défaut dans data/, et écraser un fichier existant (autre que cette sortie par
+défaut) demande --force.
+
+Usage (depuis data_extraction/, après cleaning4mapping.py):
+    python rml_mapper.py [--output data/cto_mountains_paths.ttl] [--format pretty]
+    python rml_mapper.py --sources fixtures --check fixtures/cto_mountains_paths_expected.ttl
+    python rml_mapper.py --check ../database/cto_mountains_paths.ttl   # liste les cs:isNear manquants
+Les fixtures sont quelques lignes des CSV ready et le sous-graphe correspondant de database/cto_mountains_paths.ttl.
+"""
+import argparse
+import difflib
+import os
+import re
+import sys
+import tempfile
+import time
+from functools import lru_cache
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+from rdflib import Graph, Literal, Namespace, RDF, XSD
+from triple_sink import TurtleNames, pretty_turtle, turtle_header
+
+MAPPING_FILE = "../mapping.ttl"
+OUTPUT_FILE = "data/cto_mountains_paths.ttl"
+CHUNKSIZE = 10000
+
+RR = Namespace("http://www.w3.org/ns/r2rml#")
+RML = Namespace("http://semweb.mmlab.be/ns/rml#")
+QL = Namespace("http://semweb.mmlab.be/ns/ql#")
+FNML = Namespace("http://semweb.mmlab.be/ns/fnml#")
+FNO = Namespace("https://w3id.org/function/ontology#")
+GREL = Namespace("http://users.ugent.be/~bjdmeest/function/grel.ttl#")
+
+# Vocabulaires du mapping lui-même: absents des données produites. Le moteur utilisé jusqu'ici les
+# remplaçait par le seul préfixe rml: de RML-Core, que l'on garde pour des fichiers identiques
+MAPPING_VOCABULARIES = {str(RR), str(RML), str(QL)}
+OUTPUT_PREFIXES = {"rml": "http://w3id.org/rml/"}
+
+SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:")
+TEMPLATE_PART = re.compile(r"\\([{}\\])|\{([^}]*)\}")
+
+
+class MappingError(Exception):
+    pass
+
+
+@lru_cache(maxsize=65536)
+def iri_safe(value):
+    # Valeur insérée dans un template IRI: tout ce qui n'est pas alphanumérique ASCII ou -._~ est encodé
+    return quote(value, safe="")
+
+
+def nt_literal(values):
+    special = values.str.contains(r'[\\"\n\r]', regex=True)
+    if special.any():
+        values = values.where(~special, values[special].str.replace("\\", "\\\\", regex=False)
+                              .str.replace('"', '\\"', regex=False).str.replace("\n", "\\n", regex=False)
+                              .str.replace("\r", "\\r", regex=False))
+    return '"' + values + '"'
+
+
+def join_rows(values, separator):
+    # Valeurs contiguës d'une même ligne (index répété) jointes par separator, sans groupby Python
+    first = ~values.index.duplicated()
+    if first.all():
+        return values
+    pieces = np.where(first, values.to_numpy(dtype=object), (separator + values).to_numpy(dtype=object))
+    starts = np.flatnonzero(first)
+    return pd.Series(np.add.reduceat(pieces, starts), index=values.index[starts], dtype=object)
+
+
+class TermMap:
+    """Un rr:subjectMap / rr:objectMap, ou une constante (rr:class, rr:predicate, rr:object)."""
+
+    def __init__(self, kind, value, term_type, datatype=None, language=None):
+        self.kind = kind  # "constant", "reference", "template" ou "function"
+        self.value = value
+        self.term_type = term_type
+        # RDF 1.1: xsd:string est le type des littéraux simples, inutile de l'écrire
+        self.datatype = None if datatype == str(XSD.string) else datatype
+        self.language = language
+
+    @classmethod
+    def parse(cls, g, node, subject=False):
+        term_type = g.value(node, RR.termType)
+        datatype = g.value(node, RR.datatype)
+        language = g.value(node, RR.language)
+        if (node, RR.constant, None) in g:
+            constant = g.value(node, RR.constant)
+            kind = "constant"
+            value = str(constant)
+            term_type = term_type or (RR.Literal if isinstance(constant, Literal) else RR.IRI)
+        elif (node, RML.reference, None) in g:
+            kind, value = "reference", str(g.value(node, RML.reference))
+            term_type = term_type or (RR.IRI if subject else RR.Literal)
+        elif (node, RR.template, None) in g:
+            kind, value = "template", str(g.value(node, RR.template))
+            term_type = term_type or RR.IRI
+        elif (node, FNML.functionValue, None) in g:
+            kind, value = "function", FunctionCall.parse(g, g.value(node, FNML.functionValue))
+            term_type = term_type or RR.Literal
+        elif (node, RR.parentTriplesMap, None) in g:
+            raise MappingError(f"rr:parentTriplesMap (join) is not supported ({node})")
+        else:
+            raise MappingError(f"term map {node} has no rr:constant, rml:reference, rr:template or fnml:functionValue")
+        if datatype or language:
+            term_type = RR.Literal
+        if term_type not in (RR.IRI, RR.Literal):
+            raise MappingError(f"term type {term_type} is not supported ({node})")
+        return cls(kind, value, term_type, datatype and str(datatype), language and str(language))
+
+    def columns(self):
+        if self.kind == "reference":
+            return {self.value}
+        if self.kind == "template":
+            return {column for _, column in template_parts(self.value) if column is not None}
+        if self.kind == "function":
+            return self.value.columns()
+        return set()
+
+    def values(self, chunk):
+        """Valeur lexicale (IRI complète pour un template IRI) de chaque ligne du bloc; NaN si nulle.
+        Une fonction peut renvoyer une liste de valeurs par ligne."""
+        if self.kind == "constant":
+            return pd.Series(self.value, index=chunk.index, dtype=object)
+        if self.kind == "reference":
+            column = chunk[self.value]
+            return column.where(column != "")
+        if self.kind == "function":
+            return self.value.values(chunk)
+        result = pd.Series("", index=chunk.index, dtype=object)
+        null = np.zeros(len(chunk), dtype=bool)
+        for text, column in template_parts(self.value):
+            if column is None:
+                result = result + text
+                continue
+            values = chunk[column]
+            null |= (values == "").to_numpy()
+            result = result + (values.map(iri_safe) if self.term_type == RR.IRI else values)
+        return result.where(~null)
+
+    def terms(self, chunk, base):
+        """Termes N-Triples du bloc, indexés par ligne: les lignes nulles sont absentes, et une fonction
+        qui renvoie plusieurs valeurs répète l'index de sa ligne (valeurs contiguës)."""
+        values = self.values(chunk)
+        if self.kind == "function":
+            values = values.explode()
+        values = values.dropna()
+        if values.empty:
+            return pd.Series(dtype=object)
+        if self.term_type == RR.IRI:
+            if not self.absolute():
+                values = values.where(values.str.match(SCHEME), base + values)
+            return "<" + values + ">"
+        terms = nt_literal(values)
+        if self.datatype:
+            return terms + f"^^<{self.datatype}>"
+        if self.language:
+            return terms + f"@{self.language}"
+        return terms
+
+    def absolute(self):
+        # Template qui commence par "http://...": inutile de chercher des IRI relatives ligne par ligne
+        if self.kind != "template":
+            return False
+        text, _ = template_parts(self.value)[0]
+        return text is not None and SCHEME.match(text) is not None
+
+
+def template_parts(template):
+    # [(texte, None), (None, colonne), ...]; \{ et \} sont des accolades littérales
+    parts, position = [], 0
+    for match in TEMPLATE_PART.finditer(template):
+        if match.start() > position:
+            parts.append((template[position:match.start()], None))
+        if match.group(1):
+            parts.append((match.group(1), None))
+        else:
+            parts.append((None, match.group(2)))
+        position = match.end()
+    if position < len(template):
+        parts.append((template[position:], None))
+    return parts
+
+
+def grel_string_split(params):
+    return params[GREL.valueParameter].str.split(params[GREL.p_string_sep], regex=False)
+
+
+def grel_string_replace(params):
+    return params[GREL.valueParameter].str.replace(params[GREL.p_string_find], params[GREL.p_string_replace], regex=False)
+
+
+FUNCTIONS = {
+    GREL.string_split: grel_string_split,
+    GREL.string_replace: grel_string_replace,
+}
+
+
+class FunctionCall:
+    """fnml:functionValue: fno:executes désigne la fonction, les autres prédicats ses paramètres."""
+
+    def __init__(self, function, params):
+        self.function = function
+        self.params = params
+
+    @classmethod
+    def parse(cls, g, node):
+        function, params = None, {}
+        for pom in g.objects(node, RR.predicateObjectMap):
+            predicate = g.value(pom, RR.predicate)
+            if predicate == FNO.executes:
+                function = g.value(pom, RR.object)
+            elif (pom, RR.object, None) in g:
+                params[predicate] = str(g.value(pom, RR.object))
+            else:
+                params[predicate] = TermMap.parse(g, g.value(pom, RR.objectMap))
+        if function not in FUNCTIONS:
+            raise MappingError(f"function {function} is not supported (known: {', '.join(map(str, FUNCTIONS))})")
+        return cls(function, params)
+
+    def columns(self):
+        return set().union(*(p.columns() for p in self.params.values() if isinstance(p, TermMap)))
+
+    def values(self, chunk):
+        params = {name: p.values(chunk) if isinstance(p, TermMap) else p for name, p in self.params.items()}
+        return FUNCTIONS[self.function](params)
+
+
+class TriplesMap:
+    def __init__(self, name, source, subject, classes, predicate_objects):
+        self.name = name
+        self.source = source
+        self.subject = subject
+        self.classes = classes
+        self.predicate_objects = predicate_objects
+
+    @classmethod
+    def parse(cls, g, node):
+        source = g.value(node, RML.logicalSource)
+        if g.value(source, RML.referenceFormulation) != QL.CSV:
+            raise MappingError(f"{node}: only ql:CSV logical sources are supported")
+        subject_map = g.value(node, RR.subjectMap)
+        if subject_map is None and (node, RR.subject, None) in g:
+            subject = TermMap("constant", str(g.value(node, RR.subject)), RR.IRI)
+        else:
+            subject = TermMap.parse(g, subject_map, subject=True)
+        if subject.term_type != RR.IRI:
+            raise MappingError(f"{node}: subjects must be IRIs")
+        classes = sorted(str(c) for c in g.objects(subject_map, RR["class"]))
+
+        predicate_objects = []
+        for pom in g.objects(node, RR.predicateObjectMap):
+            predicates = [str(p) for p in g.objects(pom, RR.predicate)]
+            if not predicates or (pom, RR.predicateMap, None) in g:
+                raise MappingError(f"{node}: only constant rr:predicate values are supported")
+            objects = [TermMap("constant", str(o), RR.Literal if isinstance(o, Literal) else RR.IRI)
+                       for o in g.objects(pom, RR.object)]
+            objects += [TermMap.parse(g, o) for o in g.objects(pom, RR.objectMap)]
+            predicate_objects += [(p, o) for p in predicates for o in objects]
+        # L'ordre des triplets d'un graphe rdflib n'est pas fixe: sortie stable d'une exécution à l'autre
+        predicate_objects.sort(key=lambda po: (po[0], po[1].kind, str(po[1].value)))
+        return cls(str(node), str(g.value(source, RML.source)), subject, classes, predicate_objects)
+
+    def columns(self):
+        columns = self.subject.columns()
+        for _, term_map in self.predicate_objects:
+            columns |= term_map.columns()
+        return columns
+
+
+def read_prefixes(path):
+    # Déclarations @prefix / @base du mapping, dans l'ordre du fichier (rdflib y ajoute les siennes)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    prefixes = dict(re.findall(r"@prefix\s+([\w-]*):\s*<([^>]*)>\s*\.", text))
+    base = re.search(r"@base\s*<([^>]*)>\s*\.", text)
+    return prefixes, base.group(1) if base else ""
+
+
+def load_mapping(path):
+    g = Graph()
+    g.parse(path, format="turtle")
+    triples_maps = [TriplesMap.parse(g, node) for node in sorted(g.subjects(RDF.type, RR.TriplesMap))]
+    prefixes, base = read_prefixes(path)
+    output_prefixes = {p: ns for p, ns in prefixes.items() if ns not in MAPPING_VOCABULARIES}
+    output_prefixes.update(OUTPUT_PREFIXES)
+    return triples_maps, dict(sorted(output_prefixes.items())), base
+
+
+class NTriplesWriter:
+    def __init__(self, f, prefixes):
+        self.f = f
+
+    def write(self, subjects, rows):
+        # rows: [(prédicat N-Triples, objets)], objets indexés par ligne du bloc (voir TermMap.terms)
+        lines, positions = [], []
+        for i, (predicate, objects) in enumerate(rows):
+            lines.append(subjects.reindex(objects.index) + f" {predicate} " + objects + " .\n")
+            positions.append(np.full(len(objects), i))
+        lines = pd.concat(lines)
+        # Triplets regroupés par ligne du CSV, dans l'ordre des prédicats (tri stable)
+        order = np.lexsort((np.concatenate(positions), subjects.index.get_indexer(lines.index)))
+        self.f.write("".join(lines.iloc[order].drop_duplicates()))
+
+
+class TurtleWriter:
+    def __init__(self, f, prefixes):
+        self.f = f
+        self.short = TurtleNames(prefixes)
+        f.write(turtle_header(prefixes))
+
+    def write(self, subjects, rows):
+        blocks = pd.Series(np.nan, index=subjects.index, dtype=object)
+        for predicate, objects in rows:
+            predicate = "a" if predicate == f"<{RDF.type}>" else self.short(predicate)
+            piece = (predicate + " " + join_rows(objects.map(self.short), ",\n        ")).reindex(subjects.index)
+            # "prédicat objets" ajouté au bloc de chaque ligne, colonne par colonne
+            blocks = (blocks + " ;\n    " + piece).where(blocks.notna(), piece).where(piece.notna(), blocks)
+        blocks = blocks.dropna()
+        self.f.write("".join(subjects[blocks.index].map(self.short) + " " + blocks + " .\n\n"))
+
+
+def run_mapping(triples_maps, base, sources, writer, chunksize=CHUNKSIZE):
+    stats = {}
+    for triples_map in triples_maps:
+        path = os.path.join(sources, triples_map.source)
+        columns = triples_map.columns()
+        header = pd.read_csv(path, nrows=0).columns
+        missing = columns - set(header)
+        if missing:
+            raise MappingError(f"{triples_map.name}: columns {sorted(missing)} are missing from {path}")
+        rows = 0
+        # Tout est lu comme texte brut: "nan", "0.0" ou "007" restent tels quels, vide = nul
+        for chunk in pd.read_csv(path, usecols=sorted(columns), dtype=str, keep_default_na=False, chunksize=chunksize):
+            subjects = triples_map.subject.terms(chunk, base).dropna()
+            chunk = chunk.loc[subjects.index]
+            terms = [(f"<{RDF.type}>", pd.Series(f"<{c}>", index=chunk.index)) for c in triples_map.classes]
+            terms += [(f"<{predicate}>", term_map.terms(chunk, base)) for predicate, term_map in triples_map.predicate_objects]
+            if len(subjects):
+                writer.write(subjects, terms)
+            rows += len(chunk)
+        stats[triples_map.name] = rows
+    return stats
+
+
+def generate(mapping, sources, output, output_format, chunksize=CHUNKSIZE):
+    triples_maps, prefixes, base = load_mapping(mapping)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    target = output
+    if output_format == "pretty":
+        fd, target = tempfile.mkstemp(suffix=".nt")
+        os.close(fd)
+    try:
+        with open(target, "w", encoding="utf-8", newline="\n") as f:
+            writer = (TurtleWriter if output_format == "turtle" else NTriplesWriter)(f, prefixes)
+            stats = run_mapping(triples_maps, base, sources, writer, chunksize)
+        if output_format == "pretty":
+            text = pretty_turtle(target, prefixes, declare_all=True)
+            with open(output, "w", encoding="utf-8", newline="\n") as f:
+                f.write(text)
+    finally:
+        if target != output:
+            os.remove(target)
+    return stats
+
+
+def check(mapping, sources, expected, chunksize=CHUNKSIZE):
+    with tempfile.TemporaryDirectory() as folder:
+        output = os.path.join(folder, "check.ttl")
+        generate(mapping, sources, output, "pretty", chunksize)
+        with open(output, encoding="utf-8") as f:
+            produced = f.read()
+        # Les sorties en flux doivent décrire le même graphe
+        for output_format in ("nt", "turtle"):
+            path = os.path.join(folder, f"check.{output_format}")
+            generate(mapping, sources, path, output_format, chunksize)
+            stream = Graph().parse(path, format=output_format)
+            if set(stream) != set(Graph().parse(output, format="turtle")):
+                print(f"{output_format} output and pretty output differ")
+                return False
+    with open(expected, encoding="utf-8") as f:
+        reference = f.read()
+    if produced == reference:
+        print(f"OK: output is identical to {expected}")
+        return True
+    diff = list(difflib.unified_diff(reference.splitlines(), produced.splitlines(), expected, "rml_mapper", lineterm=""))
+    print("\n".join(diff[:60]))
+    # Triplets manquants / en trop par prédicat: un écart de mise en forme n'en produit aucun
+    expected_triples = set(Graph().parse(data=reference, format="turtle"))
+    produced_triples = set(Graph().parse(data=produced, format="turtle"))
+    for name, triples in (("missing", expected_triples - produced_triples), ("extra", produced_triples - expected_triples)):
+        counts = pd.Series([str(p) for _, p, _ in triples], dtype=object).value_counts()
+        print(f"{len(triples)} {name} triples" + "".join(f"\n    {p}: {n}" for p, n in counts.items()))
+    print(f"Output differs from {expected} ({len(diff)} diff lines)")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mapping", default=MAPPING_FILE)
+    parser.add_argument("--sources", default=".", help="dossier des CSV cités par rml:source")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--format", choices=["nt", "turtle", "pretty"], default="pretty")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="lignes de CSV par bloc")
+    parser.add_argument("--check", metavar="TTL", help="compare la sortie (format pretty) à un fichier existant")
+    parser.add_argument("--force", action="store_true", help="écrase --output s'il existe déjà")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check(args.mapping, args.sources, args.check, args.chunksize) else 1)
+    if os.path.exists(args.output) and not args.force and os.path.abspath(args.output) != os.path.abspath(OUTPUT_FILE):
+        parser.error(f"{args.output} already exists, use --force to overwrite it")
+
+    start = time.perf_counter()
+    stats = generate(args.mapping, args.sources, args.output, args.format, args.chunksize)
+    for name, rows in stats.items():
+        print(f"{name}: {rows} rows")
+    print(f"Saved {args.output} ({args.format}) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import random
 import re
 from datetime import datetime, timedelta
 from rdflib import Graph, Namespace, URIRef, Literal, RDF, XSD
+from triple_sink import TripleSink
 
 random.seed(42)
 
@@ -54,7 +55,8 @@ for row in g.query(tours_query):
 
 print(f"\nData found: {len(clients)} clients and {len(tour_packages)} packages.")
 
-g_bookings = Graph()
+# Réservations écrites au fil de l'eau (data/rdf_stream), mises en forme à la fin
+g_bookings = TripleSink("cto_data_bookings_tour")
 g_bookings.bind("cto", CTO)
 g_bookings.bind("cs", CS)
 g_bookings.bind("xsd", XSD)
@@ -99,6 +101,6 @@ for client in clients:
     g_bookings.add((booking_uri, CS.label, Literal(f"Booking for {tour['label']} by {client_name}", datatype=XSD.string)))
 
 output_file = "../database/cto_data_bookings_tour.ttl"
-g_bookings.serialize(destination=output_file, format="turtle")
+g_bookings.finalize(output_file)
 
 print(f"\n{len(clients)} reservations saved to '{output_file}'.")
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""Écriture de triplets au fil de l'eau, à la place d'un Graph rdflib gardé en mémoire jusqu'à la fin du
+script. TripleSink.add() écrit chaque triplet dans un flux N-Triples (une ligne par triplet) ou Turtle
+(triplets consécutifs d'un même sujet regroupés), vidé sur disque tous les RDF_STREAM_FLUSH triplets: après
+un arrêt brutal, tout ce qui a été vidé reste lisible. finalize() relit le flux et écrit le fichier Turtle
+mis en forme par rdflib (sujets triés, objets regroupés) qu'attend le backend.
+
+Variables d'environnement:
+    RDF_STREAM_DIR     dossier des flux (data/rdf_stream par défaut, relatif au dossier d'exécution)
+    RDF_STREAM_FORMAT  nt (défaut) ou turtle
+    RDF_STREAM_GZIP    1 pour compresser les flux (.gz)
+    RDF_STREAM_FLUSH   triplets entre deux vidages (1000 par défaut)
+
+Un flux interrompu peut être converti à la main, en ignorant le triplet ou le bloc incomplet de la fin:
+    python triple_sink.py data/rdf_stream/cto_data_bikes.nt.gz ../database/cto_data_bikes.ttl
+"""
+import argparse
+import gzip
+import os
+import re
+import zlib
+from functools import lru_cache
+
+from rdflib import BNode, Graph, Literal, RDF
+
+FORMATS = {"nt": ".nt", "turtle": ".ttl"}
+PROJECT_PREFIXES = {
+    "cs": "http://data.cyclingtour.fr/schema#",
+    "cto": "http://data.cyclingtour.fr/data#",
+    "dbp": "http://dbpedia.org/resource/",
+}
+PN_LOCAL = re.compile(r"^(?:[A-Za-z0-9_]|%[0-9A-Fa-f]{2})(?:[A-Za-z0-9_-]|%[0-9A-Fa-f]{2})*$")
+
+
+def nt_escape(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+
+
+def nt_term(term):
+    # Literal.n3() écrit les textes sur plusieurs lignes entre """: invalide en N-Triples
+    if isinstance(term, Literal):
+        text = f'"{nt_escape(str(term))}"'
+        if term.language:
+            return f"{text}@{term.language}"
+        return f"{text}^^<{term.datatype}>" if term.datatype else text
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    return f"<{term}>"
+
+
+class TurtleNames:
+    """Terme N-Triples -> nom préfixé Turtle (cs:Bike, "4.0"^^xsd:decimal) quand la partie locale s'y prête."""
+
+    def __init__(self, prefixes):
+        self.namespaces = sorted(((str(ns), p) for p, ns in prefixes.items()), key=lambda item: -len(item[0]))
+        self.short = lru_cache(maxsize=65536)(self._short)
+
+    def _short(self, term):
+        if term.startswith('"'):
+            if "^^<" in term and term.endswith(">"):
+                lexical, datatype = term.rsplit("^^", 1)
+                return f"{lexical}^^{self.short(datatype)}"
+            return term
+        if not term.startswith("<"):
+            return term
+        iri = term[1:-1]
+        for namespace, prefix in self.namespaces:
+            if iri.startswith(namespace) and PN_LOCAL.match(iri[len(namespace):]):
+                return f"{prefix}:{iri[len(namespace):]}"
+        return term
+
+    def __call__(self, term):
+        return self.short(term)
+
+
+def turtle_header(prefixes):
+    return "".join(f"@prefix {prefix}: <{namespace}> .\n" for prefix, namespace in prefixes.items()) + "\n"
+
+
+class TripleSink:
+    """Remplace un Graph en écriture seule: bind() et add() comme rdflib, le fichier n'est ouvert qu'au
+    premier triplet. Les doublons ne sont pas filtrés ici, ils disparaissent à la passe finale."""
+
+    def __init__(self, name, folder=None, fmt=None, compress=None, flush_every=None, prefixes=None):
+        self.format = fmt or os.getenv("RDF_STREAM_FORMAT", "nt")
+        if self.format not in FORMATS:
+            raise ValueError(f"RDF stream format must be one of {tuple(FORMATS)}, not {self.format!r}")
+        if compress is None:
+            compress = os.getenv("RDF_STREAM_GZIP", "0") == "1"
+        folder = folder or os.getenv("RDF_STREAM_DIR", "data/rdf_stream")
+        self.path = os.path.join(folder, name + FORMATS[self.format] + (".gz" if compress else ""))
+        self.flush_every = flush_every or int(os.getenv("RDF_STREAM_FLUSH", "1000"))
+        self.prefixes = {prefix: str(namespace) for prefix, namespace in (prefixes or {}).items()}
+        self.count = 0
+        self._file = None
+        self._names = None
+        self._subject = None
+        self._predicate = None
+
+    def bind(self, prefix, namespace):
+        if self._file:
+            raise RuntimeError(f"{self.path}: prefixes must be bound before the first triple")
+        self.prefixes[prefix] = str(namespace)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.path.endswith(".gz"):
+            self._file = gzip.open(self.path, "wt", encoding="utf-8", newline="\n")
+        else:
+            self._file = open(self.path, "w", encoding="utf-8", newline="\n")
+        if self.format == "turtle":
+            self._names = TurtleNames(self.prefixes)
+            self._file.write(turtle_header(self.prefixes))
+
+    def add(self, triple):
+        if self._file is None:
+            self._open()
+        s, p, o = (nt_term(term) for term in triple)
+        if self.format == "nt":
+            self._file.write(f"{s} {p} {o} .\n")
+        else:
+            self._write_turtle(s, p, o)
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    def _write_turtle(self, s, p, o):
+        o = self._names(o)
+        if s == self._subject and p == self._predicate:
+            self._file.write(f",\n        {o}")
+            return
+        name = "a" if p == f"<{RDF.type}>" else self._names(p)
+        if s == self._subject:
+            self._file.write(f" ;\n    {name} {o}")
+        else:
+            if self._subject is not None:
+                self._file.write(" .\n\n")
+            self._file.write(f"{self._names(s)} {name} {o}")
+        self._subject, self._predicate = s, p
+
+    def flush(self):
+        # Sur un flux gzip, vide aussi le compresseur (Z_SYNC_FLUSH): tout ce qui précède est décompressable
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            if self.format == "turtle" and self._subject is not None:
+                self._file.write(" .\n")
+            self._file.close()
+            self._file = None
+        return self.count
+
+    def finalize(self, output, declare_all=False):
+        """Ferme le flux et écrit output en Turtle mis en forme."""
+        self.close()
+        text = pretty_turtle(self.path, self.prefixes, declare_all) if self.count else ""
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        print(f"{output}: {self.count} triples (stream {self.path})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_stream(path):
+    """Contenu d'un flux, éventuellement compressé et interrompu: la fin incomplète est ignorée."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".gz"):
+        # Sur un flux tronqué, gzip.open lève EOFError; decompressobj rend tout ce qui précède la coupure
+        data = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16).decompress(data)
+    # Dernier triplet (N-Triples) ou dernier bloc (Turtle) complet
+    end = b" .\n" if path.endswith((".ttl", ".ttl.gz")) else b"\n"
+    cut = data.rfind(end)
+    return data[:cut + len(end)].decode("utf-8") if cut >= 0 else ""
+
+
+def pretty_turtle(path, prefixes, declare_all=False):
+    """Relit un flux et le met en forme avec rdflib, comme Graph.serialize(format="turtle"). Avec
+    declare_all, tous les préfixes sont déclarés dans l'en-tête, même ceux que les données n'utilisent pas."""
+    fmt = "turtle" if path.endswith((".ttl", ".ttl.gz")) else "nt"
+    g = Graph(bind_namespaces="none") if declare_all else Graph()
+    g.parse(data=read_stream(path), format=fmt)
+    for prefix, namespace in prefixes.items():
+        g.bind(prefix, namespace, override=True, replace=declare_all)
+    text = g.serialize(format="turtle")
+    if declare_all:
+        # rdflib n'écrit que les préfixes utilisés: en-tête complet à la place du sien
+        body = text.split("\n\n", 1)[1] if text.startswith("@prefix") else text
+        text = turtle_header(prefixes) + body
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("stream", help="flux .nt / .ttl, éventuellement .gz")
+    parser.add_argument("output", help="fichier Turtle à écrire")
+    args = parser.parse_args()
+
+    # Un flux N-Triples ne garde pas les préfixes: ceux du projet
+    text = pretty_turtle(args.stream, PROJECT_PREFIXES)
+    with open(args.output, "w", encoding="utf-8", newline="\n") as f:
+        f.write(text)
+    print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
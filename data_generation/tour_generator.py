@@ -1,7 +1,12 @@
+import os
 import random
+import sys
 from rdflib import Graph, Namespace, Literal, RDF, URIRef
 from rdflib.namespace import XSD, RDFS, FOAF
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_extraction"))
+from triple_sink import TripleSink
+
 INPUT_FOLDER = "database/"
 INPUT_FILES = ["cto_mountains_paths.ttl", "cto_data_guides.ttl"]
 INPUT_FILES = [INPUT_FOLDER + f for f in INPUT_FILES]
@@ -34,7 +39,8 @@ def main():
 
     available_guides = get_available_guides(g)
 
-    out_g = Graph()
+    # Étapes et packages écrits au fil de l'eau (data/rdf_stream), mis en forme à la fin
+    out_g = TripleSink("cto_data_tour")
     for prefix, namespace in g.namespaces():
         out_g.bind(prefix, namespace)
     out_g.bind("cto", CTO)
@@ -114,7 +120,7 @@ def main():
             
             pkg_count += 1
 
-    out_g.serialize(destination=OUTPUT_FILE, format="turtle")
+    out_g.finalize(OUTPUT_FILE)
 
 if __name__ == "__main__":
     main()
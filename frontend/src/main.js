@@ -146,54 +146,145 @@ function renderChatView(container) {
     addMessageToContainer(messages, 'user', text);
     input.value = '';
     
-    addMessageToContainer(messages, 'system', 'Thinking...');
+    // Bulle d'attente propre à cette question: une réponse plus lente ne touche pas celles des suivantes
+    const placeholder = addMessageToContainer(messages, 'system', 'Thinking...');
     
     try {
-      let responseText = "";
-      
       if (searchMode === 'query') {
-        const sparqlRes = await fetch(`${API_BASE}/text-to-sparql`, {
-          method: 'POST', headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ text })
-        });
-        const sparqlData = await sparqlRes.json();
-        
-        let queryStr = typeof sparqlData === 'string' ? sparqlData : sparqlData.query || sparqlData;
-        queryStr = queryStr.replace(/```sparql/g, '').replace(/```/g, '').trim();
+        await streamQueryResults(text, messages, placeholder);
+      } else {
+        await streamAnswer(text, messages, placeholder);
+      }
+    } catch (e) {
+      placeholder.remove();
+      // Question remplacée par une nouvelle: la nouvelle requête gère déjà l'affichage
+      if (e.name === 'AbortError') return;
+      addMessageToContainer(messages, 'system', `Error: ${e.message}`);
+    }
+  };
+
+  btn.onclick = handleSend;
+  input.onkeypress = (e) => { if(e.key === 'Enter') handleSend() };
+}
 
-        responseText += `<div class="font-mono text-xs text-brand-DEFAULT bg-bg-main p-2 rounded mb-2 border border-slate-700 flex justify-between"><span>SPARQL GENERATED</span> <i data-lucide="check" class="w-3 h-3"></i></div>`;
-        responseText += `<pre class="bg-bg-main p-3 rounded text-xs text-slate-400 overflow-x-auto mb-4 border border-slate-700"><code>${queryStr}</code></pre>`;
+let askController = null;
 
-        const execRes = await fetch(`${API_BASE}/query`, {
-            method: 'POST', headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({ query: queryStr })
-        });
-        const results = await execRes.json();
-        responseText += formatTable(results);
+async function streamAnswer(question, messages, placeholder) {
+  // Une nouvelle question annule la précédente, ce qui coupe aussi l'appel Gemini côté serveur
+  if (askController) askController.abort();
+  askController = new AbortController();
 
-      } else {
-        const res = await fetch(`${API_BASE}/ask`, {
-          method: 'POST', headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ question: text })
-        });
-        const data = await res.json();
-        responseText = data.answer.replace(/\n/g, '<br>');
-        responseText = marked.parse(data.answer);
+  const res = await fetch(`${API_BASE}/ask/stream`, {
+    method: 'POST', headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ question }),
+    signal: askController.signal
+  });
+  if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+  let answer = '';
+  let bubble = null;
+
+  await readSse(res, (event, data) => {
+    if (event === 'context' && !bubble) {
+      placeholder.lastElementChild.textContent = `Thinking... (${data.documents.length} documents retrieved)`;
+    }
+    if (event === 'token') {
+      if (!bubble) {
+        bubble = replaceMessage(messages, placeholder, 'ai', '', true).lastElementChild;
       }
+      answer += data.text;
+      bubble.innerHTML = marked.parse(answer);
+      messages.scrollTop = messages.scrollHeight;
+    }
+  });
+
+  if (!bubble) {
+    replaceMessage(messages, placeholder, 'system', 'No answer received.');
+  }
+}
 
-      messages.lastElementChild.remove();
-      addMessageToContainer(messages, 'ai', responseText, true);
+let queryController = null;
 
+async function streamQueryResults(text, messages, placeholder) {
+  // Traduction, validation et exécution en un seul appel: la requête s'affiche dès qu'elle est prête,
+  // le tableau se remplit au fil des lots de lignes
+  if (queryController) queryController.abort();
+  queryController = new AbortController();
+
+  const res = await fetch(`${API_BASE}/text-to-sparql/execute`, {
+    method: 'POST', headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ text, stream: true }),
+    signal: queryController.signal
+  });
+  if (!res.ok) {
+    const body = await res.json().catch(() => ({}));
+    throw new Error(body.error || `HTTP ${res.status}`);
+  }
+
+  let header = '';
+  let rows = [];
+  let bubble = null;
+  const render = (footer = '', done = false) => {
+    const table = rows.length || done ? formatTable(rows) : '<div class="text-xs text-slate-500 italic">Running query...</div>';
+    bubble.innerHTML = header + table + footer;
+    messages.scrollTop = messages.scrollHeight;
+  };
+
+  await readSse(res, (event, data) => {
+    if (event === 'query') {
+      const queryStr = data.query.replace(/</g, '&lt;');
+      header = `<div class="font-mono text-xs text-brand-DEFAULT bg-bg-main p-2 rounded mb-2 border border-slate-700 flex justify-between"><span>SPARQL GENERATED</span> <i data-lucide="check" class="w-3 h-3"></i></div>`;
+      header += `<pre class="bg-bg-main p-3 rounded text-xs text-slate-400 overflow-x-auto mb-4 border border-slate-700"><code>${queryStr}</code></pre>`;
+      bubble = replaceMessage(messages, placeholder, 'ai', '', true).lastElementChild;
+      render();
+      createIcons({ icons });
+    }
+    if (event === 'rows') {
+      rows = rows.concat(data.rows);
+      render();
+    }
+    if (event === 'done') {
+      const t = data.timings;
+      let footer = `<div class="mt-2 text-[10px] font-mono text-slate-500">${data.row_count} rows · translation ${t.translation_ms} ms · parse ${t.parse_ms} ms · execution ${t.execution_ms} ms`;
+      if (data.truncated) footer += ` · truncated (${data.truncated === 'timeout' ? 'time limit' : 'row limit'})`;
+      render(footer + '</div>', true);
       createIcons({ icons });
+    }
+  });
 
-    } catch (e) {
-      messages.lastElementChild.remove();
-      addMessageToContainer(messages, 'system', `Error: ${e.message}`);
+  if (!bubble) {
+    replaceMessage(messages, placeholder, 'system', 'No query generated.');
+  }
+}
+
+async function readSse(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) >= 0) {
+      const { event, data } = parseSseEvent(buffer.slice(0, sep));
+      buffer = buffer.slice(sep + 2);
+      if (event === 'error') throw new Error(data.error);
+      onEvent(event, data);
     }
-  };
+  }
+}
 
-  btn.onclick = handleSend;
-  input.onkeypress = (e) => { if(e.key === 'Enter') handleSend() };
+function parseSseEvent(raw) {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of raw.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+  }
+  return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
 }
 
 function addMessageToContainer(container, role, html, isHtml = false) {
@@ -212,6 +303,14 @@ function addMessageToContainer(container, role, html, isHtml = false) {
   `;
   container.appendChild(div);
   container.scrollTop = container.scrollHeight;
+  return div;
+}
+
+function replaceMessage(container, placeholder, role, html, isHtml = false) {
+  // Le nouveau message prend la place de la bulle d'attente, pas forcément la dernière de la liste
+  const div = addMessageToContainer(container, role, html, isHtml);
+  placeholder.replaceWith(div);
+  return div;
 }
 
 function renderExplorerView(container) {